@@ -0,0 +1,63 @@
+"""Benchmark the request/correlation ID generators and validators.
+
+is_valid_uuid is the validator of the former per-ID middlewares, kept here
+for comparison with is_valid_id.
+
+Usage:
+    python benchmarks/bench_id_generators.py [iterations]
+
+"""
+import sys
+import timeit
+from uuid import UUID
+
+import cuid
+from das_sankhya.middlewares.asgi_correlation_id.generators import (
+    get_id_generator,
+    is_valid_id,
+)
+
+
+def is_valid_uuid(uuid_):
+    # Presumed to be a cuid
+    if len(uuid_) == 25 and uuid_.lower().startswith("c"):
+        return True
+
+    # Verify if is valid v4 uuid
+    try:
+        return bool(UUID(uuid_, version=4))
+    except ValueError:
+        return False
+
+
+def report(name, func, iterations):
+    seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+    print("{0:<36} {1:8.3f} us/call".format(name, seconds / iterations * 1e6))
+
+
+def main(iterations):
+    print("Generators:")
+    for name in ("cuid", "uuid4", "ulid", "pool"):
+        report(name, get_id_generator(name), iterations)
+
+    print("Validators:")
+    samples = {
+        "cuid": cuid.cuid(),
+        "uuid4": "5c1d2f5e-1b0e-4f5b-9a51-3e3f0d0c9a10",
+        "ulid": get_id_generator("ulid")(),
+    }
+    for name, value in samples.items():
+        report(
+            "is_valid_uuid({0})".format(name),
+            lambda: is_valid_uuid(value),
+            iterations,
+        )
+        report(
+            "is_valid_id({0})".format(name),
+            lambda: is_valid_id(value),
+            iterations,
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
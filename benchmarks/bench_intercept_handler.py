@@ -0,0 +1,74 @@
+"""Benchmark the standard logging to loguru bridge.
+
+Compares the former InterceptHandler of core/logs2, which looked up the
+loguru level and walked the stack on every record, with the current one,
+for an application logger and for uvicorn.access, whose records skip the
+caller lookup. Records are logged to a sink discarding them, then with no
+loguru handler at all, which leaves the cost of the bridge itself.
+
+Usage:
+    python benchmarks/bench_intercept_handler.py [iterations]
+
+"""
+import logging
+import sys
+import timeit
+
+from loguru import logger
+
+from das_sankhya.core.log_intercept import InterceptHandler
+
+
+class LegacyInterceptHandler(logging.Handler):
+    def emit(self, record):
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+
+        frame, depth = logging.currentframe(), 2
+        while frame.f_code.co_filename == logging.__file__:
+            frame = frame.f_back
+            depth += 1
+
+        logger.opt(depth=depth, exception=record.exc_info).log(
+            level, record.getMessage()
+        )
+
+
+def run(name, handler, iterations, scenario):
+    for logger_name in ("bench.app", "uvicorn.access"):
+        std_logger = logging.getLogger(logger_name)
+        std_logger.handlers = [handler]
+        std_logger.propagate = False
+        std_logger.setLevel(logging.INFO)
+        seconds = min(
+            timeit.repeat(
+                lambda: std_logger.info(
+                    '%s - "%s %s HTTP/%s" %d', "127.0.0.1", "GET", "/", "1.1", 200
+                ),
+                number=iterations,
+                repeat=5,
+            )
+        )
+        print(
+            "{0:<8} {1:<16} {2:<12} {3:8.3f} us/record".format(
+                name, logger_name, scenario, seconds / iterations * 1e6
+            )
+        )
+
+
+def main(iterations):
+    logger.remove()
+    handler_id = logger.add(
+        lambda message: None, format="{name}:{function}:{line} {message}"
+    )
+    run("legacy", LegacyInterceptHandler(), iterations, "null sink")
+    run("current", InterceptHandler(), iterations, "null sink")
+    logger.remove(handler_id)
+    run("legacy", LegacyInterceptHandler(), iterations, "no handler")
+    run("current", InterceptHandler(), iterations, "no handler")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,63 @@
+"""Benchmark JSON encoding of loguru records.
+
+Compares the former orjson_log_sink record conversion, which copied every
+key of the record, with RecordEncoder.
+
+Usage:
+    python benchmarks/bench_log_encoder.py [iterations]
+
+"""
+import sys
+import timeit
+
+from loguru import logger
+from orjson import dumps
+
+from das_sankhya.core.log_encoder import RecordEncoder
+
+
+def legacy_encode(record):
+    """Record conversion of the former orjson_log_sink, without its prints."""
+    rec = {
+        "elapsed": record["elapsed"].total_seconds(),
+        "time": record["time"].isoformat(),
+        "level": {"name": record["level"].name, "no": record["level"].no},
+        "process": {"id": record["process"].id, "name": record["process"].name},
+        "thread": {"id": record["thread"].id, "name": record["thread"].name},
+        "file": record["file"].path,
+    }
+    for key, value in record.items():
+        if key in rec:
+            continue
+        rec[key] = value
+    return dumps(rec, default=str)
+
+
+def capture_record():
+    records = []
+    logger.remove()
+    logger.add(lambda message: records.append(message.record))
+    logger.bind(
+        correlation_id="5c1d2f5e1b0e4f5b9a513e3f0d0c9a10",
+        request_id="8f14e45fceea167a5a36dedd4bea2543",
+        pid=1234,
+        payload={"user": 42, "items": [1, 2, 3]},
+    ).info("Handled {} in {:.1f}ms", "/api/v1/ready", 12.3)
+    return records[0]
+
+
+def main(iterations):
+    record = capture_record()
+    encoder = RecordEncoder()
+    for name, func in (
+        ("legacy orjson_log_sink", lambda: legacy_encode(record)),
+        ("RecordEncoder", lambda: encoder.encode(record)),
+    ):
+        seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+        print(
+            "{0:<24} {1:10.0f} records/s".format(name, iterations / seconds)
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,81 @@
+"""Benchmark the per-call cost of the log patcher and record format.
+
+Compares the former set_log_extras and format_record of core/logs2, which
+called pendulum.now(), os.getpid() and two ContextVar lookups and built the
+format string for every record, with the current ones. Each variant logs to
+a sink discarding the formatted message, inside a request context; the
+patcher and format function are also timed alone, on a captured record.
+
+Usage:
+    python benchmarks/bench_log_patcher.py [iterations]
+
+"""
+import os
+import sys
+import timeit
+
+import pendulum
+from loguru import logger
+
+from das_sankhya.core.logs2 import format_record, set_log_extras
+from das_sankhya.middlewares.asgi_correlation_id.context import (
+    TracingContext,
+    get_correlation_id,
+    get_request_id,
+    tracing_context,
+)
+
+
+def legacy_set_log_extras(record):
+    record["extra"]["datetime"] = pendulum.now("UTC")
+    record["extra"]["correlation_id"] = get_correlation_id()
+    record["extra"]["request_id"] = get_request_id()
+    record["extra"]["pid"] = os.getpid()
+
+
+def legacy_format_record(record):
+    format_string = "<green>{extra[datetime]}</green> | <green>{extra[pid]}</green> | <green>{extra[correlation_id]}</green> | <green>{extra[request_id]}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+    format_string += "{exception}\n"
+    return format_string
+
+
+def report(name, func, iterations):
+    seconds = min(timeit.repeat(func, number=iterations, repeat=5))
+    print("{0:<28} {1:8.3f} us/call".format(name, seconds / iterations * 1e6))
+
+
+def capture_record():
+    records = []
+    logger.remove()
+    logger.add(lambda message: records.append(message.record))
+    logger.info("Handled {}", "/api/v1/ready")
+    return records[0]
+
+
+def run(name, patcher, log_format, iterations):
+    record = capture_record()
+
+    def patch_and_format():
+        patcher(record)
+        log_format(record)
+
+    report(name + " patcher+format", patch_and_format, iterations)
+
+    logger.remove()
+    logger.add(lambda message: None, format=log_format)
+    logger.configure(patcher=patcher)
+    report(
+        name + " logger.info",
+        lambda: logger.info("Handled {}", "/api/v1/ready"),
+        iterations,
+    )
+
+
+def main(iterations):
+    tracing_context.set(TracingContext("correlation", "request"))
+    run("legacy", legacy_set_log_extras, legacy_format_record, iterations)
+    run("current", set_log_extras, format_record, iterations)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
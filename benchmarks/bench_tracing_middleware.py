@@ -0,0 +1,95 @@
+"""Benchmark the tracing middlewares against a bare /ready-like endpoint.
+
+Compares the previous stack of RequestIdMiddleware, CorrelationIdMiddleware
+and IdempotencyKeyMiddleware with the fused TracingMiddleware, driving the
+ASGI callables directly so that only middleware overhead is measured.
+
+Usage:
+    python benchmarks/bench_tracing_middleware.py [iterations]
+
+"""
+import asyncio
+import sys
+import time
+
+from das_sankhya.middlewares.asgi_correlation_id import (
+    CorrelationIdMiddleware,
+    IdempotencyKeyMiddleware,
+    RequestIdMiddleware,
+    TracingMiddleware,
+)
+from das_sankhya.middlewares.asgi_correlation_id.generators import (
+    get_id_generator,
+)
+
+BODY = b'{"status":"ok"}'
+SCOPE = {
+    "type": "http",
+    "method": "GET",
+    "path": "/api/v1/ready",
+    "headers": [
+        (b"host", b"localhost:8000"),
+        (b"user-agent", b"python-requests/2.25.1"),
+        (b"accept-encoding", b"gzip, deflate"),
+        (b"accept", b"*/*"),
+        (b"connection", b"keep-alive"),
+        (b"idempotency-key", b"5c1d2f5e-1b0e-4f5b-9a51-3e3f0d0c9a10"),
+    ],
+}
+
+
+async def ready(scope, receive, send):
+    """Mimic the response of the /ready handler, minus its I/O."""
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-length", str(len(BODY)).encode("latin-1")),
+                (b"content-type", b"application/json"),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": BODY})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def run(app, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await app(dict(SCOPE), receive, send)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(iterations):
+    stacks = {
+        "legacy 3 middlewares": RequestIdMiddleware(
+            CorrelationIdMiddleware(IdempotencyKeyMiddleware(ready))
+        ),
+        "fused TracingMiddleware": TracingMiddleware(ready),
+        "fused TracingMiddleware, ulid": TracingMiddleware(
+            ready, id_generator=get_id_generator("ulid")
+        ),
+    }
+    loop = asyncio.new_event_loop()
+    baseline = loop.run_until_complete(run(ready, iterations))
+    print("{0:<32} {1:8.2f} us/request".format("bare endpoint", baseline))
+    for name, app in stacks.items():
+        per_call = loop.run_until_complete(run(app, iterations))
+        print(
+            "{0:<32} {1:8.2f} us/request  (+{2:.2f} us middleware)".format(
+                name, per_call, per_call - baseline
+            )
+        )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,107 @@
+"""Benchmark the DEBUG logging of the Redis and HTTP client utilities.
+
+Compares the former RedisClient.set and AiohttpClient.get, which formatted
+their key, value and URL and called log.debug on every call, with the
+current ones, which only do so when DEBUG records are logged. The Redis
+client and aiohttp session are stubbed out, and records go to an INFO level
+sink discarding them, so what is left is the per-call overhead of the
+disabled DEBUG logging.
+
+Usage:
+    python benchmarks/bench_utils_logging.py [iterations]
+
+"""
+import asyncio
+import sys
+import time
+
+from aioredis.exceptions import RedisError
+from loguru import logger
+
+from das_sankhya.core.log_values import set_min_level
+from das_sankhya.utils import AiohttpClient, RedisClient
+
+VALUE = "x" * 1024
+URL = "http://upstream.local/api/v1/items?page=1&size=100"
+
+
+class StubRedis(object):
+    async def set(self, key, value, **options):
+        return True
+
+
+class StubSession(object):
+    async def get(self, url, headers=None, **kwargs):
+        return None
+
+
+class LegacyRedisClient(RedisClient):
+    @classmethod
+    async def set(cls, key, value, **options):
+        redis_client = cls.redis_client
+
+        cls.log.debug(
+            "Preform Redis SET command, key: {}, value: {}".format(key, value)
+        )
+        try:
+            return await cls._execute("SET", redis_client.set(key, value, **options))
+        except RedisError as ex:
+            cls.log.exception(
+                "Redis SET command finished with exception",
+                exc_info=(type(ex), ex, ex.__traceback__),
+            )
+            raise ex
+
+
+class LegacyAiohttpClient(AiohttpClient):
+    @classmethod
+    async def get(cls, url, headers=None, raise_for_status=True):
+        client = cls.get_aiohttp_client()
+
+        cls.log.debug("Started GET {}".format(url))
+        response = await cls._send(
+            client.get,
+            url,
+            headers=headers,
+            raise_for_status=raise_for_status,
+        )
+
+        return response
+
+
+async def measure(call, iterations):
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await call()
+        best = min(best, time.perf_counter() - start)
+    return best / iterations * 1e6
+
+
+async def run(iterations):
+    RedisClient.redis_client = StubRedis()
+    AiohttpClient.aiohttp_client = StubSession()
+    scenarios = [
+        ("legacy", "RedisClient.set", lambda: LegacyRedisClient.set("key", VALUE)),
+        ("current", "RedisClient.set", lambda: RedisClient.set("key", VALUE)),
+        ("legacy", "AiohttpClient.get", lambda: LegacyAiohttpClient.get(URL)),
+        ("current", "AiohttpClient.get", lambda: AiohttpClient.get(URL)),
+    ]
+    for name, target, call in scenarios:
+        print(
+            "{0:<8} {1:<18} {2:8.3f} us/call".format(
+                name, target, await measure(call, iterations)
+            )
+        )
+
+
+def main(iterations):
+    logger.remove()
+    logger.add(lambda message: None, level="INFO")
+    set_min_level(logger.level("INFO").no)
+    asyncio.run(run(iterations))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
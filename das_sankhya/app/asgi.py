@@ -6,18 +6,35 @@ import os
 import pytz
 
 from fastapi import FastAPI
-from das_sankhya.middlewares.asgi_correlation_id import (
-    CorrelationIdMiddleware,
-    RequestIdMiddleware,
-    IdempotencyKeyMiddleware,
+from das_sankhya.middlewares.asgi_correlation_id import TracingMiddleware
+from das_sankhya.middlewares.asgi_correlation_id.generators import (
+    get_id_generator,
 )
 
 # from starlette.middleware import Middleware
 # from starlette_context.middleware import ContextMiddleware
 
 from das_sankhya.config import router, settings
+from das_sankhya.config import middlewares as middlewares_conf
+from das_sankhya.config import logs, monitoring
 from das_sankhya.core.logs2 import global_log_config
+from das_sankhya.core.access_log import log_access
+from das_sankhya.core.log_buffer import tail_log_buffer
+from das_sankhya.core.log_sinks import drain_all
+from das_sankhya.core.loop_monitor import LoopMonitor
+from das_sankhya.core.diagnostics import log_slow_request, slow_requests
 from das_sankhya.app.middlewares.timing import add_timing_middleware
+from das_sankhya.app.middlewares.deadline import DeadlineMiddleware
+from das_sankhya.app.middlewares.tail_log import TailLogMiddleware
+from das_sankhya.app.middlewares.admission import (
+    AdmissionControlMiddleware,
+    AIMDLimit,
+)
+from das_sankhya.app.middlewares.idempotency import (
+    IdempotencyMiddleware,
+    InMemoryIdempotencyBackend,
+    RedisIdempotencyBackend,
+)
 
 # from das_sankhya.app.middlewares.request_id import DasRequestIdPlugin
 # from das_sankhya.app.middlewares.correlation_id import DasCorrelationIdPlugin
@@ -36,6 +53,17 @@ global_log_config(
     json=settings.JSON_LOGS,
 )
 
+slow_requests.resize(monitoring.SLOW_REQUEST_BUFFER_SIZE)
+tail_log_buffer.configure(
+    level=logs.LOG_TAIL_LEVEL,
+    max_records=logs.LOG_TAIL_MAX_RECORDS,
+    max_worker_records=logs.LOG_TAIL_MAX_WORKER_RECORDS,
+)
+loop_monitor = LoopMonitor(
+    interval=monitoring.LOOP_MONITOR_INTERVAL,
+    threshold=monitoring.LOOP_STALL_THRESHOLD,
+)
+
 # middleware = [
 #     Middleware(
 #         ContextMiddleware,
@@ -51,10 +79,13 @@ global_log_config(
 async def on_startup():
     """Fastapi startup event handler.
 
-    Creates RedisClient and AiohttpClient session.
+    Creates RedisClient and AiohttpClient session, and starts the event loop
+    monitor.
 
     """
     logger.info("Execute FastAPI startup event handler.")
+    if monitoring.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
     # Initialize utilities for whole FastAPI application without passing object
     # instances within the logic.
     if settings.USE_REDIS:
@@ -66,15 +97,18 @@ async def on_startup():
 async def on_shutdown():
     """Fastapi shutdown event handler.
 
-    Destroys RedisClient and AiohttpClient session.
+    Destroys RedisClient and AiohttpClient session, stops the event loop
+    monitor and writes pending log records.
 
     """
     logger.info("Execute FastAPI shutdown event handler.")
+    await loop_monitor.stop()
     # Gracefully close utilities.
     if settings.USE_REDIS:
         await RedisClient.close_redis_client()
 
     await AiohttpClient.close_aiohttp_client()
+    drain_all()
 
 
 def get_app():
@@ -98,13 +132,72 @@ def get_app():
     app.include_router(router)
     # Register global exception handler for custom HTTPException.
     app.add_exception_handler(HTTPException, http_exception_handler)
+    # Innermost, so that timing and logs see the 504 of expired requests.
+    app.add_middleware(
+        DeadlineMiddleware,
+        header=middlewares_conf.DEADLINE_HEADER,
+        default_timeout=middlewares_conf.DEADLINE_DEFAULT,
+        routes=middlewares_conf.DEADLINE_ROUTES,
+        max_timeout=middlewares_conf.DEADLINE_MAX,
+    )
+    if middlewares_conf.IDEMPOTENCY_ROUTES:
+        if middlewares_conf.IDEMPOTENCY_BACKEND == "redis":
+            backend = RedisIdempotencyBackend()
+        else:
+            backend = InMemoryIdempotencyBackend()
+        # Reads the idempotency key set by TracingMiddleware, added below.
+        app.add_middleware(
+            IdempotencyMiddleware,
+            backend=backend,
+            routes=middlewares_conf.IDEMPOTENCY_ROUTES,
+            ttl=middlewares_conf.IDEMPOTENCY_TTL,
+            max_body_size=middlewares_conf.IDEMPOTENCY_MAX_BODY_SIZE,
+            lock_timeout=middlewares_conf.IDEMPOTENCY_LOCK_TIMEOUT,
+        )
+    # Outside IdempotencyMiddleware, so that replayed responses are timed too.
     add_timing_middleware(
         app,
         record=logger.info,
+        server_timing_routes=middlewares_conf.SERVER_TIMING_ROUTES,
+        server_timing_header=middlewares_conf.SERVER_TIMING_HEADER,
+        slow_threshold=monitoring.SLOW_REQUEST_THRESHOLD,
+        slow_routes=monitoring.SLOW_REQUEST_ROUTES,
+        slow_record=log_slow_request,
+        access_record=log_access if logs.LOG_ACCESS else None,
+    )
+    if logs.LOG_TAIL_ENABLED:
+        # Inside TracingMiddleware, so that buffers carry the request ID.
+        app.add_middleware(
+            TailLogMiddleware,
+            buffer=tail_log_buffer,
+            latency_threshold=logs.LOG_TAIL_LATENCY_THRESHOLD,
+            summary=logs.LOG_TAIL_SUMMARY,
+        )
+    app.add_middleware(
+        TracingMiddleware,
+        correlation_header="X-Correlation-ID",
+        request_header="X-Request-ID",
+        idempotency_header="Idempotency-Key",
+        id_generator=get_id_generator(
+            middlewares_conf.ID_GENERATOR,
+            batch_size=middlewares_conf.ID_POOL_SIZE,
+        ),
     )
-    app.add_middleware(IdempotencyKeyMiddleware, header_name="Idempotency-Key")
-    app.add_middleware(CorrelationIdMiddleware, header_name="X-Correlation-ID")
-    app.add_middleware(RequestIdMiddleware, header_name="X-Request-ID")
+    if middlewares_conf.ADMISSION_ENABLED:
+        # Outermost, so that shed requests cost as little as possible.
+        app.add_middleware(
+            AdmissionControlMiddleware,
+            limit=AIMDLimit(
+                initial=middlewares_conf.ADMISSION_INITIAL_LIMIT,
+                min_limit=middlewares_conf.ADMISSION_MIN_LIMIT,
+                max_limit=middlewares_conf.ADMISSION_MAX_LIMIT,
+                latency_target=middlewares_conf.ADMISSION_LATENCY_TARGET,
+            ),
+            queue_size=middlewares_conf.ADMISSION_QUEUE_SIZE,
+            queue_timeout=middlewares_conf.ADMISSION_QUEUE_TIMEOUT,
+            retry_after=middlewares_conf.ADMISSION_RETRY_AFTER,
+            bypass=middlewares_conf.ADMISSION_BYPASS,
+        )
 
     return app
 
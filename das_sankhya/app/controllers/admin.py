@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Admin controller."""
+from typing import Dict, List
+
+from fastapi import APIRouter, Query
+
+from das_sankhya.core.diagnostics import slow_requests
+
+router = APIRouter(prefix="/admin")
+
+
+@router.get(
+    "/slow-requests",
+    tags=["admin"],
+    response_model=List[Dict],
+    summary="Recent slow requests of this worker.",
+    status_code=200,
+)
+async def list_slow_requests(limit: int = Query(50, ge=1, le=1000)):
+    """List the diagnostics of the most recent slow requests.
+
+    Each report has the timing splits, outbound HTTP and Redis call durations
+    and the correlation, request and idempotency IDs of a request slower than
+    its threshold. Reports are kept in a bounded per-worker ring buffer.
+    \f
+
+    Args:
+        limit (int): Maximum number of reports returned.
+
+    Returns:
+        response (List[Dict]): Slow request reports, newest first.
+
+    """
+    return slow_requests.entries(limit)
@@ -4,13 +4,17 @@
 from loguru import logger
 from typing import Optional, Dict
 
-from fastapi import APIRouter, Header
+from fastapi import APIRouter, Header, Request
 
 from das_sankhya.config import settings
-from das_sankhya.middlewares.asgi_correlation_id.context import correlation_id
+from das_sankhya.core.deadline import DeadlineExceeded
+from das_sankhya.middlewares.asgi_correlation_id.context import (
+    get_correlation_id,
+)
 from das_sankhya.utils import RedisClient, AiohttpClient
 from das_sankhya.app.models import ReadyResponse, ErrorResponse
 from das_sankhya.app.exceptions import HTTPException
+from das_sankhya.app.middlewares.timing import record_timing
 
 router = APIRouter()
 # log = logging.getLogger(__name__)
@@ -24,7 +28,9 @@ router = APIRouter()
     status_code=200,
     responses={502: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
 )
-async def readiness_check(idempotency_key: Optional[str] = Header(None)):
+async def readiness_check(
+    request: Request, idempotency_key: Optional[str] = Header(None)
+):
     """Run basic application health check.
 
     If the application is up and running then this endpoint will return simple
@@ -45,12 +51,15 @@ async def readiness_check(idempotency_key: Optional[str] = Header(None)):
     headers: Dict = {}
     if idempotency_key is not None:
         headers["Idempotency-Key"] = idempotency_key
-    headers["x-correlation-id"] = correlation_id.get()
+    headers["x-correlation-id"] = get_correlation_id()
 
     logger.bind(payload=headers).info("Started GET /ready")
     host = "http://localhost:8000/api/v1/microservice"
     try:
         response = await AiohttpClient.get(host, headers=headers)
+    except DeadlineExceeded:
+        # Answered with 504 by DeadlineMiddleware.
+        raise
     except Exception as ex:
         logger.bind(payload=str(ex)).error(f"Could not connect to {host}")
         raise HTTPException(
@@ -59,6 +68,7 @@ async def readiness_check(idempotency_key: Optional[str] = Header(None)):
                 code=404, message=f"Could not connect to {host}"
             ).dict(exclude_none=True),
         )
+    record_timing(request, note="upstream")
     # print(response.text)
     if settings.USE_REDIS and not await RedisClient.ping():
         logger.error("Could not connect to Redis")
@@ -68,6 +78,8 @@ async def readiness_check(idempotency_key: Optional[str] = Header(None)):
                 exclude_none=True
             ),
         )
+    if settings.USE_REDIS:
+        record_timing(request, note="redis")
     return ReadyResponse(status="ok")
 
 
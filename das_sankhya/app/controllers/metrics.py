@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""Metrics controller."""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from das_sankhya.core.metrics import CONTENT_TYPE, registry
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    tags=["metrics"],
+    response_class=PlainTextResponse,
+    summary="Prometheus metrics of all workers.",
+    status_code=200,
+)
+def metrics():
+    """Expose the metrics registry in Prometheus text format.
+
+    Values are aggregated over every gunicorn worker sharing the metrics
+    directory, so any worker can answer the scrape. Declared as a plain
+    function so that reading the worker segments runs in the threadpool
+    instead of on the event loop.
+    \f
+
+    Returns:
+        response (PlainTextResponse): Text exposition format, version 0.0.4.
+
+    """
+    return PlainTextResponse(registry.collect(), media_type=CONTENT_TYPE)
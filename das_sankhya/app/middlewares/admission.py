@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""Adaptive admission control middleware.
+
+Each worker admits at most ``limit`` concurrent requests. Requests over the
+limit wait in a short FIFO queue and get a cheap 503 response with a
+``Retry-After`` header if no slot frees up in time, instead of piling more
+fan-out onto AiohttpClient and Redis while every request slows down.
+
+The limit adapts to the measured latency with AIMD: it grows by one while
+requests complete within the latency target and the limit is actually used,
+and shrinks by a constant factor as soon as they don't.
+"""
+import asyncio
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Iterable
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from das_sankhya.core.metrics import registry
+
+OVERLOADED_BODY = (
+    b'{"error":{"code":503,"message":"Server is overloaded, retry later",'
+    b'"status":"SERVICE_UNAVAILABLE"}}'
+)
+
+QUEUE_DEPTH = registry.gauge(
+    "admission_queue_depth", "Requests waiting for an admission slot."
+)
+CONCURRENCY_LIMIT = registry.gauge(
+    "admission_concurrency_limit", "Current adaptive concurrency limit."
+)
+REJECTED = registry.counter(
+    "admission_rejected",
+    "Requests rejected by admission control.",
+    ("reason",),
+)
+
+
+class AIMDLimit(object):
+    """Additive-increase, multiplicative-decrease concurrency limit.
+
+    Args:
+        initial(int): Starting limit.
+        min_limit(int): Lower bound of the limit.
+        max_limit(int): Upper bound of the limit.
+        latency_target(float): Requests slower than this, in seconds, shrink
+            the limit.
+        backoff(float): Factor applied to the limit when shrinking.
+
+    """
+
+    def __init__(
+        self,
+        initial: int = 100,
+        min_limit: int = 10,
+        max_limit: int = 1000,
+        latency_target: float = 0.5,
+        backoff: float = 0.9,
+    ):
+        """Initialize AIMDLimit class object instance."""
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self._limit = float(min(max(initial, min_limit), max_limit))
+
+    @property
+    def limit(self) -> int:
+        """Return the current limit."""
+        return int(self._limit)
+
+    def update(self, latency: float, in_flight: int) -> None:
+        """Adjust the limit after a request completed.
+
+        Args:
+            latency(float): Handling time of the request, in seconds.
+            in_flight(int): Requests in flight when it completed, itself
+                included.
+
+        """
+        if latency > self.latency_target:
+            self._limit = max(self.min_limit, self._limit * self.backoff)
+        elif in_flight * 2 >= self._limit:
+            # Only grow while the limit is actually what bounds concurrency.
+            self._limit = min(self.max_limit, self._limit + 1)
+
+
+@dataclass
+class AdmissionControlMiddleware:
+    """Shed load above an adaptive per-worker concurrency limit.
+
+    Args:
+        app(ASGIApp): Wrapped ASGI application.
+        limit(AIMDLimit): Adaptive concurrency limit.
+        queue_size(int): Maximum number of requests waiting for a slot,
+            further requests are rejected at once.
+        queue_timeout(float): How long a request waits for a slot before
+            being rejected, in seconds.
+        retry_after(int): Value of the Retry-After header of rejections, in
+            seconds.
+        bypass(Iterable[str]): Path regexes of requests that are never
+            limited, e.g. health checks and metrics scrapes.
+
+    """
+
+    app: ASGIApp
+    limit: AIMDLimit = field(default_factory=AIMDLimit)
+    queue_size: int = 256
+    queue_timeout: float = 0.1
+    retry_after: int = 1
+    bypass: Iterable[str] = ()
+
+    def __post_init__(self) -> None:
+        """Precompile the bypass patterns and prepare the rejection."""
+        patterns = list(self.bypass)
+        self._bypass = (
+            re.compile("|".join("(?:{0})".format(p) for p in patterns))
+            if patterns
+            else None
+        )
+        self._in_flight = 0
+        self._queued = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._rejection_headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(OVERLOADED_BODY)).encode()),
+            (b"retry-after", str(self.retry_after).encode()),
+        ]
+        CONCURRENCY_LIMIT.set(self.limit.limit)
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        """Admit, queue or reject the request."""
+        if scope["type"] != "http" or (
+            self._bypass is not None and self._bypass.match(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if self._in_flight < self.limit.limit:
+            self._in_flight += 1
+        elif self._queued >= self.queue_size:
+            REJECTED.labels("queue_full").inc()
+            await self._reject(send)
+            return
+        elif not await self._wait():
+            REJECTED.labels("timeout").inc()
+            await self._reject(send)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limit.update(time.perf_counter() - start, self._in_flight)
+            CONCURRENCY_LIMIT.set(self.limit.limit)
+            self._release()
+
+    async def _wait(self) -> bool:
+        """Wait in the queue, return whether a slot was handed over."""
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        timeout = loop.call_later(self.queue_timeout, _expire, waiter)
+        self._waiters.append(waiter)
+        self._queued += 1
+        QUEUE_DEPTH.inc()
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if _handed_over(waiter):
+                # Cancelled right after being handed a slot: pass it on.
+                self._release()
+            raise
+        finally:
+            timeout.cancel()
+            if not _handed_over(waiter):
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    # Already skipped over by _release once expired.
+                    pass
+            self._queued -= 1
+            QUEUE_DEPTH.dec()
+
+    def _release(self) -> None:
+        """Hand the slot over to the oldest waiter, or free it."""
+        if self._in_flight <= self.limit.limit:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(True)
+                    return
+        self._in_flight -= 1
+
+    async def _reject(self, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": self._rejection_headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": OVERLOADED_BODY})
+
+
+def _expire(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(False)
+
+
+def _handed_over(waiter: asyncio.Future) -> bool:
+    return waiter.done() and not waiter.cancelled() and waiter.result()
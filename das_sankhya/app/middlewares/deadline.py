@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Request deadline middleware.
+
+The deadline of a request comes from its ``X-Request-Timeout`` header, in
+seconds, or from the default timeout of its route, whichever is shorter. The
+request is handled in a task that is cancelled once the deadline expires,
+and gets a 504 response unless the response was already started.
+
+The deadline is stored in ``das_sankhya.core.deadline.request_deadline``,
+where AiohttpClient and RedisClient pick it up to cap their own timeouts.
+Redis commands in flight when the handler is cancelled are left to complete
+by RedisClient.
+"""
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from das_sankhya.core.deadline import (
+    DEADLINE_HEADER,
+    DeadlineExceeded,
+    parse_timeout,
+    request_deadline,
+)
+from das_sankhya.core.metrics import registry
+
+DEADLINE_EXCEEDED_BODY = (
+    b'{"error":{"code":504,"message":"Request deadline exceeded",'
+    b'"status":"GATEWAY_TIMEOUT"}}'
+)
+
+DEADLINES_EXCEEDED = registry.counter(
+    "request_deadline_exceeded",
+    "Requests abandoned because their deadline expired.",
+)
+
+
+@dataclass
+class DeadlineMiddleware:
+    """Cancel requests whose deadline expired.
+
+    Args:
+        app(ASGIApp): Wrapped ASGI application.
+        header(str): Request header carrying the caller's timeout, in
+            seconds.
+        default_timeout(float, optional): Timeout of requests without header
+            nor route timeout, None for no deadline.
+        routes(Dict[str, float]): Path regexes mapped to the default timeout
+            of their requests, in seconds.
+        max_timeout(float, optional): Upper bound of timeouts asked by
+            callers.
+
+    """
+
+    app: ASGIApp
+    header: str = DEADLINE_HEADER
+    default_timeout: Optional[float] = None
+    routes: Dict[str, float] = field(default_factory=dict)
+    max_timeout: Optional[float] = None
+
+    def __post_init__(self) -> None:
+        """Precompute the header name and route patterns."""
+        self._header_name = self.header.lower().encode("latin-1")
+        self._routes = [
+            (re.compile(pattern), timeout)
+            for pattern, timeout in self.routes.items()
+        ]
+        self._rejection_headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(DEADLINE_EXCEEDED_BODY)).encode()),
+        ]
+
+    def _timeout(self, scope: Scope) -> Optional[float]:
+        timeout = self.default_timeout
+        for pattern, route_timeout in self._routes:
+            if pattern.fullmatch(scope["path"]):
+                timeout = route_timeout
+                break
+        for name, value in scope["headers"]:
+            if name == self._header_name:
+                asked = parse_timeout(value.decode("latin-1"))
+                if asked is not None:
+                    if self.max_timeout is not None:
+                        asked = min(asked, self.max_timeout)
+                    if timeout is None or asked < timeout:
+                        timeout = asked
+                break
+        return timeout
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        """Run the request under its deadline, if it has one."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timeout = self._timeout(scope)
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        deadline = time.monotonic() + timeout
+        token = request_deadline.set(deadline)
+        try:
+            await asyncio.wait_for(
+                self.app(scope, receive, send_wrapper), timeout
+            )
+        except asyncio.TimeoutError as ex:
+            # Either the deadline cancelled the handler, or an outbound call
+            # capped at the deadline gave up first; other timeouts are errors.
+            if (
+                not isinstance(ex, DeadlineExceeded)
+                and time.monotonic() < deadline
+            ):
+                raise
+            DEADLINES_EXCEEDED.inc()
+            if not started:
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 504,
+                        "headers": self._rejection_headers,
+                    }
+                )
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": DEADLINE_EXCEEDED_BODY,
+                    }
+                )
+        finally:
+            request_deadline.reset(token)
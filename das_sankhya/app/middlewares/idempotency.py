@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*-
+"""Idempotent response replay middleware.
+
+The first completed response to a request carrying an ``Idempotency-Key``
+header is stored under that key; retries of the same request get the stored
+response instead of running the handler again. While the first request is
+still being handled it holds an in-flight lock, so concurrent duplicates wait
+for its result instead of all hitting the backend at once. If it stores no
+response, one of them takes the lock over, and the others wait for it in
+turn, until ``lock_timeout`` expires.
+
+If the Redis backend is unavailable, requests are handled without replay,
+with a warning, rather than failing.
+
+The key is read from the ``TracingContext`` set by ``TracingMiddleware``, so
+this middleware has to be added before it (i.e. run inside it).
+
+Per-request headers (``Server-Timing`` and the tracing IDs) are not stored:
+the timing and tracing middlewares, run outside this one, stamp them on
+replayed responses as on any other.
+"""
+import asyncio
+import re
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aioredis.exceptions import RedisError
+from loguru import logger
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from das_sankhya.middlewares.asgi_correlation_id.context import (
+    tracing_context,
+)
+from das_sankhya.utils import RedisClient
+
+try:
+    from orjson import dumps, loads
+except ImportError:
+    from json import dumps as _dumps, loads
+
+    def dumps(obj):
+        """Serialize obj to JSON bytes, matching orjson.dumps."""
+        return _dumps(obj).encode("utf-8")
+
+
+REPLAYED_HEADER = (b"idempotent-replayed", b"true")
+# Stamped again on replayed responses, by the middlewares outside this one.
+UNSTORED_HEADERS = frozenset(
+    (b"server-timing", b"x-correlation-id", b"x-request-id")
+)
+CONFLICT_BODY = (
+    b'{"error":{"code":409,"message":"A request with the same '
+    b'Idempotency-Key is still being processed","status":"CONFLICT"}}'
+)
+# Deletes the lock only if it is still held by the releasing request.
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def encode_record(status: int, headers: Iterable, body: bytes) -> bytes:
+    """Serialize a captured response for storage.
+
+    Args:
+        status(int): Response status code.
+        headers(Iterable): Raw response headers as (bytes, bytes) tuples.
+        body(bytes): Complete response body.
+
+    Returns:
+        bytes: JSON document; bytes are stored as latin-1 strings, which
+            round-trips every byte value.
+
+    """
+    return dumps(
+        {
+            "status": status,
+            "headers": [
+                [name.decode("latin-1"), value.decode("latin-1")]
+                for name, value in headers
+            ],
+            "body": body.decode("latin-1"),
+        }
+    )
+
+
+def decode_record(raw: bytes) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    """Deserialize a response stored by encode_record.
+
+    Args:
+        raw(bytes): JSON document produced by encode_record.
+
+    Returns:
+        tuple: Status code, raw headers and body.
+
+    """
+    record = loads(raw)
+    headers = [
+        (name.encode("latin-1"), value.encode("latin-1"))
+        for name, value in record["headers"]
+    ]
+    return record["status"], headers, record["body"].encode("latin-1")
+
+
+class InMemoryIdempotencyBackend(object):
+    """Process local idempotency store.
+
+    Only coalesces retries that land on the same worker process; use
+    RedisIdempotencyBackend when running several gunicorn workers.
+
+    Args:
+        max_entries(int): Maximum number of stored responses, the oldest are
+            evicted first.
+
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        """Initialize InMemoryIdempotencyBackend class object instance."""
+        self.max_entries = max_entries
+        self._records: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._in_flight: Dict[str, Tuple[str, asyncio.Event]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return the stored response for key, if any and not expired."""
+        entry = self._records.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._records[key]
+            return None
+        return entry[1]
+
+    async def acquire(self, key: str, ttl: float) -> Optional[str]:
+        """Take the in-flight lock for key.
+
+        Returns:
+            The lock token, to release it with, or None if already held.
+
+        """
+        if key in self._in_flight:
+            return None
+        token = secrets.token_hex(16)
+        self._in_flight[key] = (token, asyncio.Event())
+        return token
+
+    async def release(self, key: str, token: str) -> None:
+        """Release the in-flight lock for key, if still held with token."""
+        entry = self._in_flight.get(key)
+        if entry is not None and entry[0] == token:
+            del self._in_flight[key]
+            entry[1].set()
+
+    async def store(
+        self, key: str, record: bytes, ttl: float, token: str
+    ) -> None:
+        """Store the response for key and release its in-flight lock."""
+        self._records[key] = (time.monotonic() + ttl, record)
+        self._records.move_to_end(key)
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+        await self.release(key, token)
+
+    async def wait(self, key: str, timeout: float) -> Optional[bytes]:
+        """Wait until the in-flight request for key completes.
+
+        Returns:
+            The stored response, or None if the lock holder did not store one
+            (error, uncacheable response) or the timeout expired.
+
+        """
+        entry = self._in_flight.get(key)
+        if entry is not None:
+            try:
+                await asyncio.wait_for(entry[1].wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return await self.get(key)
+
+
+class RedisIdempotencyBackend(object):
+    """Idempotency store shared by all workers through RedisClient.
+
+    The in-flight lock is a separate ``<key>:lock`` entry set with NX and an
+    expiry, so a crashed worker cannot hold it forever. It holds a random
+    token, and is only deleted by a script comparing it, so a request whose
+    lock expired does not release the lock taken over by another. Waiters
+    poll for the stored response with a capped exponential backoff.
+
+    Args:
+        poll_interval(float): Initial delay between polls, in seconds.
+        max_poll_interval(float): Maximum delay between polls, in seconds.
+
+    """
+
+    def __init__(
+        self, poll_interval: float = 0.01, max_poll_interval: float = 0.2
+    ):
+        """Initialize RedisIdempotencyBackend class object instance."""
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return the stored response for key, if any."""
+        return await RedisClient.get(key)
+
+    async def acquire(self, key: str, ttl: float) -> Optional[str]:
+        """Take the in-flight lock for key.
+
+        Returns:
+            The lock token, to release it with, or None if already held.
+
+        """
+        token = secrets.token_hex(16)
+        acquired = await RedisClient.set(
+            "{0}:lock".format(key), token, px=int(ttl * 1000), nx=True
+        )
+        return token if acquired else None
+
+    async def release(self, key: str, token: str) -> None:
+        """Release the in-flight lock for key, if still held with token."""
+        await RedisClient.eval(
+            RELEASE_LOCK_SCRIPT, keys=["{0}:lock".format(key)], args=[token]
+        )
+
+    async def store(
+        self, key: str, record: bytes, ttl: float, token: str
+    ) -> None:
+        """Store the response for key and release its in-flight lock."""
+        await RedisClient.set(key, record, px=int(ttl * 1000))
+        await self.release(key, token)
+
+    async def wait(self, key: str, timeout: float) -> Optional[bytes]:
+        """Poll until the in-flight request for key completes.
+
+        Returns:
+            The stored response, or None if the lock was released without a
+            stored response or the timeout expired.
+
+        """
+        deadline = time.monotonic() + timeout
+        delay = self.poll_interval
+        while True:
+            record = await RedisClient.get(key)
+            if record is not None:
+                return record
+            if not await RedisClient.exists("{0}:lock".format(key)):
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.max_poll_interval)
+
+
+@dataclass
+class IdempotencyMiddleware:
+    """Replay stored responses for retried requests with an Idempotency-Key.
+
+    Args:
+        app(ASGIApp): Wrapped ASGI application.
+        backend: InMemoryIdempotencyBackend or RedisIdempotencyBackend
+            instance.
+        routes(Dict[str, float]): Opt-in routes, mapping a path regex to the
+            TTL in seconds of responses stored for it (0 uses ttl).
+        methods(Iterable[str]): HTTP methods eligible for replay.
+        ttl(float): Default TTL in seconds of stored responses.
+        max_body_size(int): Responses with a larger body are not stored.
+        lock_timeout(float): How long duplicates wait for the in-flight
+            request, or the ones taking over from it, before getting a 409
+            Conflict response, in seconds.
+
+    """
+
+    app: ASGIApp
+    backend: object = field(default_factory=InMemoryIdempotencyBackend)
+    routes: Dict[str, float] = field(default_factory=dict)
+    methods: Iterable[str] = ("POST", "PUT", "PATCH", "DELETE")
+    ttl: float = 86400
+    max_body_size: int = 65536
+    lock_timeout: float = 10
+
+    def __post_init__(self) -> None:
+        """Precompile the route patterns."""
+        self.methods = frozenset(method.upper() for method in self.methods)
+        self._routes = [
+            (re.compile(pattern), ttl or self.ttl)
+            for pattern, ttl in self.routes.items()
+        ]
+
+    def _route_ttl(self, path: str) -> Optional[float]:
+        for pattern, ttl in self._routes:
+            if pattern.fullmatch(path):
+                return ttl
+        return None
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        """Replay, wait for, or record the response for idempotent requests."""
+        if scope["type"] != "http" or scope["method"] not in self.methods:
+            await self.app(scope, receive, send)
+            return
+
+        ctx = tracing_context.get()
+        ttl = self._route_ttl(scope["path"])
+        if ctx is None or ctx.idempotency_key is None or ttl is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = "idempotency:{0}:{1}:{2}".format(
+            scope["method"], scope["path"], ctx.idempotency_key
+        )
+        try:
+            record, token = await self._claim(key)
+        except RedisError as ex:
+            logger.warning(
+                "Idempotency backend unavailable, handling request without "
+                "replay: {0}",
+                ex,
+            )
+            await self.app(scope, receive, send)
+            return
+        if token is not None:
+            await self._record(key, token, ttl, scope, receive, send)
+            return
+        if record is None:
+            await self._conflict(send)
+            return
+
+        status, headers, body = decode_record(record)
+        headers.append(REPLAYED_HEADER)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def _claim(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """Return the stored response for key, or take its in-flight lock.
+
+        Returns:
+            tuple: The stored response and the lock token, both None if the
+                lock was still held when lock_timeout expired.
+
+        """
+        record = await self.backend.get(key)
+        give_up = time.monotonic() + self.lock_timeout
+        while record is None:
+            token = await self.backend.acquire(key, self.lock_timeout)
+            if token is not None:
+                return None, token
+            remaining = give_up - time.monotonic()
+            if remaining <= 0:
+                return None, None
+            # None if the holder stored nothing (error or uncacheable
+            # response): try to take over.
+            record = await self.backend.wait(key, remaining)
+        return record, None
+
+    async def _release(self, key: str, token: str) -> None:
+        try:
+            await self.backend.release(key, token)
+        except RedisError as ex:
+            # The lock expires on its own.
+            logger.warning("Could not release idempotency lock: {0}", ex)
+
+    async def _record(
+        self,
+        key: str,
+        token: str,
+        ttl: float,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        start: Dict = {}
+        chunks: List[bytes] = []
+        state = {"size": 0, "complete": False}
+
+        async def capture(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body" and state["size"] >= 0:
+                body = message.get("body", b"")
+                state["size"] += len(body)
+                if state["size"] > self.max_body_size:
+                    # Too big to store, stop buffering.
+                    state["size"] = -1
+                    chunks.clear()
+                else:
+                    chunks.append(body)
+                    state["complete"] = not message.get("more_body", False)
+            await send(message)
+
+        stored = False
+        try:
+            await self.app(scope, receive, capture)
+            if state["complete"] and start.get("status", 500) < 500:
+                headers = [
+                    (name, value)
+                    for name, value in start.get("headers", ())
+                    if name.lower() not in UNSTORED_HEADERS
+                ]
+                record = encode_record(
+                    start["status"], headers, b"".join(chunks)
+                )
+                try:
+                    await self.backend.store(key, record, ttl, token)
+                    stored = True
+                except RedisError as ex:
+                    logger.warning(
+                        "Could not store idempotent response: {0}", ex
+                    )
+        finally:
+            if not stored:
+                await self._release(key, token)
+
+    @staticmethod
+    async def _conflict(send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 409,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(CONFLICT_BODY)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": CONFLICT_BODY})
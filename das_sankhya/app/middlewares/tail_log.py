@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Tail-based request log middleware.
+
+Buffers the low level log records of each request with TailLogBuffer, see
+``das_sankhya.core.log_buffer``, and logs them only if the request raised,
+answered with a 5xx status or took longer than ``latency_threshold``.
+Otherwise the records are dropped and, if ``summary`` is set, replaced by a
+single line. Must run inside TracingMiddleware, whose request ID the
+buffers and summary lines carry.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from loguru import logger
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from das_sankhya.core.log_buffer import TailLogBuffer, tail_log_buffer
+from das_sankhya.middlewares.asgi_correlation_id.context import get_request_id
+
+
+@dataclass
+class TailLogMiddleware:
+    """Log the full detail of failed or slow requests only.
+
+    Args:
+        app(ASGIApp): Wrapped ASGI application.
+        buffer(TailLogBuffer): Buffer installed as filter of the log
+            handlers.
+        latency_threshold(float): Requests slower than this, in seconds, are
+            logged in full.
+        summary(bool): Whether to log one line for requests whose records
+            were dropped.
+
+    """
+
+    app: ASGIApp
+    buffer: TailLogBuffer = field(default=tail_log_buffer)
+    latency_threshold: float = 1.0
+    summary: bool = True
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        """Handle the request with its low level records buffered."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status: Optional[int] = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        token = self.buffer.start(get_request_id())
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            self.buffer.finish(token, flush=True)
+            raise
+        duration = time.perf_counter() - start
+        flush = (
+            status is None
+            or status >= 500
+            or duration >= self.latency_threshold
+        )
+        buffer = self.buffer.finish(token, flush)
+        if not flush and self.summary and (buffer.records or buffer.dropped):
+            logger.info(
+                "{method} {path} {status} in {duration_ms:.1f}ms, "
+                "{count} buffered log records dropped",
+                method=scope["method"],
+                path=scope["path"],
+                status=status,
+                duration_ms=duration * 1000,
+                count=len(buffer.records) + buffer.dropped,
+            )
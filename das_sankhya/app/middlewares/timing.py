@@ -1,70 +1,353 @@
 """
-Based on https://github.com/steinnes/timing-asgi.git and https://github.com/dmontagu/fastapi-utils/blob/master/fastapi_utils/timing.py
+Timing middleware, reporting the wall and CPU time of each request.
 
-The middleware from this module is intended for use during both development and production,
-but only reports timing data at the granularity of individual endpoint calls.
+Based on https://github.com/steinnes/timing-asgi.git and
+https://github.com/dmontagu/fastapi-utils/blob/master/fastapi_utils/timing.py
 
-For more detailed performance investigations (during development only, due to added overhead),
-consider using the coroutine-aware profiling library `yappi`.
+The middleware from this module is intended for use during both development and
+production, but only reports timing data at the granularity of individual
+endpoint calls.
+
+For more detailed performance investigations (during development only, due to
+added overhead), consider using the coroutine-aware profiling library `yappi`.
 """
-import resource
+import re
 import time
-from typing import Any, Callable, Optional
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    Union,
+)
 
 from fastapi import FastAPI
-from starlette.middleware.base import RequestResponseEndpoint
 from starlette.requests import Request
-from starlette.responses import Response
-from starlette.routing import Match, Mount
-from starlette.types import Scope
+from starlette.routing import BaseRoute, Match, Mount, Router
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from das_sankhya.core.diagnostics import (
+    SlowRequestLog,
+    outbound_calls,
+    slow_requests,
+)
+from das_sankhya.core.metrics import registry
+from das_sankhya.middlewares.asgi_correlation_id.context import tracing_context
 
 TIMER_ATTRIBUTE = "__fastapi_utils_timer__"
+SERVER_TIMING_HEADER = b"server-timing"
+# Characters not allowed in a Server-Timing metric name (an RFC 7230 token).
+_NON_TOKEN_CHARS = re.compile(r"[^!#$%&'*+\-.^_`|~0-9A-Za-z]+")
+
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "Wall time of HTTP requests.",
+    ("method", "route", "status"),
+)
+REQUEST_CPU_TIME = registry.histogram(
+    "http_request_cpu_seconds",
+    "Event loop thread CPU time of HTTP requests.",
+    ("method", "route", "status"),
+)
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled."
+)
+# Route label of requests named after their raw path, which would otherwise
+# create a metric series per path requested.
+UNMATCHED_ROUTE = "<unmatched>"
+_PATH_NAME_PREFIX = "<Path: "
+
+Exclude = Optional[Union[str, Iterable[str], Pattern]]
 
 
 def add_timing_middleware(
-    app: FastAPI, record: Optional[Callable[[str], None]] = None, prefix: str = "", exclude: Optional[str] = None
+    app: FastAPI,
+    record: Optional[Callable[[str], None]] = None,
+    prefix: str = "",
+    exclude: Exclude = None,
+    server_timing_routes: Exclude = None,
+    server_timing_header: Optional[str] = None,
+    slow_threshold: Optional[float] = None,
+    slow_routes: Optional[Dict[str, float]] = None,
+    slow_record: Optional[Callable[[Dict], None]] = None,
+    access_record: Optional[Callable[[Dict], None]] = None,
 ) -> None:
     """
-    Adds a middleware to the provided `app` that records timing metrics using the provided `record` callable.
+    Add a middleware to `app` that records timing metrics with `record`.
 
-    Typically `record` would be something like `logger.info` for a `logging.Logger` instance.
+    Typically `record` would be something like `logger.info` for a
+    `logging.Logger` instance.
 
     The provided `prefix` is used when generating route names.
 
-    If `exclude` is provided, timings for any routes containing `exclude`
-    as an exact substring of the generated metric name will not be logged.
-    This provides an easy way to disable logging for routes
-
-    The `exclude` will probably be replaced by a regex match at some point in the future. (PR welcome!)
+    If `exclude` is provided, timings for any routes whose generated metric name
+    matches `exclude` will not be logged. It can be a regex, or an iterable of
+    regexes that are combined into a single precompiled pattern; a plain route
+    name still works as before. This provides an easy way to disable logging for
+    routes
+
+    A `Server-Timing` response header listing the `record_timing` splits and the
+    total is added to responses of paths matching `server_timing_routes` (same
+    forms as `exclude`), and to any response whose request carries the
+    `server_timing_header` header.
+
+    Requests slower than `slow_threshold` seconds, or than the threshold of the
+    first `slow_routes` path regex they match, are reported with their splits,
+    outbound calls and tracing IDs to the
+    `das_sankhya.core.diagnostics.slow_requests` ring buffer and to
+    `slow_record`.
+
+    If `access_record` is provided, it is called once per request, with a dict
+    holding its method, path, route template, status, response body bytes, wall
+    and CPU time, `record_timing` splits and tracing IDs, in place of the
+    `TIMING` lines.
     """
-    metric_namer = _MetricNamer(prefix=prefix, app=app)
-
-    @app.middleware("http")
-    async def timing_middleware(request: Request, call_next: RequestResponseEndpoint) -> Response:
-        metric_name = metric_namer(request.scope)
-        with _TimingStats(metric_name, record=record, exclude=exclude) as timer:
-            setattr(request.state, TIMER_ATTRIBUTE, timer)
-            response = await call_next(request)
-        return response
+    app.add_middleware(
+        TimingMiddleware,
+        router=app.router,
+        record=record,
+        prefix=prefix,
+        exclude=exclude,
+        server_timing_routes=server_timing_routes,
+        server_timing_header=server_timing_header,
+        slow_threshold=slow_threshold,
+        slow_routes=slow_routes,
+        slow_record=slow_record,
+        access_record=access_record,
+    )
 
 
 def record_timing(request: Request, note: Optional[str] = None) -> None:
     """
-    Call this function at any point that you want to display elapsed time during the handling of a single request
+    Record a split of the time elapsed handling the current request.
 
-    This can help profile which piece of a request is causing a performance bottleneck.
+    Call this function at any point that you want to display elapsed time during
+    the handling of a single request. This can help profile which piece of a
+    request is causing a performance bottleneck. The time since the previous
+    split is kept under `note`, and reported in the `Server-Timing` response
+    header when it is enabled for the request.
 
-    Note that for this function to succeed, the request should have been generated by a FastAPI app
-    that has had timing middleware added using the `fastapi_utils.timing.add_timing_middleware` function.
+    Note that for this function to succeed, the request should have been
+    generated by a FastAPI app that has had timing middleware added using the
+    `fastapi_utils.timing.add_timing_middleware` function.
     """
     timer = getattr(request.state, TIMER_ATTRIBUTE, None)
     if timer is not None:
         assert isinstance(timer, _TimingStats)
-        timer.emit(note)
+        if timer.log_splits:
+            timer.emit(note)
+        elif note is not None:
+            timer.add_split(note)
     else:
         raise ValueError("No timer present on request")
 
 
+class TimingMiddleware:
+    """
+    Pure ASGI middleware timing every HTTP request.
+
+    The timer is stored in the request state, where `record_timing` looks for
+    it, and the metric name is only resolved when timing data is emitted, i.e.
+    after routing has stored the matched endpoint in the scope.
+
+    When the path matches `server_timing_routes`, or the request has the
+    `server_timing_header` header, the `record_timing` splits are sent in a
+    `Server-Timing` response header.
+
+    Slow requests, as defined by `slow_threshold` and `slow_routes`, get a
+    report kept in `slow_log` and passed to `slow_record`. Outbound calls are
+    only collected, in `das_sankhya.core.diagnostics.outbound_calls`, when slow
+    request capture is enabled.
+
+    With `access_record`, the `TIMING` lines of each request, splits included,
+    are replaced by a single access record holding the splits, which makes the
+    access logs of the server redundant.
+
+    Every request is also observed in the wall and CPU time histograms of
+    `das_sankhya.core.metrics`, labelled by method, route name and status code,
+    even when its route is excluded from the timing log.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        router: Router,
+        record: Optional[Callable[[str], None]] = None,
+        prefix: str = "",
+        exclude: Exclude = None,
+        cache_size: int = 1024,
+        server_timing_routes: Exclude = None,
+        server_timing_header: Optional[str] = None,
+        slow_threshold: Optional[float] = None,
+        slow_routes: Optional[Dict[str, float]] = None,
+        slow_record: Optional[Callable[[Dict], None]] = None,
+        slow_log: SlowRequestLog = slow_requests,
+        access_record: Optional[Callable[[Dict], None]] = None,
+    ) -> None:
+        """Compile the route patterns and slow request thresholds."""
+        self.app = app
+        self.record = record
+        self.metric_namer = _MetricNamer(
+            prefix=prefix, router=router, cache_size=cache_size
+        )
+        self.exclude = _compile_exclude(exclude)
+        self.server_timing_routes = _compile_exclude(server_timing_routes)
+        self.server_timing_header = (
+            server_timing_header.lower().encode("latin-1")
+            if server_timing_header
+            else None
+        )
+        self.slow_threshold = slow_threshold
+        self.slow_routes = [
+            (re.compile(pattern), threshold)
+            for pattern, threshold in (slow_routes or {}).items()
+        ]
+        self.slow_record = slow_record
+        self.slow_log = slow_log
+        self.access_record = access_record
+        thresholds = [threshold for _, threshold in self.slow_routes]
+        if slow_threshold is not None:
+            thresholds.append(slow_threshold)
+        # Requests faster than every threshold skip the per-route lookup.
+        self._min_slow_threshold = min(thresholds) if thresholds else None
+
+    def _wants_server_timing(self, scope: Scope) -> bool:
+        if (
+            self.server_timing_routes is not None
+            and self.server_timing_routes.search(scope["path"])
+        ):
+            return True
+        if self.server_timing_header is not None:
+            for name, _ in scope["headers"]:
+                if name == self.server_timing_header:
+                    return True
+        return False
+
+    def _slow_request_threshold(self, path: str) -> Optional[float]:
+        for pattern, threshold in self.slow_routes:
+            if pattern.search(path):
+                return threshold
+        return self.slow_threshold
+
+    def _capture_slow_request(
+        self, scope: Scope, timer: "_TimingStats", status: int, threshold: float
+    ) -> None:
+        ctx = tracing_context.get()
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": timer.name,
+            "status": status,
+            "wall_ms": round(timer.time * 1e3, 3),
+            "cpu_ms": round(timer.cpu_time * 1e3, 3),
+            "threshold_ms": threshold * 1e3,
+            "splits": [
+                {"name": note, "ms": round(ms, 3)} for note, ms in timer.splits
+            ],
+            "calls": [
+                {"kind": kind, "target": target, "ms": round(duration * 1e3, 3)}
+                for kind, target, duration in outbound_calls.get() or ()
+            ],
+            "correlation_id": ctx.correlation_id if ctx is not None else None,
+            "request_id": ctx.request_id if ctx is not None else None,
+            "idempotency_key": ctx.idempotency_key if ctx is not None else None,
+        }
+        self.slow_log.add(entry)
+        if self.slow_record is not None:
+            self.slow_record(entry)
+
+    def _access_entry(
+        self, scope: Scope, timer: "_TimingStats", status: int, body_bytes: int
+    ) -> Dict:
+        ctx = tracing_context.get()
+        return {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": self.metric_namer.template(scope),
+            "status": status,
+            "bytes": body_bytes,
+            "wall_ms": round(timer.time * 1e3, 3),
+            "cpu_ms": round(timer.cpu_time * 1e3, 3),
+            "splits": [
+                {"name": note, "ms": round(ms, 3)} for note, ms in timer.splits
+            ],
+            "correlation_id": ctx.correlation_id if ctx is not None else None,
+            "request_id": ctx.request_id if ctx is not None else None,
+            "idempotency_key": ctx.idempotency_key if ctx is not None else None,
+        }
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        """Time the request, then record its metrics and timing data."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timer = _TimingStats(
+            record=self.record,
+            exclude=self.exclude,
+            scope=scope,
+            namer=self.metric_namer,
+            log_splits=self.access_record is None,
+        )
+        scope.setdefault("state", {})[TIMER_ATTRIBUTE] = timer
+        status = 500
+        body_bytes = 0
+        server_timing = self._wants_server_timing(scope)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, body_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if server_timing:
+                    headers = list(message.get("headers", ()))
+                    headers.append(
+                        (SERVER_TIMING_HEADER, timer.server_timing())
+                    )
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                body_bytes += len(message.get("body", b""))
+            await send(message)
+
+        calls_token = (
+            outbound_calls.set([])
+            if self._min_slow_threshold is not None
+            else None
+        )
+        REQUESTS_IN_FLIGHT.inc()
+        timer.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            timer.take_split()
+            REQUESTS_IN_FLIGHT.dec()
+            labels = (scope["method"], timer.metric_label, status)
+            REQUEST_DURATION.labels(*labels).observe(timer.time)
+            REQUEST_CPU_TIME.labels(*labels).observe(timer.cpu_time)
+            if self.access_record is None:
+                timer.emit()
+            elif not timer.silent:
+                self.access_record(
+                    self._access_entry(scope, timer, status, body_bytes)
+                )
+            if calls_token is not None:
+                if timer.time >= self._min_slow_threshold:
+                    threshold = self._slow_request_threshold(scope["path"])
+                    if threshold is not None and timer.time >= threshold:
+                        self._capture_slow_request(
+                            scope, timer, status, threshold
+                        )
+                outbound_calls.reset(calls_token)
+
+
 class _TimingStats:
     """
     This class tracks and records endpoint timing data.
@@ -72,44 +355,106 @@ class _TimingStats:
     Should be used as a context manager; on exit, timing stats will be emitted.
 
     name:
-        The name to include with the recorded timing data
+        The name to include with the recorded timing data. If not given, it is
+        resolved from `scope` with `namer` the first time it is needed.
     record:
-        The callable to call on generated messages. Defaults to `print`, but typically
-        something like `logger.info` for a `logging.Logger` instance would be preferable.
+        The callable to call on generated messages. Defaults to `print`, but
+        typically something like `logger.info` for a `logging.Logger` instance
+        would be preferable.
     exclude:
-        An optional string; if it is not None and occurs inside `name`, no stats will be emitted
+        An optional regex (string or compiled pattern); if it is not None and
+        matches `name`, no stats will be emitted
+    log_splits:
+        Whether `record_timing` emits a `TIMING` line per split. If False, the
+        splits are only kept, for the access record and `Server-Timing`.
+
+    Notes given to `emit` are kept in `splits` along with the time elapsed since
+    the previous split, in milliseconds, whether or not stats are emitted.
     """
 
     def __init__(
-        self, name: Optional[str] = None, record: Callable[[str], None] = None, exclude: Optional[str] = None
+        self,
+        name: Optional[str] = None,
+        record: Callable[[str], None] = None,
+        exclude: Exclude = None,
+        scope: Optional[Scope] = None,
+        namer: Optional["_MetricNamer"] = None,
+        log_splits: bool = True,
     ) -> None:
-        self.name = name
+        self._name = name
         self.record = record or print
+        self.exclude = _compile_exclude(exclude)
+        self.scope = scope
+        self.namer = namer
+        self.log_splits = log_splits
+
+        self.start_time: int = 0
+        self.start_cpu_time: int = 0
+        self.end_cpu_time: int = 0
+        self.end_time: int = 0
+        self.splits: List[Tuple[str, float]] = []
+        self._last_split_time: int = 0
+        self._silent: Optional[bool] = None
 
-        self.start_time: float = 0
-        self.start_cpu_time: float = 0
-        self.end_cpu_time: float = 0
-        self.end_time: float = 0
-        self.silent: bool = False
+    @property
+    def name(self) -> Optional[str]:
+        if (
+            self._name is None
+            and self.namer is not None
+            and self.scope is not None
+        ):
+            self._name = self.namer(self.scope)
+        return self._name
 
-        if self.name is not None and exclude is not None and (exclude in self.name):
-            self.silent = True
+    @property
+    def metric_label(self) -> str:
+        name = self.name
+        if name is None or name.startswith(_PATH_NAME_PREFIX):
+            return UNMATCHED_ROUTE
+        return name
+
+    @property
+    def silent(self) -> bool:
+        if self._silent is None:
+            name = self.name
+            self._silent = (
+                name is not None
+                and self.exclude is not None
+                and self.exclude.search(name) is not None
+            )
+        return self._silent
 
     def start(self) -> None:
-        self.start_time = time.time()
-        self.start_cpu_time = _get_cpu_time()
+        self.start_time = time.perf_counter_ns()
+        self.start_cpu_time = _get_cpu_time_ns()
+        self._last_split_time = self.start_time
 
     def take_split(self) -> None:
-        self.end_time = time.time()
-        self.end_cpu_time = _get_cpu_time()
+        self.end_time = time.perf_counter_ns()
+        self.end_cpu_time = _get_cpu_time_ns()
 
     @property
     def time(self) -> float:
-        return self.end_time - self.start_time
+        return (self.end_time - self.start_time) / 1e9
 
     @property
     def cpu_time(self) -> float:
-        return self.end_cpu_time - self.start_cpu_time
+        return (self.end_cpu_time - self.start_cpu_time) / 1e9
+
+    def add_split(self, note: str) -> None:
+        now = time.perf_counter_ns()
+        self.splits.append((note, (now - self._last_split_time) / 1e6))
+        self._last_split_time = now
+
+    def server_timing(self) -> bytes:
+        """Render the splits so far and the total as a `Server-Timing` value."""
+        total_ms = (time.perf_counter_ns() - self.start_time) / 1e6
+        metrics = [
+            f"{_NON_TOKEN_CHARS.sub('_', note) or 'split'};dur={ms:.1f}"
+            for note, ms in self.splits
+        ]
+        metrics.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(metrics).encode("latin-1")
 
     def __enter__(self) -> "_TimingStats":
         self.start()
@@ -119,14 +464,17 @@ class _TimingStats:
         self.emit()
 
     def emit(self, note: Optional[str] = None) -> None:
-        """
-        Emit timing information, optionally including a specified note
-        """
+        """Emit timing information, optionally including a specified note."""
+        if note is not None:
+            self.add_split(note)
         if not self.silent:
             self.take_split()
-            cpu_ms = 1000 * self.cpu_time
-            wall_ms = 1000 * self.time
-            message = f"TIMING: Wall: {wall_ms:6.1f}ms | CPU: {cpu_ms:6.1f}ms | {self.name}"
+            cpu_ms = (self.end_cpu_time - self.start_cpu_time) / 1e6
+            wall_ms = (self.end_time - self.start_time) / 1e6
+            message = (
+                f"TIMING: Wall: {wall_ms:6.1f}ms | CPU: {cpu_ms:6.1f}ms"
+                f" | {self.name}"
+            )
             if note is not None:
                 message += f" ({note})"
             self.record(message)
@@ -136,49 +484,108 @@ class _MetricNamer:
     """
     This class generates the route "name" used when logging timing records.
 
-    If the route has `endpoint` and `name` attributes, the endpoint's module and route's name will be used
-    (along with an optional prefix that can be used, e.g., to distinguish between multiple mounted ASGI apps).
+    If the route has `endpoint` and `name` attributes, the endpoint's module and
+    route's name will be used (along with an optional prefix that can be used,
+    e.g., to distinguish between multiple mounted ASGI apps).
+
+    By default, in FastAPI the route name is the `__name__` of the route's
+    function (or type if it is a callable class instance).
 
-    By default, in FastAPI the route name is the `__name__` of the route's function (or type if it is a callable class
-    instance).
+    For example, with prefix == "custom", a function defined in the module
+    `app.crud` with name `read_item` would get name `custom.app.crud.read_item`.
+    If the empty string were used as the prefix, the result would be just
+    "app.crud.read_item".
 
-    For example, with prefix == "custom", a function defined in the module `app.crud` with name `read_item`
-    would get name `custom.app.crud.read_item`. If the empty string were used as the prefix, the result would be
-    just "app.crud.read_item".
+    For starlette.routing.Mount instances, the name of the type of `route.app`
+    is used in a slightly different format.
 
-    For starlette.routing.Mount instances, the name of the type of `route.app` is used in a slightly different format.
+    For other routes missing either an endpoint or name, the raw route path is
+    included in the generated name. Such names are only logged, metrics label
+    these requests with `UNMATCHED_ROUTE`.
 
-    For other routes missing either an endpoint or name, the raw route path is included in the generated name.
+    Once the router has handled a request the matched endpoint is in the scope,
+    so the route is found with a dict lookup instead of matching every route,
+    and names are kept in a bounded cache keyed by (method, path template). Only
+    requests that did not match a route fall back to the linear scan.
     """
 
-    def __init__(self, prefix: str, app: FastAPI):
+    def __init__(self, prefix: str, router: Router, cache_size: int = 1024):
         if prefix:
             prefix += "."
         self.prefix = prefix
-        self.app = app
+        self.router = router
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._routes: Dict[Any, BaseRoute] = {}
 
     def __call__(self, scope: Scope) -> str:
-        """
-        Generates the actual name to use when logging timing metrics for a specified ASGI Scope
-        """
-        route = None
-        for r in self.app.router.routes:
+        """Generate the name used when logging timing metrics for a scope."""
+        route = self._find_route(scope)
+        if route is None:
+            return f"{_PATH_NAME_PREFIX}{scope['path']}>"
+
+        key = (scope.get("method"), getattr(route, "path", None), id(route))
+        name = self._cache.get(key)
+        if name is None:
+            name = self._name(route, scope)
+            self._cache[key] = name
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return name
+
+    def template(self, scope: Scope) -> Optional[str]:
+        """Return the path template of the route matching a scope, if any."""
+        route = self._find_route(scope)
+        return getattr(route, "path", None) if route is not None else None
+
+    def _find_route(self, scope: Scope) -> Optional[BaseRoute]:
+        endpoint = scope.get("endpoint")
+        if endpoint is not None:
+            route = self._routes.get(endpoint)
+            if route is None:
+                # Routes may have been added since the map was built.
+                self._routes = {
+                    _route_endpoint(r): r for r in self.router.routes
+                }
+                route = self._routes.get(endpoint)
+            if route is not None:
+                return route
+
+        for r in self.router.routes:
             if r.matches(scope)[0] == Match.FULL:
-                route = r
-                break
+                return r
+        return None
+
+    def _name(self, route: BaseRoute, scope: Scope) -> str:
         if hasattr(route, "endpoint") and hasattr(route, "name"):
-            name = f"{self.prefix}{route.endpoint.__module__}.{route.name}"  # type: ignore
-        elif isinstance(route, Mount):
-            name = f"{type(route.app).__name__}<{route.name!r}>"
-        else:
-            name = str(f"<Path: {scope['path']}>")
-        return name
+            module = route.endpoint.__module__  # type: ignore
+            return f"{self.prefix}{module}.{route.name}"  # type: ignore
+        if isinstance(route, Mount):
+            return f"{type(route.app).__name__}<{route.name!r}>"
+        return f"{_PATH_NAME_PREFIX}{scope['path']}>"
+
 
+def _route_endpoint(route: BaseRoute) -> Any:
+    return getattr(route, "endpoint", None) or getattr(route, "app", None)
 
-def _get_cpu_time() -> float:
+
+def _compile_exclude(exclude: Exclude) -> Optional[Pattern]:
+    """Precompile `exclude` into one regex, alternating several patterns."""
+    if exclude is None or isinstance(exclude, re.Pattern):
+        return exclude
+    if isinstance(exclude, str):
+        exclude = [exclude]
+    patterns = list(exclude)
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+
+
+def _get_cpu_time_ns() -> int:
     """
-    Generates the cpu time to report. Adds the user and system time, following the implementation from timing-asgi
+    Return the CPU time to report, in nanoseconds.
+
+    Uses the CPU time of the calling thread, i.e. the event loop thread, so that
+    log writer or executor threads of the same process are not counted
     """
-    resources = resource.getrusage(resource.RUSAGE_SELF)
-    # add up user time (ru_utime) and system time (ru_stime)
-    return resources[0] + resources[1]
+    return time.thread_time_ns()
@@ -1,12 +1,20 @@
 # -*- coding: utf-8 -*-
 """This project was generated with fastapi-mvc."""
 from .application import settings
+from .http_client import http_client
+from .logs import logs
+from .middlewares import middlewares
+from .monitoring import monitoring
 from .redis import redis
 from .router import router
 
 
 __all__ = (
     settings,
+    http_client,
+    logs,
+    middlewares,
+    monitoring,
     redis,
     router,
 )
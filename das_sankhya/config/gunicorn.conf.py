@@ -6,6 +6,14 @@ https://docs.gunicorn.org/en/latest/settings.html
 """
 import os
 
+from das_sankhya.config.logs import logs
+from das_sankhya.core.log_sinks import drain_all
+from das_sankhya.core.log_transport import (
+    start_log_collector,
+    stop_log_collector,
+)
+from das_sankhya.core.metrics import mark_process_dead, prepare_metrics_dir
+
 
 # Server socket
 #
@@ -160,7 +168,9 @@ tmp_upload_dir = None
 
 errorlog = "-"
 loglevel = os.getenv("FASTAPI_GUNICORN_LOG_LEVEL", "info")
-accesslog = "-"
+# Requests are logged by the access log of TimingMiddleware, see
+# FASTAPI_LOG_ACCESS.
+accesslog = None if logs.LOG_ACCESS else "-"
 access_log_format = os.getenv(
     "FASTAPI_GUNICORN_LOG_FORMAT",
     '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"',
@@ -198,6 +208,56 @@ proc_name = None
 #
 #       A callable that takes a server instance as the sole argument.
 #
+#   on_starting - Called just before the master process is initialized.
+#
+#       A callable that takes a server instance as the sole argument.
+#
+#   child_exit - Called just after a worker has been exited, in the
+#       master process.
+#
+#       A callable that takes a server and worker instance
+#       as arguments.
+#
+#   worker_exit - Called just after a worker has been exited, in the
+#       worker process.
+#
+#       A callable that takes a server and worker instance
+#       as arguments.
+#
+#   on_exit - Called just before exiting Gunicorn.
+#
+#       A callable that takes a server instance as the sole argument.
+#
+
+
+def on_starting(server):
+    """Execute before the master process is initialized."""
+    # Workers inherit FASTAPI_METRICS_DIR and write their metrics there, so
+    # that any of them can serve /metrics for all.
+    directory = prepare_metrics_dir()
+    server.log.info("Metrics directory: %s", directory)
+    if logs.LOG_TRANSPORT == "datagram":
+        # Workers inherit FASTAPI_LOG_SOCKET and send their log records to
+        # the collector, which alone writes to stdout.
+        path = start_log_collector()
+        server.log.info("Log collector socket: %s", path)
+
+
+def child_exit(server, worker):
+    """Execute after a worker exited, in the master process."""
+    mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    """Execute after a worker exited, in the worker process."""
+    # Log records are written by a background thread, write what is left.
+    drain_all()
+
+
+def on_exit(server):
+    """Execute before exiting Gunicorn."""
+    drain_all()
+    stop_log_collector()
 
 
 def post_fork(server, worker):
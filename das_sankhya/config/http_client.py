@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""HTTP client configuration."""
+from typing import List
+
+from pydantic import BaseSettings
+
+
+class HttpClient(BaseSettings):
+    """HTTP client configuration model definition.
+
+    Constructor will attempt to determine the values of any fields not passed
+    as keyword arguments by reading from the environment. Default values will
+    still be used if the matching environment variable is not set.
+
+    Environment variables:
+        FASTAPI_HTTP_COALESCE_GETS
+        FASTAPI_HTTP_COALESCE_HEADERS
+        FASTAPI_HTTP_COALESCE_ID_HEADERS
+
+    Attributes:
+        HTTP_COALESCE_GETS(bool): Whether concurrent identical GET requests
+            of AiohttpClient share one upstream request.
+        HTTP_COALESCE_HEADERS(List[str]): Request headers, as a JSON list,
+            which tell GET requests apart when coalescing, along with the URL.
+            Other headers are ignored: shared requests are sent with the
+            headers of the first caller.
+        HTTP_COALESCE_ID_HEADERS(List[str]): Per-request tracing headers, as
+            a JSON list, whose value is replaced on shared requests by one
+            new ID, logged by every caller, instead of the first caller's.
+
+    """
+
+    HTTP_COALESCE_GETS: bool = False
+    HTTP_COALESCE_HEADERS: List[str] = [
+        "Authorization",
+        "Accept",
+        "Idempotency-Key",
+    ]
+    HTTP_COALESCE_ID_HEADERS: List[str] = ["X-Correlation-ID", "X-Request-ID"]
+
+    class Config:
+        """Config sub-class needed to customize BaseSettings settings.
+
+        More details can be found in pydantic documentation:
+        https://pydantic-docs.helpmanual.io/usage/settings/
+
+        """
+
+        case_sensitive = True
+        env_prefix = "FASTAPI_"
+
+
+http_client = HttpClient()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""Logging configuration."""
+from typing import Dict, Optional
+
+from pydantic import BaseSettings
+
+
+class Logs(BaseSettings):
+    """Logging configuration model definition.
+
+    Constructor will attempt to determine the values of any fields not passed
+    as keyword arguments by reading from the environment. Default values will
+    still be used if the matching environment variable is not set.
+
+    Environment variables:
+        FASTAPI_LOG_SAMPLING_ENABLED
+        FASTAPI_LOG_SAMPLING_RATE
+        FASTAPI_LOG_SAMPLING_EVERY
+        FASTAPI_LOG_SAMPLING_RULES
+        FASTAPI_LOG_SAMPLING_MIN_LEVEL
+        FASTAPI_LOG_SAMPLING_SUMMARY_INTERVAL
+        FASTAPI_LOG_TAIL_ENABLED
+        FASTAPI_LOG_TAIL_LEVEL
+        FASTAPI_LOG_TAIL_LATENCY_THRESHOLD
+        FASTAPI_LOG_TAIL_MAX_RECORDS
+        FASTAPI_LOG_TAIL_MAX_WORKER_RECORDS
+        FASTAPI_LOG_TAIL_SUMMARY
+        FASTAPI_LOG_TRANSPORT
+        FASTAPI_LOG_QUEUE_SIZE
+        FASTAPI_LOG_QUEUE_OVERFLOW
+        FASTAPI_LOG_QUEUE_BLOCK_TIMEOUT
+        FASTAPI_LOG_QUEUE_KEEP_LEVEL
+        FASTAPI_LOG_FILE_DIRECTORY
+        FASTAPI_LOG_FILE_NAME
+        FASTAPI_LOG_FILE_MAX_BYTES
+        FASTAPI_LOG_FILE_INTERVAL
+        FASTAPI_LOG_FILE_PREALLOCATE
+        FASTAPI_LOG_FILE_COMPRESSION
+        FASTAPI_LOG_EXCEPTION_CAPTURE
+        FASTAPI_LOG_EXCEPTION_FULL_TRACEBACKS
+        FASTAPI_LOG_EXCEPTION_MAX_FINGERPRINTS
+        FASTAPI_LOG_EXCEPTION_WINDOW
+        FASTAPI_LOG_DEDUP_ENABLED
+        FASTAPI_LOG_DEDUP_LEVEL
+        FASTAPI_LOG_DEDUP_WINDOW
+        FASTAPI_LOG_DEDUP_MAX_SAMPLES
+        FASTAPI_LOG_ACCESS
+        FASTAPI_LOG_VALUE_MAX_CHARS
+        FASTAPI_LOG_REDACT_VALUES
+
+    Attributes:
+        LOG_SAMPLING_ENABLED(bool): Whether to sample log records per call
+            site. Off by default: sampled records are dropped.
+        LOG_SAMPLING_RATE(float, optional): Default maximum number of records
+            per second logged by each call site, unset for no limit, in which
+            case only the call sites of LOG_SAMPLING_RULES are sampled.
+        LOG_SAMPLING_EVERY(int): Default sampling ratio, only one record in
+            LOG_SAMPLING_EVERY is logged by each call site.
+        LOG_SAMPLING_RULES(Dict[str, Dict[str, float]]): Per call site
+            ``rate`` and ``every``, as a JSON object whose keys are a logger
+            (module or package) name, optionally followed by ``:function``
+            and ``:line``.
+        LOG_SAMPLING_MIN_LEVEL(str): Records of this level or above are never
+            sampled.
+        LOG_SAMPLING_SUMMARY_INTERVAL(float): Period, in seconds, of the
+            "suppressed messages" summaries.
+        LOG_TAIL_ENABLED(bool): Whether to buffer the low level records of
+            each request, and log them only if the request failed or was
+            slow.
+        LOG_TAIL_LEVEL(str): Records of this level or above are never
+            buffered.
+        LOG_TAIL_LATENCY_THRESHOLD(float): Requests slower than this, in
+            seconds, have their buffered records logged.
+        LOG_TAIL_MAX_RECORDS(int): Maximum number of records buffered per
+            request, the oldest are dropped first.
+        LOG_TAIL_MAX_WORKER_RECORDS(int): Maximum number of records buffered
+            by the worker, records beyond it are logged right away.
+        LOG_TAIL_SUMMARY(bool): Whether to log one summary line for requests
+            whose buffered records were dropped.
+        LOG_TRANSPORT(str): Where log records are written: ``stdout``, by
+            each process; ``datagram``, for JSON logs, sent by gunicorn
+            workers to a collector in the arbiter that writes them to stdout
+            in batches; or ``file``, to rotating files, one per process.
+        LOG_QUEUE_SIZE(int): Maximum number of records waiting to be written
+            by each log handler.
+        LOG_QUEUE_OVERFLOW(str): What happens to records logged while the
+            queue is full: ``drop_low`` drops those below
+            LOG_QUEUE_KEEP_LEVEL and queues the others in place of the
+            oldest, ``drop_oldest`` queues every record in place of the
+            oldest, ``block`` waits for room.
+        LOG_QUEUE_BLOCK_TIMEOUT(float): Maximum time, in seconds, the
+            ``block`` policy waits for room before dropping the record.
+        LOG_QUEUE_KEEP_LEVEL(str): Records of this level or above are not
+            dropped by the ``drop_low`` policy.
+        LOG_FILE_DIRECTORY(str): Directory of the log files of the ``file``
+            transport.
+        LOG_FILE_NAME(str): Log file name prefix, followed by the process ID
+            and the file's opening time.
+        LOG_FILE_MAX_BYTES(int): Size, in bytes, at which a log file is
+            rotated.
+        LOG_FILE_INTERVAL(float, optional): Age, in seconds, at which a log
+            file is rotated, unset to rotate by size only.
+        LOG_FILE_PREALLOCATE(bool): Whether to preallocate the disk space of
+            log files.
+        LOG_FILE_COMPRESSION(str, optional): Compression of rotated log
+            files, ``gzip`` or ``zstd`` (requires the zstandard package),
+            unset to keep them uncompressed.
+        LOG_EXCEPTION_CAPTURE(bool): Whether to collapse repeated exceptions
+            of log records to one line with their fingerprint and count.
+        LOG_EXCEPTION_FULL_TRACEBACKS(int): Occurrences of each exception
+            fingerprint logged with their full traceback, per window.
+        LOG_EXCEPTION_MAX_FINGERPRINTS(int): Exception fingerprints counted
+            by each process; past it, counts start over.
+        LOG_EXCEPTION_WINDOW(float): Period, in seconds, after which the
+            count of an exception fingerprint starts over.
+        LOG_DEDUP_ENABLED(bool): Whether to fold repeated records of a call
+            site into periodic summaries.
+        LOG_DEDUP_LEVEL(str): Records below this level are never folded.
+        LOG_DEDUP_WINDOW(float): Period, in seconds, during which repeats of
+            a logged record are folded, and of the summaries.
+        LOG_DEDUP_MAX_SAMPLES(int): Correlation IDs of folded records listed
+            in each summary.
+        LOG_ACCESS(bool): Whether to log one structured access record per
+            request from TimingMiddleware, in place of the uvicorn and
+            gunicorn access logs and of the per-request TIMING line.
+        LOG_VALUE_MAX_CHARS(int): Maximum number of characters of the Redis
+            keys and values and HTTP URLs logged by the client utilities.
+        LOG_REDACT_VALUES(bool): Whether the client utilities log Redis
+            values as their type and length, and HTTP URLs without
+            credentials nor query string.
+
+    """
+
+    LOG_SAMPLING_ENABLED: bool = False
+    LOG_SAMPLING_RATE: Optional[float] = None
+    LOG_SAMPLING_EVERY: int = 1
+    LOG_SAMPLING_RULES: Dict[str, Dict[str, float]] = {}
+    LOG_SAMPLING_MIN_LEVEL: str = "WARNING"
+    LOG_SAMPLING_SUMMARY_INTERVAL: float = 60.0
+    LOG_TAIL_ENABLED: bool = False
+    LOG_TAIL_LEVEL: str = "WARNING"
+    LOG_TAIL_LATENCY_THRESHOLD: float = 1.0
+    LOG_TAIL_MAX_RECORDS: int = 500
+    LOG_TAIL_MAX_WORKER_RECORDS: int = 20000
+    LOG_TAIL_SUMMARY: bool = True
+    LOG_TRANSPORT: str = "stdout"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_QUEUE_OVERFLOW: str = "drop_low"
+    LOG_QUEUE_BLOCK_TIMEOUT: float = 0.05
+    LOG_QUEUE_KEEP_LEVEL: str = "WARNING"
+    LOG_FILE_DIRECTORY: str = "logs"
+    LOG_FILE_NAME: str = "das_sankhya"
+    LOG_FILE_MAX_BYTES: int = 100 << 20
+    LOG_FILE_INTERVAL: Optional[float] = 86400.0
+    LOG_FILE_PREALLOCATE: bool = True
+    LOG_FILE_COMPRESSION: Optional[str] = "gzip"
+    LOG_EXCEPTION_CAPTURE: bool = True
+    LOG_EXCEPTION_FULL_TRACEBACKS: int = 5
+    LOG_EXCEPTION_MAX_FINGERPRINTS: int = 1000
+    LOG_EXCEPTION_WINDOW: float = 300.0
+    LOG_DEDUP_ENABLED: bool = True
+    LOG_DEDUP_LEVEL: str = "WARNING"
+    LOG_DEDUP_WINDOW: float = 10.0
+    LOG_DEDUP_MAX_SAMPLES: int = 5
+    LOG_ACCESS: bool = True
+    LOG_VALUE_MAX_CHARS: int = 256
+    LOG_REDACT_VALUES: bool = False
+
+    class Config:
+        """Config sub-class needed to customize BaseSettings settings.
+
+        More details can be found in pydantic documentation:
+        https://pydantic-docs.helpmanual.io/usage/settings/
+
+        """
+
+        case_sensitive = True
+        env_prefix = "FASTAPI_"
+
+
+logs = Logs()
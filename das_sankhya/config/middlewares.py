@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""HTTP middlewares configuration."""
+from typing import Dict, List, Optional
+
+from pydantic import BaseSettings
+
+
+class Middlewares(BaseSettings):
+    """HTTP middlewares configuration model definition.
+
+    Constructor will attempt to determine the values of any fields not passed
+    as keyword arguments by reading from the environment. Default values will
+    still be used if the matching environment variable is not set.
+
+    Environment variables:
+        FASTAPI_ID_GENERATOR
+        FASTAPI_ID_POOL_SIZE
+        FASTAPI_IDEMPOTENCY_BACKEND
+        FASTAPI_IDEMPOTENCY_ROUTES
+        FASTAPI_IDEMPOTENCY_TTL
+        FASTAPI_IDEMPOTENCY_MAX_BODY_SIZE
+        FASTAPI_IDEMPOTENCY_LOCK_TIMEOUT
+        FASTAPI_SERVER_TIMING_ROUTES
+        FASTAPI_SERVER_TIMING_HEADER
+        FASTAPI_ADMISSION_ENABLED
+        FASTAPI_ADMISSION_INITIAL_LIMIT
+        FASTAPI_ADMISSION_MIN_LIMIT
+        FASTAPI_ADMISSION_MAX_LIMIT
+        FASTAPI_ADMISSION_LATENCY_TARGET
+        FASTAPI_ADMISSION_QUEUE_SIZE
+        FASTAPI_ADMISSION_QUEUE_TIMEOUT
+        FASTAPI_ADMISSION_RETRY_AFTER
+        FASTAPI_ADMISSION_BYPASS
+        FASTAPI_DEADLINE_HEADER
+        FASTAPI_DEADLINE_DEFAULT
+        FASTAPI_DEADLINE_MAX
+        FASTAPI_DEADLINE_ROUTES
+
+    Attributes:
+        ID_GENERATOR(str): Generator used for request and correlation IDs, one
+            of: cuid, uuid4, ulid, pool.
+        ID_POOL_SIZE(int): Number of IDs generated at once by the pool
+            generator.
+        IDEMPOTENCY_BACKEND(str): Where responses replayed for retried
+            requests are stored, either memory (per worker) or redis.
+        IDEMPOTENCY_ROUTES(Dict[str, float]): Routes opted in to response
+            replay, as a JSON object mapping a path regex to the TTL in
+            seconds of stored responses (0 uses IDEMPOTENCY_TTL). Replay is
+            disabled while empty.
+        IDEMPOTENCY_TTL(float): Default TTL of stored responses in seconds.
+        IDEMPOTENCY_MAX_BODY_SIZE(int): Responses with a larger body, in
+            bytes, are not stored.
+        IDEMPOTENCY_LOCK_TIMEOUT(float): How long, in seconds, duplicates of
+            an in-flight request wait for its response.
+        SERVER_TIMING_ROUTES(List[str]): Path regexes of routes whose
+            responses always carry a Server-Timing header, as a JSON list.
+        SERVER_TIMING_HEADER(str): Request header asking for a Server-Timing
+            response header on any route. Empty to disable.
+        ADMISSION_ENABLED(bool): Whether to limit concurrent requests per
+            worker, shedding load above the limit.
+        ADMISSION_INITIAL_LIMIT(int): Starting concurrency limit.
+        ADMISSION_MIN_LIMIT(int): Lower bound of the adaptive limit.
+        ADMISSION_MAX_LIMIT(int): Upper bound of the adaptive limit.
+        ADMISSION_LATENCY_TARGET(float): Requests slower than this, in
+            seconds, shrink the limit.
+        ADMISSION_QUEUE_SIZE(int): Maximum number of requests waiting for a
+            slot.
+        ADMISSION_QUEUE_TIMEOUT(float): How long a request waits for a slot
+            before getting a 503 response, in seconds.
+        ADMISSION_RETRY_AFTER(int): Retry-After of 503 responses, in seconds.
+        ADMISSION_BYPASS(List[str]): Path regexes of requests that are never
+            limited, as a JSON list.
+        DEADLINE_HEADER(str): Request header carrying the caller's timeout in
+            seconds, forwarded downstream with the remaining budget.
+        DEADLINE_DEFAULT(float, optional): Timeout in seconds of requests
+            without header nor route timeout. No deadline if unset.
+        DEADLINE_MAX(float, optional): Upper bound of timeouts asked by
+            callers, in seconds.
+        DEADLINE_ROUTES(Dict[str, float]): Per route default timeouts, as a
+            JSON object mapping a path regex to seconds.
+
+    """
+
+    ID_GENERATOR: str = "ulid"
+    ID_POOL_SIZE: int = 1024
+    IDEMPOTENCY_BACKEND: str = "memory"
+    IDEMPOTENCY_ROUTES: Dict[str, float] = {}
+    IDEMPOTENCY_TTL: float = 86400
+    IDEMPOTENCY_MAX_BODY_SIZE: int = 65536
+    IDEMPOTENCY_LOCK_TIMEOUT: float = 10
+    SERVER_TIMING_ROUTES: List[str] = []
+    SERVER_TIMING_HEADER: str = "X-Server-Timing"
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_INITIAL_LIMIT: int = 100
+    ADMISSION_MIN_LIMIT: int = 10
+    ADMISSION_MAX_LIMIT: int = 1000
+    ADMISSION_LATENCY_TARGET: float = 0.5
+    ADMISSION_QUEUE_SIZE: int = 256
+    ADMISSION_QUEUE_TIMEOUT: float = 0.1
+    ADMISSION_RETRY_AFTER: int = 1
+    ADMISSION_BYPASS: List[str] = ["^/api/v1/ready$", "^/metrics$"]
+    DEADLINE_HEADER: str = "X-Request-Timeout"
+    DEADLINE_DEFAULT: Optional[float] = None
+    DEADLINE_MAX: Optional[float] = None
+    DEADLINE_ROUTES: Dict[str, float] = {}
+
+    class Config:
+        """Config sub-class needed to customize BaseSettings settings.
+
+        More details can be found in pydantic documentation:
+        https://pydantic-docs.helpmanual.io/usage/settings/
+
+        """
+
+        case_sensitive = True
+        env_prefix = "FASTAPI_"
+
+
+middlewares = Middlewares()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Runtime monitoring configuration."""
+from typing import Dict, Optional
+
+from pydantic import BaseSettings
+
+
+class Monitoring(BaseSettings):
+    """Runtime monitoring configuration model definition.
+
+    Constructor will attempt to determine the values of any fields not passed
+    as keyword arguments by reading from the environment. Default values will
+    still be used if the matching environment variable is not set.
+
+    Environment variables:
+        FASTAPI_LOOP_MONITOR_ENABLED
+        FASTAPI_LOOP_MONITOR_INTERVAL
+        FASTAPI_LOOP_STALL_THRESHOLD
+        FASTAPI_SLOW_REQUEST_THRESHOLD
+        FASTAPI_SLOW_REQUEST_ROUTES
+        FASTAPI_SLOW_REQUEST_BUFFER_SIZE
+        FASTAPI_ADMIN_ENABLED
+
+    Attributes:
+        LOOP_MONITOR_ENABLED(bool): Whether to measure event loop lag and
+            capture the stack of stalled loops.
+        LOOP_MONITOR_INTERVAL(float): Lag sampling period, in seconds.
+        LOOP_STALL_THRESHOLD(float): Lag, in seconds, above which the stack
+            of the blocked loop thread is logged.
+        SLOW_REQUEST_THRESHOLD(float, optional): Requests slower than this,
+            in seconds, are reported with full diagnostics. Unset to only
+            report routes listed in SLOW_REQUEST_ROUTES.
+        SLOW_REQUEST_ROUTES(Dict[str, float]): Per route thresholds, as a
+            JSON object mapping a path regex to seconds.
+        SLOW_REQUEST_BUFFER_SIZE(int): Number of slow request reports kept
+            per worker for the admin endpoint.
+        ADMIN_ENABLED(bool): Whether to mount the unauthenticated
+            /admin/slow-requests endpoint, which exposes request paths,
+            stacks and outbound call timings. Only enable it on instances
+            whose port is not reachable by clients.
+
+    """
+
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL: float = 0.1
+    LOOP_STALL_THRESHOLD: float = 0.25
+    SLOW_REQUEST_THRESHOLD: Optional[float] = 1.0
+    SLOW_REQUEST_ROUTES: Dict[str, float] = {}
+    SLOW_REQUEST_BUFFER_SIZE: int = 200
+    ADMIN_ENABLED: bool = False
+
+    class Config:
+        """Config sub-class needed to customize BaseSettings settings.
+
+        More details can be found in pydantic documentation:
+        https://pydantic-docs.helpmanual.io/usage/settings/
+
+        """
+
+        case_sensitive = True
+        env_prefix = "FASTAPI_"
+
+
+monitoring = Monitoring()
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 """Redis configuration."""
+from typing import Optional
+
 from pydantic import BaseSettings
 
 
@@ -16,6 +18,7 @@ class Redis(BaseSettings):
         FASTAPI_REDIS_USERNAME
         FASTAPI_REDIS_PASSWORD
         FASTAPI_REDIS_USE_SENTINEL
+        FASTAPI_REDIS_SOCKET_TIMEOUT
 
     Attributes:
         REDIS_HOTS(str): Redis host.
@@ -23,6 +26,9 @@ class Redis(BaseSettings):
         REDIS_USERNAME(str): Redis username.
         REDIS_PASSWORD(str): Redis password.
         REDIS_USE_SENTINEL(bool): If provided Redis config is for Sentinel.
+        REDIS_SOCKET_TIMEOUT(float, optional): Timeout, in seconds, of Redis
+            replies, past which the connection is closed. Bounds commands
+            left to complete after their request deadline expired.
 
     """
 
@@ -31,6 +37,7 @@ class Redis(BaseSettings):
     REDIS_USERNAME: str = None
     REDIS_PASSWORD: str = None
     REDIS_USE_SENTINEL: bool = False
+    REDIS_SOCKET_TIMEOUT: Optional[float] = 5.0
 
     class Config:
         """Config sub-class needed to customize BaseSettings settings.
@@ -3,9 +3,17 @@
 In this file all application endpoints are being defined.
 """
 from fastapi import APIRouter
-from das_sankhya.config import settings
+from das_sankhya.config import monitoring, settings
+from das_sankhya.app.controllers import admin, metrics
 from das_sankhya.app.controllers.api.v1 import ready
 
-router = APIRouter(prefix="/api/v1")
+api_v1 = APIRouter(prefix="/api/v1")
 
-router.include_router(ready.router, tags=["ready"])
+api_v1.include_router(ready.router, tags=["ready"])
+
+router = APIRouter()
+
+router.include_router(api_v1)
+router.include_router(metrics.router, tags=["metrics"])
+if monitoring.ADMIN_ENABLED:
+    router.include_router(admin.router, tags=["admin"])
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Structured access log.
+
+TimingMiddleware builds one access entry per request, with its method, path,
+route template, status, response body bytes, wall and CPU time,
+record_timing splits and tracing IDs, and log_access() logs it as a single
+record: the entry is formatted into the message once, and its fields are the
+record extras, which the JSON encoder serializes with the rest of the record.
+
+It replaces the access logs of uvicorn and gunicorn, which go through
+InterceptHandler and their own formatting, and the TIMING lines of each
+request, splits included: disable_server_access_logs() turns the former off.
+Access records carry the ``access`` extra, with which the sampling, dedup and
+tail buffer filters let every one of them through.
+"""
+import logging
+from typing import Dict
+
+from loguru import logger
+
+ACCESS_LOGGERS = ("uvicorn.access", "gunicorn.access")
+
+ACCESS_EXTRA = "access"
+
+ACCESS_FORMAT = (
+    "{method} {path} {status} {bytes}B in {wall_ms:.1f}ms (CPU {cpu_ms:.1f}ms)"
+)
+
+
+_access_logger = logger.bind(**{ACCESS_EXTRA: True})
+
+
+def log_access(entry: Dict) -> None:
+    """Log the access entry of a request."""
+    _access_logger.info(ACCESS_FORMAT, **entry)
+
+
+def disable_server_access_logs() -> None:
+    """Turn off the uvicorn and gunicorn access loggers.
+
+    Disabled loggers return from their logging calls before building a
+    record.
+    """
+    for name in ACCESS_LOGGERS:
+        logging.getLogger(name).disabled = True
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Per-request deadlines.
+
+DeadlineMiddleware stores the time at which the caller gives up on the
+current request in the ``request_deadline`` context variable. Outbound calls
+cap their own timeouts at the remaining budget with the helpers below, and
+forward it downstream in the ``X-Request-Timeout`` header, so no work is done
+for callers that have already given up.
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+DEADLINE_HEADER = "X-Request-Timeout"
+
+T = TypeVar("T")
+
+# time.monotonic() value past which the current request is abandoned.
+request_deadline: ContextVar[Optional[float]] = ContextVar(
+    "request_deadline", default=None
+)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when an operation was cut short by the request deadline."""
+
+
+def remaining() -> Optional[float]:
+    """Return the seconds left before the request deadline.
+
+    Returns:
+        float, optional: Remaining budget, never negative, or None if the
+            current request has no deadline.
+
+    """
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+def cap_timeout(timeout: Optional[float]) -> Optional[float]:
+    """Return timeout capped at the remaining budget.
+
+    Args:
+        timeout(float, optional): Timeout of the operation, None for no
+            timeout.
+
+    Returns:
+        float, optional: The smaller of timeout and the remaining budget.
+
+    """
+    budget = remaining()
+    if budget is None or (timeout is not None and timeout <= budget):
+        return timeout
+    return budget
+
+
+async def with_deadline(
+    awaitable: Awaitable[T], timeout: Optional[float] = None
+) -> T:
+    """Await awaitable, giving up when the request deadline expires.
+
+    awaitable is cancelled when given up on; operations that must not be
+    interrupted, such as Redis commands, are passed shielded.
+
+    Args:
+        awaitable: Operation to run.
+        timeout(float, optional): Own timeout of the operation.
+
+    Returns:
+        The result of awaitable.
+
+    Raises:
+        DeadlineExceeded: If the request deadline expired first.
+        asyncio.TimeoutError: If the operation's own timeout expired first.
+
+    """
+    capped = cap_timeout(timeout)
+    if capped is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, capped)
+    except asyncio.TimeoutError as ex:
+        if capped != timeout:
+            raise DeadlineExceeded("Request deadline exceeded") from ex
+        raise
+
+
+def parse_timeout(value: str) -> Optional[float]:
+    """Parse a timeout header value, in (possibly fractional) seconds.
+
+    Returns:
+        float, optional: Positive timeout, or None if value is invalid.
+
+    """
+    try:
+        timeout = float(value)
+    except ValueError:
+        return None
+    if not 0 < timeout < float("inf"):
+        return None
+    return timeout
+
+
+def format_timeout(timeout: float) -> str:
+    """Format a timeout for the X-Request-Timeout header."""
+    return "{0:.3f}".format(timeout)
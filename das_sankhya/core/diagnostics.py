@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Slow request diagnostics.
+
+While a request is handled, outbound HTTP and Redis calls append their
+duration to the ``outbound_calls`` context variable. When TimingMiddleware
+finds the request slower than its threshold, it builds a report with the
+splits, outbound calls and tracing IDs of the request, keeps it in the
+``slow_requests`` ring buffer (served by the admin controller) and logs it
+with log_slow_request().
+"""
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# (kind, target, duration in seconds) of each outbound call of the request,
+# None outside requests captured by TimingMiddleware.
+outbound_calls: ContextVar[Optional[List[Tuple[str, str, float]]]] = ContextVar(
+    "outbound_calls", default=None
+)
+
+
+def record_call(kind: str, target: str, duration: float) -> None:
+    """Record the duration of an outbound call of the current request.
+
+    Args:
+        kind(str): Kind of call, e.g. http or redis.
+        target(str): What was called, e.g. "GET <url>" or a Redis command.
+        duration(float): Call duration, in seconds.
+
+    """
+    calls = outbound_calls.get()
+    if calls is not None:
+        calls.append((kind, target, duration))
+
+
+class SlowRequestLog(object):
+    """Bounded ring buffer of slow request reports.
+
+    Args:
+        capacity(int): Number of reports kept, the oldest are dropped first.
+
+    """
+
+    def __init__(self, capacity: int = 200):
+        """Initialize SlowRequestLog class object instance."""
+        self._entries: deque = deque(maxlen=capacity)
+
+    @property
+    def capacity(self) -> int:
+        """Number of reports kept."""
+        return self._entries.maxlen
+
+    def resize(self, capacity: int) -> None:
+        """Change the capacity, keeping the newest reports."""
+        self._entries = deque(self._entries, maxlen=capacity)
+
+    def add(self, entry: Dict) -> None:
+        """Store a report."""
+        self._entries.append(entry)
+
+    def entries(self, limit: Optional[int] = None) -> List[Dict]:
+        """Return the stored reports, newest first."""
+        entries = list(reversed(self._entries))
+        return entries if limit is None else entries[:limit]
+
+    def clear(self) -> None:
+        """Drop every stored report."""
+        self._entries.clear()
+
+
+slow_requests = SlowRequestLog()
+
+
+def log_slow_request(entry: Dict) -> None:
+    """Log a slow request report on its own line, with the full report."""
+    logger.bind(payload=entry).warning(
+        "SLOW REQUEST: {method} {path} took {wall_ms:.1f}ms "
+        "(threshold {threshold_ms:.0f}ms, status {status})".format(**entry)
+    )
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""Tail-based per-request log buffering.
+
+TailLogBuffer is a loguru handler filter. While a request runs under
+TailLogMiddleware, records below ``level`` are held in a buffer stored in
+the request's context, alongside its request ID, instead of being formatted
+and written. When the request ends, the middleware either replays the
+buffer, for requests that failed or were slow, or drops it, so only the
+requests that matter are logged in full detail.
+
+Access records are never buffered, every request gets its own. Replayed
+records keep their original time, call site and extras. Memory is
+bounded per request, where the oldest records are dropped first, and per
+worker, where records beyond the bound are logged right away instead of
+being held.
+"""
+import threading
+from collections import deque
+from contextvars import ContextVar, Token
+from functools import partial
+from typing import Dict, Optional, Union
+
+from loguru import logger
+
+from das_sankhya.core.access_log import ACCESS_EXTRA
+from das_sankhya.core.metrics import registry
+
+TAIL_BUFFERS = registry.counter(
+    "log_tail_buffers",
+    "Per-request log buffers, by outcome.",
+    ("outcome",),
+)
+
+
+class RequestLogBuffer(object):
+    """Log records held for one request.
+
+    Args:
+        request_id(str, optional): ID of the request.
+        max_records(int): Maximum number of records held, the oldest are
+            dropped first.
+
+    """
+
+    __slots__ = ("request_id", "records", "dropped", "closed")
+
+    def __init__(self, request_id: Optional[str], max_records: int):
+        """Initialize RequestLogBuffer class object instance."""
+        self.request_id = request_id
+        self.records: deque = deque(maxlen=max_records)
+        self.dropped = 0
+        self.closed = False
+
+
+current_log_buffer: ContextVar[Optional[RequestLogBuffer]] = ContextVar(
+    "current_log_buffer", default=None
+)
+
+
+def _restore(buffered: Dict, record: Dict) -> None:
+    record.update(buffered)
+
+
+class TailLogBuffer(object):
+    """Loguru filter buffering low level records of the current request.
+
+    Args:
+        level(str | int): Records of this level or above are never buffered.
+        max_records(int): Maximum number of records held per request.
+        max_worker_records(int): Maximum number of records held by all the
+            requests of the worker.
+
+    """
+
+    def __init__(
+        self,
+        level: Union[str, int] = "WARNING",
+        max_records: int = 500,
+        max_worker_records: int = 20000,
+    ):
+        """Initialize TailLogBuffer class object instance."""
+        self.configure(level, max_records, max_worker_records)
+        self.held = 0
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        level: Union[str, int] = "WARNING",
+        max_records: int = 500,
+        max_worker_records: int = 20000,
+    ) -> None:
+        """Change the buffered level and memory bounds."""
+        if isinstance(level, str):
+            level = logger.level(level).no
+        self.level = level
+        self.max_records = max_records
+        self.max_worker_records = max_worker_records
+
+    def __call__(self, record: Dict) -> bool:
+        """Whether to log record now, False if it was buffered."""
+        if record["level"].no >= self.level or ACCESS_EXTRA in record["extra"]:
+            return True
+        buffer = current_log_buffer.get()
+        if buffer is None:
+            return True
+        records = buffer.records
+        with self._lock:
+            if buffer.closed:
+                # Tasks spawned by a finished request log directly.
+                return True
+            if len(records) == records.maxlen:
+                # Replaces the oldest record of the request.
+                buffer.dropped += 1
+            elif self.held >= self.max_worker_records:
+                return True
+            else:
+                self.held += 1
+            records.append(record)
+        return False
+
+    def start(self, request_id: Optional[str] = None) -> Token:
+        """Start buffering the records of the current context.
+
+        Args:
+            request_id(str, optional): ID of the request handled in the
+                current context.
+
+        Returns:
+            Token: To pass to finish().
+
+        """
+        return current_log_buffer.set(
+            RequestLogBuffer(request_id, self.max_records)
+        )
+
+    def finish(self, token: Token, flush: bool) -> RequestLogBuffer:
+        """Stop buffering, and replay the buffered records if flush.
+
+        Args:
+            token(Token): Returned by start().
+            flush(bool): Whether to log the buffered records.
+
+        Returns:
+            RequestLogBuffer: The finished buffer.
+
+        """
+        buffer = current_log_buffer.get()
+        current_log_buffer.reset(token)
+        with self._lock:
+            buffer.closed = True
+            self.held -= len(buffer.records)
+        TAIL_BUFFERS.labels("flushed" if flush else "dropped").inc()
+        if flush:
+            if buffer.dropped:
+                logger.info(
+                    "{dropped} older log records of this request were dropped",
+                    dropped=buffer.dropped,
+                )
+            for record in buffer.records:
+                logger.patch(partial(_restore, record)).log(
+                    record["level"].name, record["message"]
+                )
+        return buffer
+
+
+tail_log_buffer = TailLogBuffer()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Aggregation of repeated log records.
+
+DedupFilter is a loguru handler filter for records at or above ``level``, which
+SamplingFilter never drops, other than access records. Records are fingerprinted
+by their level and call site, the (logger name, function, line) of the logging
+call, i.e. one message template. The first record of a fingerprint is logged and
+opens a ``window`` seconds long window; the following records of the window are
+counted instead, along with a few of their correlation IDs.
+
+A daemon thread logs, every ``window`` seconds, one summary per fingerprint
+that had repeats, at the level of the folded records, with the count, the
+last message and the sample correlation IDs, which are also bound as the
+``correlation_ids`` extra.
+"""
+import os
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple, Union
+
+from loguru import logger
+
+from das_sankhya.core.access_log import ACCESS_EXTRA
+
+Fingerprint = Tuple[int, str, str, int]
+
+# Filters to reset in forked children.
+_filters: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for dedup_filter in list(_filters):
+        dedup_filter._reset()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class _Repeats(object):
+    """Records folded for a fingerprint in the current window."""
+
+    __slots__ = ("level", "started", "count", "message", "correlation_ids")
+
+    def __init__(self, level: str, started: float):
+        self.level = level
+        self.started = started
+        self.count = 0
+        self.message = ""
+        self.correlation_ids: List[str] = []
+
+
+class DedupFilter(object):
+    """Loguru filter folding repeated records into periodic summaries.
+
+    Args:
+        level(str | int): Records below this level always pass.
+        window(float): Period, in seconds, during which records of a
+            fingerprint are folded after the first one, and of the
+            summaries.
+        max_samples(int): Correlation IDs kept per summary.
+
+    """
+
+    def __init__(
+        self,
+        level: Union[str, int] = "WARNING",
+        window: float = 10.0,
+        max_samples: int = 5,
+    ):
+        """Initialize DedupFilter class object instance."""
+        if isinstance(level, str):
+            level = logger.level(level).no
+        self.level = level
+        self.window = window
+        self.max_samples = max_samples
+        self._reset()
+        _filters.add(self)
+
+    def _reset(self) -> None:
+        # Counts inherited on fork were already summarized by the parent.
+        self._repeats: Dict[Fingerprint, _Repeats] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def __call__(self, record: Dict) -> bool:
+        """Whether to log record, False if it was folded."""
+        level = record["level"]
+        if (
+            level.no < self.level
+            or record["name"] == __name__
+            or ACCESS_EXTRA in record["extra"]
+        ):
+            # Summaries and access records are never folded.
+            return True
+        key = (level.no, record["name"], record["function"], record["line"])
+        now = time.monotonic()
+        with self._lock:
+            repeats = self._repeats.get(key)
+            if repeats is None:
+                self._repeats[key] = _Repeats(level.name, now)
+                return True
+            if now - repeats.started >= self.window:
+                # Opens a new window, repeats of the previous one are
+                # still summarized.
+                repeats.started = now
+                return True
+            repeats.count += 1
+            repeats.message = record["message"]
+            correlation_id = record["extra"].get("correlation_id")
+            samples = repeats.correlation_ids
+            if (
+                correlation_id is not None
+                and len(samples) < self.max_samples
+                and correlation_id not in samples
+            ):
+                samples.append(correlation_id)
+            if self._thread is None:
+                self._start()
+        return False
+
+    def _start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="log-dedup-summary", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.window)
+            self.summarize()
+
+    def summarize(self) -> None:
+        """Log and reset the repeats of each fingerprint."""
+        now = time.monotonic()
+        summaries = []
+        with self._lock:
+            for key, repeats in list(self._repeats.items()):
+                if repeats.count:
+                    summaries.append(
+                        (
+                            key,
+                            repeats.level,
+                            repeats.count,
+                            repeats.message,
+                            repeats.correlation_ids,
+                        )
+                    )
+                    repeats.count = 0
+                    repeats.correlation_ids = []
+                elif now - repeats.started >= self.window:
+                    del self._repeats[key]
+        for key, level, count, message, correlation_ids in summaries:
+            _, name, function, line = key
+            logger.log(
+                level,
+                "Repeated {count} times in the last {interval:.0f}s from "
+                "{site}, sample correlation IDs {correlation_ids}: {last}",
+                count=count,
+                interval=self.window,
+                site="{0}:{1}:{2}".format(name, function, line),
+                correlation_ids=correlation_ids,
+                last=message,
+            )
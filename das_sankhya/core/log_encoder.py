@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Schema-driven JSON encoder for loguru records.
+
+RecordEncoder compiles its field set once, at construction, into a function
+building a single flat dict of plain values from a record, which orjson
+serializes natively: datetimes as RFC 3339 with OPT_UTC_Z, and dict keys
+that are not strings with OPT_NON_STR_KEYS. Loguru objects such as
+``level``, ``file`` or ``process`` are never serialized, only the fields
+read from them.
+
+orjson only serializes exact datetime instances natively, so the record
+time, a loguru datetime subclass, is copied to a plain datetime, which is
+cheaper than isoformat(); other datetime subclasses in extras, such as
+pendulum values, go through isoformat().
+
+The tracing IDs are read from the record extras, where the log patcher puts
+them; the remaining extras are emitted under ``extra``, with string payloads
+capped by truncate_payload(). Exceptions captured by ExceptionCapture are
+rendered as their one line summary.
+"""
+import traceback
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from das_sankhya.core.log_exceptions import CapturedException
+from das_sankhya.core.log_payload import truncate_payload
+
+
+def _default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)
+
+
+try:
+    from orjson import (
+        OPT_APPEND_NEWLINE,
+        OPT_NON_STR_KEYS,
+        OPT_UTC_Z,
+        dumps as _orjson_dumps,
+    )
+
+    _OPTIONS = OPT_APPEND_NEWLINE | OPT_NON_STR_KEYS | OPT_UTC_Z
+
+    def dumps(obj) -> bytes:
+        """Serialize obj to a JSON line."""
+        return _orjson_dumps(obj, default=_default, option=_OPTIONS)
+
+except ImportError:
+    from json import dumps as _json_dumps
+
+    def dumps(obj) -> bytes:
+        """Serialize obj to a JSON line."""
+        return (_json_dumps(obj, default=_default) + "\n").encode("utf-8")
+
+
+# Extras set by the log patcher that are either emitted as their own field or
+# redundant with one.
+TRACING_EXTRAS = ("correlation_id", "request_id", "idempotency_key")
+PATCHER_EXTRAS = TRACING_EXTRAS + ("pid",)
+
+
+def _format_exception(exception) -> str:
+    if isinstance(exception, CapturedException):
+        return exception.render()
+    return "".join(
+        traceback.format_exception(
+            exception.type, exception.value, exception.traceback
+        )
+    )
+
+
+def _extra_fields(extra: Dict, skip_extras: frozenset) -> Optional[Dict]:
+    fields = {
+        key: value for key, value in extra.items() if key not in skip_extras
+    }
+    if not fields:
+        return None
+    payload = fields.get("payload")
+    if payload is not None:
+        fields["payload"] = truncate_payload(payload)
+    return fields
+
+
+# Python expression of each field, evaluated with ``record``, ``extra`` (the
+# record extras) and ``time`` (the record time) in scope, and whether its
+# value may be None.
+FIELD_EXPRESSIONS: Dict[str, Tuple[str, bool]] = {
+    "time": (
+        "datetime(time.year, time.month, time.day, time.hour, time.minute,"
+        " time.second, time.microsecond, time.tzinfo)",
+        False,
+    ),
+    "elapsed": ('record["elapsed"].total_seconds()', False),
+    "level": ('record["level"].name', False),
+    "level_no": ('record["level"].no', False),
+    "message": ('record["message"]', False),
+    "logger": ('record["name"]', False),
+    "module": ('record["module"]', False),
+    "function": ('record["function"]', False),
+    "line": ('record["line"]', False),
+    "file": ('record["file"].path', False),
+    "pid": ('record["process"].id', False),
+    "thread": ('record["thread"].name', False),
+    "correlation_id": ('extra.get("correlation_id")', True),
+    "request_id": ('extra.get("request_id")', True),
+    "idempotency_key": ('extra.get("idempotency_key")', True),
+    "extra": ("extra_fields(extra, skip_extras)", True),
+    "exception": (
+        # CapturedException is falsy, see core/log_exceptions.py.
+        'record["exception"] is not None'
+        ' and format_exception(record["exception"]) or None',
+        True,
+    ),
+}
+
+DEFAULT_FIELDS = (
+    "time",
+    "level",
+    "message",
+    "logger",
+    "function",
+    "line",
+    "pid",
+    "correlation_id",
+    "request_id",
+    "idempotency_key",
+    "extra",
+    "exception",
+)
+
+
+def _compile(
+    fields: Tuple[str, ...], skip_extras: frozenset
+) -> Callable[[Dict], Dict]:
+    # Fields that are always set go in the dict literal, the others are added
+    # when not None, so the generated function does no per-field dispatch.
+    lines = [
+        "def to_dict(record):",
+        '    extra = record["extra"]',
+        '    time = record["time"]',
+        "    rec = {",
+    ]
+    for name in fields:
+        expression, nullable = FIELD_EXPRESSIONS[name]
+        if not nullable:
+            lines.append("        {0!r}: {1},".format(name, expression))
+    lines.append("    }")
+    for name in fields:
+        expression, nullable = FIELD_EXPRESSIONS[name]
+        if nullable:
+            lines.append("    value = {0}".format(expression))
+            lines.append("    if value is not None:")
+            lines.append("        rec[{0!r}] = value".format(name))
+    lines.append("    return rec")
+    namespace = {
+        "datetime": datetime,
+        "extra_fields": _extra_fields,
+        "format_exception": _format_exception,
+        "skip_extras": skip_extras,
+    }
+    exec("\n".join(lines), namespace)  # noqa: S102
+    return namespace["to_dict"]
+
+
+class RecordEncoder(object):
+    """Encode loguru records to JSON lines with a fixed field set.
+
+    Args:
+        fields(Iterable[str]): Emitted fields, among the keys of
+            FIELD_EXPRESSIONS. Fields that may be None come last, in order,
+            and are omitted when None.
+        skip_extras(Iterable[str]): Extras left out of the ``extra`` field.
+
+    Raises:
+        ValueError: If a field is unknown.
+
+    """
+
+    def __init__(
+        self,
+        fields: Iterable[str] = DEFAULT_FIELDS,
+        skip_extras: Iterable[str] = PATCHER_EXTRAS,
+    ):
+        """Initialize RecordEncoder class object instance."""
+        fields = tuple(fields)
+        unknown = [name for name in fields if name not in FIELD_EXPRESSIONS]
+        if unknown:
+            raise ValueError(
+                "Unknown log fields: {0}".format(", ".join(unknown))
+            )
+        self.fields = fields
+        self.to_dict = _compile(fields, frozenset(skip_extras))
+        """Return the emitted fields of a loguru record, as a dict."""
+
+    def encode(self, record: Dict) -> bytes:
+        """Encode record to a JSON line."""
+        return dumps(self.to_dict(record))
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Cheap capture of repeated exceptions in log records.
+
+loguru renders the exception of a record, with the values of every frame's
+variables when ``diagnose`` is on, on the calling thread and for every
+handler, before any sink sees it. When a dependency is down, every request
+logs the same exception, and rendering them becomes a CPU storm.
+
+ExceptionCapture is a patcher step that fingerprints the exception of each
+record from its type and the (file, function, line) of its frames. The first
+``full_tracebacks`` occurrences of a fingerprint keep their exception and are
+rendered in full. Later ones have it replaced by a CapturedException holding
+the exception type, message and innermost frame only. It is falsy, so
+loguru renders nothing for it, and the background sinks render it on their
+writer thread as a single line carrying the fingerprint and the occurrence
+count. The traceback, and the frames it keeps alive, are released right
+away.
+
+Counts start over ``window`` seconds after the first occurrence of a
+fingerprint, so a later outage gets its first full tracebacks again.
+"""
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+Frame = Tuple[str, int, str]
+
+
+def _type_name(type_: type) -> str:
+    module = type_.__module__
+    if module in ("builtins", "__main__"):
+        return type_.__qualname__
+    return "{0}.{1}".format(module, type_.__qualname__)
+
+
+class CapturedException(object):
+    """Exception of a log record, captured without its traceback.
+
+    Args:
+        type_name(str): Qualified exception type name.
+        value(str): Exception message.
+        frame(Tuple[str, int, str], optional): File, line and function of
+            the innermost frame.
+        fingerprint(str): Fingerprint of the exception type and frames.
+        count(int): Occurrences of the fingerprint so far.
+
+    """
+
+    __slots__ = ("type_name", "value", "frame", "fingerprint", "count")
+
+    def __init__(
+        self,
+        type_name: str,
+        value: str,
+        frame: Optional[Frame],
+        fingerprint: str,
+        count: int,
+    ):
+        """Initialize CapturedException class object instance."""
+        self.type_name = type_name
+        self.value = value
+        self.frame = frame
+        self.fingerprint = fingerprint
+        self.count = count
+
+    def __bool__(self) -> bool:
+        """Return False, loguru handlers only render truthy exceptions."""
+        return False
+
+    def render(self) -> str:
+        """Return the exception as one line, without trailing newline."""
+        text = "{0}: {1}".format(self.type_name, self.value)
+        if self.frame is not None:
+            text += " at {0}:{1} in {2}".format(*self.frame)
+        return "{0} [exception {1}, occurrence {2}]".format(
+            text, self.fingerprint, self.count
+        )
+
+
+class ExceptionCapture(object):
+    """Loguru patcher step collapsing repeated exceptions of log records.
+
+    Args:
+        full_tracebacks(int): Occurrences of each fingerprint, per window,
+            whose exception is kept, and rendered in full.
+        max_fingerprints(int): Fingerprints counted; past it, counts start
+            over.
+        window(float): Period, in seconds, after which the count of a
+            fingerprint starts over.
+
+    """
+
+    def __init__(
+        self,
+        full_tracebacks: int = 5,
+        max_fingerprints: int = 1000,
+        window: float = 300.0,
+    ):
+        """Initialize ExceptionCapture class object instance."""
+        self.full_tracebacks = full_tracebacks
+        self.max_fingerprints = max_fingerprints
+        self.window = window
+        # Fingerprint to the start of its window and its count.
+        self._counts: Dict[str, List] = {}
+
+    def __call__(self, record: Dict) -> None:
+        """Fingerprint the exception of record, and capture it if repeated."""
+        exception = record["exception"]
+        if exception is None or exception.value is None:
+            return
+        frames = []
+        tb = exception.traceback
+        while tb is not None:
+            code = tb.tb_frame.f_code
+            frames.append((code.co_filename, tb.tb_lineno, code.co_name))
+            tb = tb.tb_next
+        type_name = _type_name(exception.type)
+        sites = "|".join("{0}:{2}:{1}".format(*frame) for frame in frames)
+        key = "{0}|{1}".format(type_name, sites)
+        fingerprint = "{0:08x}".format(zlib.crc32(key.encode()))
+        now = time.monotonic()
+        counts = self._counts
+        entry = counts.get(fingerprint)
+        if entry is None or now - entry[0] >= self.window:
+            if entry is None and len(counts) >= self.max_fingerprints:
+                counts.clear()
+            entry = counts[fingerprint] = [now, 0]
+        entry[1] += 1
+        count = entry[1]
+        record["extra"]["exception_fingerprint"] = fingerprint
+        if count <= self.full_tracebacks:
+            return
+        try:
+            value = str(exception.value)
+        except Exception:
+            value = "<unprintable {0} object>".format(type_name)
+        record["exception"] = CapturedException(
+            type_name, value, frames[-1] if frames else None, fingerprint, count
+        )
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""Rotating log files, one per worker process.
+
+RotatingFile is the output of a BackgroundSink in the ``file`` log
+transport. Each process writes its own segment files, named after the
+process ID and the segment's opening time, so gunicorn workers never
+append to the same file. Segments are opened with ``O_APPEND`` and their
+disk space preallocated, without changing their size, so appends do not
+have to allocate blocks one at a time. Segments are truncated to their size
+when closed, which frees the blocks left unused.
+
+A segment is closed once it reaches ``max_bytes`` or is ``interval``
+seconds old. Closed segments are compressed, with gzip or, when the
+optional ``zstandard`` package is installed, zstd, by a background thread,
+so neither the sink's writer thread nor the request path wait on it.
+"""
+import ctypes
+import ctypes.util
+import gzip
+import os
+import queue
+import shutil
+import threading
+import time
+import weakref
+from typing import Optional
+
+from loguru import logger
+
+COMPRESSIONS = (None, "gzip", "zstd")
+
+# Allocates disk space without changing the file size, see fallocate(2).
+FALLOC_FL_KEEP_SIZE = 1
+
+_libc = None
+
+# Files to reset in forked children.
+_files: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for rotating_file in list(_files):
+        rotating_file._after_fork_in_child()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def preallocate(fd: int, size: int) -> bool:
+    """Allocate size bytes of disk space for fd, keeping its size.
+
+    ``os.posix_fallocate`` would extend the file, and ``O_APPEND`` writes
+    would then land after the allocated range: fallocate(2) is called
+    through ctypes with FALLOC_FL_KEEP_SIZE instead.
+
+    Args:
+        fd(int): File descriptor.
+        size(int): Number of bytes to allocate.
+
+    Returns:
+        bool: Whether the space was allocated, False where fallocate is not
+            supported.
+
+    """
+    global _libc
+    if _libc is None:
+        try:
+            _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            _libc.fallocate.argtypes = (
+                ctypes.c_int,
+                ctypes.c_int,
+                ctypes.c_longlong,
+                ctypes.c_longlong,
+            )
+        except (OSError, AttributeError):
+            _libc = False
+    if not _libc:
+        return False
+    return _libc.fallocate(fd, FALLOC_FL_KEEP_SIZE, 0, size) == 0
+
+
+def compress(path: str, compression: str) -> str:
+    """Compress the file at path next to it, then remove it.
+
+    Args:
+        path(str): File path.
+        compression(str): ``gzip`` or ``zstd``.
+
+    Returns:
+        str: The compressed file path.
+
+    """
+    if compression == "zstd":
+        import zstandard
+
+        target = path + ".zst"
+        with open(path, "rb") as source, open(target, "wb") as output:
+            zstandard.ZstdCompressor().copy_stream(source, output)
+    else:
+        target = path + ".gz"
+        with open(path, "rb") as source, gzip.open(target, "wb") as output:
+            shutil.copyfileobj(source, output)
+    os.unlink(path)
+    return target
+
+
+class RotatingFile(object):
+    """Append-only log file of the current process, rotated by size and age.
+
+    Args:
+        directory(str): Directory of the segment files, created if missing.
+        name(str): Segment file name prefix.
+        max_bytes(int): Size, in bytes, that closes a segment.
+        interval(float, optional): Age, in seconds, that closes a segment,
+            unset to rotate by size only.
+        preallocate(bool): Whether to preallocate max_bytes of disk space
+            for each segment.
+        compression(str, optional): ``gzip`` or ``zstd`` compression of
+            closed segments, unset to keep them as is.
+
+    Raises:
+        ValueError: If compression is unknown, or is ``zstd`` without the
+            zstandard package installed.
+
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        name: str = "das_sankhya",
+        max_bytes: int = 100 << 20,
+        interval: Optional[float] = None,
+        preallocate: bool = True,
+        compression: Optional[str] = "gzip",
+    ):
+        """Initialize RotatingFile class object instance."""
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                "Unknown log compression: {0!r}".format(compression)
+            )
+        if compression == "zstd":
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                raise ValueError(
+                    "zstd log compression requires the zstandard package"
+                )
+        self.directory = directory
+        self.name = name
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.preallocate = preallocate
+        self.compression = compression
+        self._reset()
+        _files.add(self)
+
+    def _reset(self) -> None:
+        self.path: Optional[str] = None
+        self._fd: Optional[int] = None
+        self._size = 0
+        self._opened = 0.0
+        self._sequence = 0
+        self._compress_queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._compressor: Optional[threading.Thread] = None
+
+    def _after_fork_in_child(self) -> None:
+        # The child writes its own segments; the parent keeps writing, and
+        # compressing, the inherited ones.
+        if self._fd is not None:
+            os.close(self._fd)
+        self._reset()
+
+    def _open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._sequence += 1
+        self.path = os.path.join(
+            self.directory,
+            "{0}-{1}-{2}-{3}.log".format(
+                self.name,
+                os.getpid(),
+                time.strftime("%Y%m%dT%H%M%S", time.gmtime()),
+                self._sequence,
+            ),
+        )
+        self._fd = os.open(
+            self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644
+        )
+        if self.preallocate:
+            preallocate(self._fd, self.max_bytes)
+        self._size = 0
+        self._opened = time.monotonic()
+
+    def _close_segment(self) -> None:
+        if self.preallocate:
+            # Frees the preallocated blocks past the end of the file.
+            try:
+                os.ftruncate(self._fd, self._size)
+            except OSError:
+                pass
+        os.close(self._fd)
+        self._fd = None
+
+    def _rotate(self) -> None:
+        self._close_segment()
+        if self.compression is not None:
+            self._compress_queue.put(self.path)
+            if self._compressor is None:
+                self._compressor = threading.Thread(
+                    target=self._compress_segments,
+                    name="log-compressor",
+                    daemon=True,
+                )
+                self._compressor.start()
+        self._open()
+
+    def _compress_segments(self) -> None:
+        while True:
+            path = self._compress_queue.get()
+            try:
+                if path is None:
+                    return
+                compress(path, self.compression)
+            except Exception:
+                logger.exception("Could not compress log segment {}", path)
+            finally:
+                self._compress_queue.task_done()
+
+    def write(self, data: bytes) -> None:
+        """Append data to the current segment, rotating it first if due.
+
+        Called by a single thread, the writer thread of the sink.
+        """
+        if self._fd is None:
+            self._open()
+        elif (self._size and self._size + len(data) > self.max_bytes) or (
+            self.interval is not None
+            and time.monotonic() - self._opened >= self.interval
+        ):
+            self._rotate()
+        view = memoryview(data)
+        while view:
+            try:
+                written = os.write(self._fd, view)
+            except InterruptedError:
+                continue
+            except OSError:
+                # Nowhere to report it: the log destination itself failed.
+                return
+            self._size += written
+            view = view[written:]
+
+    def close(self) -> None:
+        """Close the current segment and wait for pending compressions.
+
+        The last segment is left uncompressed.
+        """
+        if self._fd is not None:
+            self._close_segment()
+        if self._compressor is not None:
+            self._compress_queue.put(None)
+            self._compressor.join()
+            self._compressor = None
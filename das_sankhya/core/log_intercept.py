@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Standard logging to loguru bridge.
+
+InterceptHandler forwards standard library log records to loguru, with the
+logging call site as the loguru caller. It runs for every uvicorn and
+gunicorn record, access logs included, so its per-record work is cached:
+
+* the loguru level of each stdlib level name, so ``logger.level()`` is only
+  called, and can only raise, once per level;
+* the stack depth of each call site, keyed by its file and line, since the
+  frames between a logging call and the handler are the same on every call;
+* the ``logger.opt()`` loggers of each depth, for records without exception.
+
+Records of loggers listed in ``no_caller``, such as ``uvicorn.access``, skip
+the caller lookup altogether: their call site is always the same server
+function and carries no information.
+"""
+import logging
+import sys
+from typing import Dict, Iterable, Tuple, Union
+
+from loguru import logger
+
+NO_CALLER_LOGGERS = ("uvicorn.access", "gunicorn.access")
+
+
+class InterceptHandler(logging.Handler):
+    """Logging handler forwarding records to loguru.
+
+    Args:
+        level(int): Handler level.
+        no_caller(Iterable[str]): Logger names whose records are logged
+            without looking up their caller.
+
+    """
+
+    def __init__(
+        self,
+        level: int = logging.NOTSET,
+        no_caller: Iterable[str] = NO_CALLER_LOGGERS,
+    ):
+        """Initialize InterceptHandler class object instance."""
+        super().__init__(level)
+        self.no_caller = frozenset(no_caller)
+        self._levels: Dict[str, Union[str, int]] = {}
+        self._depths: Dict[Tuple[str, int], int] = {}
+        self._loggers: Dict[int, object] = {}
+
+    def _level(self, record: logging.LogRecord) -> Union[str, int]:
+        try:
+            return self._levels[record.levelname]
+        except KeyError:
+            pass
+        # Get corresponding Loguru level if it exists
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+        self._levels[record.levelname] = level
+        return level
+
+    def _depth(self, record: logging.LogRecord) -> int:
+        if record.name in self.no_caller:
+            return 0
+        key = (record.pathname, record.lineno)
+        try:
+            return self._depths[key]
+        except KeyError:
+            pass
+        # Find caller from where originated the logged message. Frames are
+        # counted from emit(), as logger.opt(depth=...) does: frame 3 from
+        # here is the frame 2 above emit().
+        frame, depth = sys._getframe(3), 2
+        while frame.f_code.co_filename == logging.__file__:
+            frame = frame.f_back
+            depth += 1
+        self._depths[key] = depth
+        return depth
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Log record with loguru."""
+        level = self._level(record)
+        depth = self._depth(record)
+        if record.exc_info:
+            opt_logger = logger.opt(depth=depth, exception=record.exc_info)
+        else:
+            try:
+                opt_logger = self._loggers[depth]
+            except KeyError:
+                opt_logger = self._loggers[depth] = logger.opt(depth=depth)
+        opt_logger.log(level, record.getMessage())
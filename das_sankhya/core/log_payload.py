@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Lazy rendering of ``logger.bind(payload=...)`` data.
+
+Record formats no longer pretty-print the payload: the format function runs
+in the calling coroutine, even for handlers with ``enqueue=True``. Instead,
+the sink renders the payload of the records it writes, and never for records
+filtered out by level: BackgroundTextSink on its writer thread, PayloadSink,
+which wraps the stream of a synchronous text handler, on the calling one.
+
+Rendered payloads are capped at ``max_chars`` characters, so a large
+upstream body cannot hold up the log writer; long strings and bytes are cut
+before being rendered at all. The JSON encoder applies the same cap with
+truncate_payload().
+"""
+from pprint import pformat
+from typing import Any, TextIO
+
+PAYLOAD_MAX_CHARS = 8192
+
+TRUNCATED_SUFFIX = "... [{0} more characters truncated]"
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    return text[:max_chars] + TRUNCATED_SUFFIX.format(len(text) - max_chars)
+
+
+def truncate_payload(payload: Any, max_chars: int = PAYLOAD_MAX_CHARS) -> Any:
+    """Cap string and bytes payloads at max_chars characters.
+
+    Args:
+        payload(Any): Bound payload.
+        max_chars(int): Maximum number of characters kept.
+
+    Returns:
+        Any: The payload, truncated to a str if it was a longer str or bytes.
+
+    """
+    if isinstance(payload, (bytes, bytearray)):
+        if len(payload) > max_chars:
+            return _truncate(payload.decode("utf-8", "replace"), max_chars)
+    elif isinstance(payload, str) and len(payload) > max_chars:
+        return _truncate(payload, max_chars)
+    return payload
+
+
+def render_payload(payload: Any, max_chars: int = PAYLOAD_MAX_CHARS) -> str:
+    """Pretty-print a payload, capped at max_chars characters.
+
+    Example:
+    >>> render_payload([{"users": [{"name": "Nick", "age": 87}], "count": 1}])
+    [{'count': 1, 'users': [{'age': 87, 'name': 'Nick'}]}]
+
+    """
+    payload = truncate_payload(payload, max_chars)
+    text = (
+        payload
+        if isinstance(payload, str)
+        else pformat(payload, indent=4, compact=True, width=88)
+    )
+    if len(text) > max_chars:
+        text = _truncate(text, max_chars)
+    return text
+
+
+class PayloadSink(object):
+    """Text stream sink writing the payload of records after their line.
+
+    Args:
+        stream(TextIO): Wrapped stream, e.g. sys.stdout.
+        max_chars(int): Maximum number of payload characters written.
+
+    """
+
+    def __init__(self, stream: TextIO, max_chars: int = PAYLOAD_MAX_CHARS):
+        """Initialize PayloadSink class object instance."""
+        self.stream = stream
+        self.max_chars = max_chars
+
+    def write(self, message) -> None:
+        """Write a formatted record, then its rendered payload if any."""
+        self.stream.write(message)
+        payload = message.record["extra"].get("payload")
+        if payload is not None:
+            self.stream.write(render_payload(payload, self.max_chars) + "\n")
+
+    def flush(self) -> None:
+        """Flush the wrapped stream."""
+        self.stream.flush()
+
+    def isatty(self) -> bool:
+        """Whether the wrapped stream is a terminal, used for colorization."""
+        return self.stream.isatty()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Per call site log sampling and rate limiting.
+
+SamplingFilter is a loguru handler filter. A call site is the (logger name,
+function, line) of the logging call, i.e. one message template. Each call
+site logs one record in ``every`` and at most ``rate`` records per second
+(a token bucket holding up to one second of records). Records at or above
+``min_level`` are never sampled, nor are access records.
+
+Call sites keep a count of the records they suppressed, and a daemon thread
+logs a "suppressed X messages" summary for each of them every
+``summary_interval`` seconds.
+"""
+import os
+import threading
+import time
+import weakref
+from typing import Dict, Mapping, Optional, Tuple, Union
+
+from loguru import logger
+
+from das_sankhya.core.access_log import ACCESS_EXTRA
+
+SiteKey = Tuple[str, str, int]
+
+# Filters to reset in forked children.
+_filters: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for sampling_filter in list(_filters):
+        sampling_filter._reset()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class _Site(object):
+    """Sampling state of a call site."""
+
+    __slots__ = ("rate", "every", "tokens", "updated", "seen", "suppressed")
+
+    def __init__(self, rate: Optional[float], every: int):
+        self.rate = rate
+        self.every = every
+        self.tokens = max(rate, 1.0) if rate is not None else 0.0
+        self.updated = time.monotonic()
+        self.seen = 0
+        self.suppressed = 0
+
+
+class SamplingFilter(object):
+    """Loguru filter sampling and rate limiting records per call site.
+
+    Args:
+        rate(float, optional): Default maximum number of records per second
+            of a call site, None for no limit.
+        every(int): Default sampling ratio, one record in ``every`` is kept.
+        rules(Mapping[str, Mapping[str, float]], optional): ``rate`` and
+            ``every`` of call sites matching a logger (module or package)
+            name, ``name:function`` or ``name:function:line``. The most
+            specific rule wins.
+        min_level(str | int): Records of this level or above always pass.
+        summary_interval(float): Period, in seconds, of the summaries of
+            suppressed records.
+
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        every: int = 1,
+        rules: Optional[Mapping[str, Mapping[str, float]]] = None,
+        min_level: Union[str, int] = "WARNING",
+        summary_interval: float = 60.0,
+    ):
+        """Initialize SamplingFilter class object instance."""
+        self.rate = rate
+        self.every = every
+        self.rules = dict(rules or {})
+        if isinstance(min_level, str):
+            min_level = logger.level(min_level).no
+        self.min_level = min_level
+        self.summary_interval = summary_interval
+        self._reset()
+        _filters.add(self)
+
+    def _reset(self) -> None:
+        # Counts inherited on fork were already summarized by the parent.
+        self._sites: Dict[SiteKey, Optional[_Site]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _rule(self, key: SiteKey) -> Tuple[Optional[float], int]:
+        name, function, line = key
+        candidates = [
+            "{0}:{1}:{2}".format(name, function, line),
+            "{0}:{1}".format(name, function),
+        ]
+        parts = name.split(".")
+        candidates.extend(
+            ".".join(parts[:size]) for size in range(len(parts), 0, -1)
+        )
+        for candidate in candidates:
+            rule = self.rules.get(candidate)
+            if rule is not None:
+                rate = rule.get("rate", self.rate)
+                return rate, int(rule.get("every", self.every))
+        return self.rate, self.every
+
+    def _site(self, key: SiteKey) -> Optional[_Site]:
+        rate, every = self._rule(key)
+        # Summaries are never sampled, nor are sites without limits.
+        if key[0] == __name__ or (rate is None and every <= 1):
+            site = None
+        else:
+            site = _Site(rate, every)
+        self._sites[key] = site
+        return site
+
+    def __call__(self, record: Dict) -> bool:
+        """Whether to log record."""
+        if (
+            record["level"].no >= self.min_level
+            or ACCESS_EXTRA in record["extra"]
+        ):
+            return True
+        key = (record["name"], record["function"], record["line"])
+        try:
+            site = self._sites[key]
+        except KeyError:
+            site = self._site(key)
+        if site is None:
+            return True
+
+        with self._lock:
+            site.seen += 1
+            keep = site.every <= 1 or site.seen % site.every == 1
+            if keep and site.rate is not None:
+                now = time.monotonic()
+                site.tokens = min(
+                    site.tokens + (now - site.updated) * site.rate,
+                    max(site.rate, 1.0),
+                )
+                site.updated = now
+                if site.tokens >= 1.0:
+                    site.tokens -= 1.0
+                else:
+                    keep = False
+            if not keep:
+                site.suppressed += 1
+                if self._thread is None:
+                    self._start()
+        return keep
+
+    def _start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="log-sampling-summary", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.summary_interval)
+            self.summarize()
+
+    def summarize(self) -> None:
+        """Log and reset the count of suppressed records of each call site."""
+        with self._lock:
+            suppressed = []
+            # New sites are added without the lock.
+            for key, site in list(self._sites.items()):
+                if site is not None and site.suppressed:
+                    suppressed.append((key, site.suppressed))
+                    site.suppressed = 0
+        for (name, function, line), count in suppressed:
+            logger.info(
+                "Suppressed {count} messages from {site} in the last "
+                "{interval:.0f}s",
+                count=count,
+                site="{0}:{1}:{2}".format(name, function, line),
+                interval=self.summary_interval,
+            )
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""Background log sinks with a bounded queue.
+
+BackgroundSink is a file-like loguru sink whose ``write`` only appends the
+message to a bounded queue. A writer thread encodes the queued messages and
+writes them in batches with a single ``os.write``, once ``batch_size``
+messages are pending or the oldest pending message is ``flush_interval``
+seconds old, so logging never blocks the event loop on stdout.
+BackgroundJsonSink encodes records as JSON lines with RecordEncoder,
+BackgroundTextSink writes the formatted lines with their rendered payload.
+They replace loguru's ``enqueue=True``, whose queue is unbounded. Batches go
+to a file descriptor, stdout by default, or to a RotatingFile.
+
+When ``max_pending`` messages are queued, for instance while stdout is
+throttled, the ``overflow`` policy applies, so memory stays flat:
+
+* ``drop_low``: messages below ``keep_level`` are dropped; the others
+  replace the oldest queued message;
+* ``drop_oldest``: every message replaces the oldest queued message;
+* ``block``: the logging thread waits up to ``block_timeout`` seconds for
+  room, then drops the message.
+
+Drops, by level, waits and the queue depth are exported as metrics.
+
+The sinks deliberately have no ``flush`` method: loguru would call it after
+every record. Use ``drain()`` to wait for pending records to be written;
+drain_all() does it for every sink of the process and is called on FastAPI
+shutdown and from the gunicorn worker_exit and on_exit hooks.
+"""
+import atexit
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Deque, List, Optional, Union
+
+from loguru import logger
+
+from das_sankhya.core.log_encoder import RecordEncoder, dumps
+from das_sankhya.core.log_exceptions import CapturedException
+from das_sankhya.core.log_files import RotatingFile
+from das_sankhya.core.log_payload import PAYLOAD_MAX_CHARS, render_payload
+from das_sankhya.core.metrics import registry
+
+OVERFLOW_POLICIES = ("drop_low", "drop_oldest", "block")
+
+DROPPED_RECORDS = registry.counter(
+    "log_records_dropped",
+    "Log records dropped because the log queue was full, by level.",
+    ("level",),
+)
+BLOCKED_WRITES = registry.counter(
+    "log_queue_blocked",
+    "Log calls that waited for room in a full log queue.",
+)
+QUEUE_DEPTH = registry.gauge(
+    "log_queue_depth",
+    "Log records waiting to be written, as last seen by the writer threads.",
+)
+
+_sinks: "weakref.WeakSet[BackgroundSink]" = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for sink in list(_sinks):
+        sink._reset()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def write_all(fd: int, data: bytes) -> None:
+    """Write data to fd, retrying partial and interrupted writes."""
+    view = memoryview(data)
+    while view:
+        try:
+            view = view[os.write(fd, view) :]
+        except InterruptedError:
+            continue
+        except OSError:
+            # Nowhere to report it: the log destination itself failed.
+            break
+
+
+class BackgroundSink(object):
+    """Loguru sink writing from a background thread through a bounded queue.
+
+    Subclasses implement ``_encode``, returning the bytes written for a
+    message.
+
+    Args:
+        fd(int, optional): File descriptor written to, defaults to stdout.
+        batch_size(int): Pending messages that trigger a write.
+        flush_interval(float): Maximum time, in seconds, a message waits
+            before being written.
+        max_pending(int): Maximum number of queued messages.
+        overflow(str): Policy applied when the queue is full, one of
+            ``drop_low``, ``drop_oldest`` and ``block``.
+        block_timeout(float): Maximum time, in seconds, the ``block`` policy
+            waits for room.
+        keep_level(str | int): Messages of this level or above are not
+            dropped by the ``drop_low`` policy.
+        file(RotatingFile, optional): Rotating file written to instead of
+            fd, closed when the sink stops.
+
+    Raises:
+        ValueError: If overflow is not a known policy.
+
+    """
+
+    def __init__(
+        self,
+        fd: Optional[int] = None,
+        batch_size: int = 256,
+        flush_interval: float = 0.2,
+        max_pending: int = 10000,
+        overflow: str = "drop_low",
+        block_timeout: float = 0.05,
+        keep_level: Union[str, int] = "WARNING",
+        file: Optional[RotatingFile] = None,
+    ):
+        """Initialize BackgroundSink class object instance."""
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                "Unknown log queue overflow policy: {0!r}".format(overflow)
+            )
+        if isinstance(keep_level, str):
+            keep_level = logger.level(keep_level).no
+        self.fd = sys.stdout.fileno() if fd is None else fd
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.keep_level = keep_level
+        self.file = file
+        self._reset()
+        _sinks.add(self)
+
+    def _reset(self) -> None:
+        # The writer thread does not survive fork, and records pending in the
+        # parent are written by the parent.
+        self._pending: Deque = deque()
+        self._cond = threading.Condition(threading.Lock())
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._flush_requested = False
+        self._queued = 0
+        self._written = 0
+
+    def write(self, message) -> None:
+        """Queue a message, called by loguru for every record."""
+        pending = self._pending
+        if len(pending) >= self.max_pending and not self._make_room(message):
+            return
+        pending.append(message)
+        with self._cond:
+            self._queued += 1
+            if self._thread is None:
+                self._start()
+            elif len(pending) >= self.batch_size:
+                self._cond.notify()
+
+    def _make_room(self, message) -> bool:
+        # Whether message can be queued, applying the overflow policy.
+        if self.overflow == "block":
+            return self._wait_for_room(message)
+        if (
+            self.overflow == "drop_low"
+            and message.record["level"].no < self.keep_level
+        ):
+            DROPPED_RECORDS.labels(message.record["level"].name).inc()
+            return False
+        try:
+            oldest = self._pending.popleft()
+        except IndexError:
+            # Emptied by the writer thread meanwhile.
+            return True
+        DROPPED_RECORDS.labels(oldest.record["level"].name).inc()
+        with self._cond:
+            # Counted as done for drain().
+            self._written += 1
+        return True
+
+    def _wait_for_room(self, message) -> bool:
+        BLOCKED_WRITES.inc()
+        deadline = time.monotonic() + self.block_timeout
+        with self._cond:
+            # The writer may be waiting for more records: wake it up.
+            self._flush_requested = True
+            self._cond.notify_all()
+            while len(self._pending) >= self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    DROPPED_RECORDS.labels(message.record["level"].name).inc()
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        cond = self._cond
+        while True:
+            with cond:
+                if (
+                    not self._stopping
+                    and not self._flush_requested
+                    and len(self._pending) < self.batch_size
+                ):
+                    cond.wait(self.flush_interval)
+                self._flush_requested = False
+                stopping = self._stopping
+            self._write_pending()
+            if stopping and not self._pending:
+                return
+
+    def _write_pending(self) -> None:
+        pending = self._pending
+        count = len(pending)
+        # Also set when idle, so the gauge falls back to 0 after a burst.
+        QUEUE_DEPTH.set(count)
+        if not count:
+            return
+        encode = self._encode
+        chunks = []
+        written = 0
+        for _ in range(count):
+            try:
+                message = pending.popleft()
+            except IndexError:
+                # Dropped by the drop_oldest or drop_low policy meanwhile.
+                break
+            written += 1
+            try:
+                chunks.append(encode(message))
+            except Exception as ex:
+                chunks.append(self._encode_error(ex))
+        self._output(chunks)
+        with self._cond:
+            self._written += written
+            self._cond.notify_all()
+
+    def _encode(self, message) -> bytes:
+        raise NotImplementedError
+
+    def _encode_error(self, ex: Exception) -> bytes:
+        return "Could not write log record: {0!r}\n".format(ex).encode()
+
+    def _output(self, chunks: List[bytes]) -> None:
+        # Overridden by sinks writing elsewhere than a file descriptor.
+        if self.file is not None:
+            self.file.write(b"".join(chunks))
+        else:
+            write_all(self.fd, b"".join(chunks))
+
+    def drain(self, timeout: Optional[float] = 5.0) -> bool:
+        """Wait until every record buffered so far is written.
+
+        Args:
+            timeout(float, optional): Maximum time to wait, in seconds.
+
+        Returns:
+            bool: Whether every record was written in time.
+
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._thread is None:
+                return not self._pending
+            target = self._queued
+            while self._written < target:
+                if not self._thread.is_alive():
+                    return False
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                # The writer may be waiting for more records: wake it up.
+                self._flush_requested = True
+                self._cond.notify_all()
+                self._cond.wait(
+                    self.flush_interval
+                    if remaining is None
+                    else min(remaining, self.flush_interval)
+                )
+        return True
+
+    def stop(self) -> None:
+        """Write pending records and stop the writer thread.
+
+        Called by loguru when the sink is removed.
+        """
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join()
+        else:
+            self._write_pending()
+        if self.file is not None:
+            self.file.close()
+        _sinks.discard(self)
+
+
+class BackgroundJsonSink(BackgroundSink):
+    """Loguru sink writing JSON lines from a background thread.
+
+    Args:
+        encoder(RecordEncoder, optional): Record encoder, defaults to the
+            default field set.
+        **kwargs: BackgroundSink arguments.
+
+    """
+
+    def __init__(self, encoder: Optional[RecordEncoder] = None, **kwargs):
+        """Initialize BackgroundJsonSink class object instance."""
+        self.encoder = RecordEncoder() if encoder is None else encoder
+        super().__init__(**kwargs)
+
+    def _encode(self, message) -> bytes:
+        return self.encoder.encode(message.record)
+
+    def _encode_error(self, ex: Exception) -> bytes:
+        return dumps(
+            {"message": "Could not serialize log record: {0!r}".format(ex)}
+        )
+
+
+class BackgroundTextSink(BackgroundSink):
+    """Loguru sink writing formatted lines from a background thread.
+
+    Bound payloads, and exceptions captured by ExceptionCapture, are
+    rendered after their line by the writer thread.
+
+    Args:
+        max_chars(int): Maximum number of payload characters written.
+        **kwargs: BackgroundSink arguments.
+
+    """
+
+    def __init__(self, max_chars: int = PAYLOAD_MAX_CHARS, **kwargs):
+        """Initialize BackgroundTextSink class object instance."""
+        self.max_chars = max_chars
+        super().__init__(**kwargs)
+
+    def _encode(self, message) -> bytes:
+        record = message.record
+        if isinstance(record["exception"], CapturedException):
+            message = "".join((message, record["exception"].render(), "\n"))
+        payload = record["extra"].get("payload")
+        if payload is not None:
+            message = "".join(
+                (message, render_payload(payload, self.max_chars), "\n")
+            )
+        return message.encode("utf-8", "replace")
+
+    def isatty(self) -> bool:
+        """Whether fd is a terminal, used for colorization."""
+        return self.file is None and os.isatty(self.fd)
+
+
+def drain_all(timeout: Optional[float] = 5.0) -> None:
+    """Wait for pending records of every background sink to be written.
+
+    Args:
+        timeout(float, optional): Maximum time to wait for each sink, in
+            seconds.
+
+    """
+    for sink in list(_sinks):
+        sink.drain(timeout)
+
+
+atexit.register(drain_all)
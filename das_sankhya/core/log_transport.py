@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""Central log collection over a Unix datagram socket.
+
+With many gunicorn workers each writing its own log lines to the shared
+stdout pipe, lines of different workers can interleave and every worker
+pays for the writes. In the datagram transport, workers log with
+DatagramSink: its writer thread encodes records to JSON lines, as
+BackgroundJsonSink does, and sends them in datagrams of whole lines to the
+LogCollector of the gunicorn arbiter. The collector receives datagrams in
+order on a single thread and writes them to stdout in large chunks.
+
+The collector's socket path is published in the ``FASTAPI_LOG_SOCKET``
+environment variable before workers are forked. A DatagramSink that cannot
+reach the collector writes to its own file descriptor instead, so no record
+is lost when the arbiter is not running a collector.
+"""
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from typing import List, Optional
+
+from das_sankhya.core.log_sinks import BackgroundJsonSink, write_all
+from das_sankhya.core.metrics import registry
+
+LOG_SOCKET_ENV = "FASTAPI_LOG_SOCKET"
+
+# Largest datagram sent; lines longer than this are sent alone.
+MAX_DATAGRAM = 65536
+
+FALLBACK_WRITES = registry.counter(
+    "log_transport_fallback_writes",
+    "Log batches written directly because the log collector was unreachable.",
+)
+
+# Collectors to close in forked children.
+_collectors: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for collector in list(_collectors):
+        collector._after_fork_in_child()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class LogCollector(object):
+    """Receive log datagrams and write them in batches.
+
+    Args:
+        path(str, optional): Socket path, defaults to a new temporary
+            directory.
+        fd(int, optional): File descriptor written to, defaults to stdout.
+        chunk_size(int): Buffered bytes that trigger a write.
+        flush_interval(float): Maximum time, in seconds, received data waits
+            before being written.
+        receive_buffer(int): Socket receive buffer size, in bytes.
+
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        fd: Optional[int] = None,
+        chunk_size: int = 1 << 20,
+        flush_interval: float = 0.1,
+        receive_buffer: int = 4 << 20,
+    ):
+        """Initialize LogCollector class object instance."""
+        self.path = path
+        self.fd = sys.stdout.fileno() if fd is None else fd
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.receive_buffer = receive_buffer
+        self._directory: Optional[str] = None
+        self._sock: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        _collectors.add(self)
+
+    def start(self) -> str:
+        """Bind the socket, publish its path and start receiving.
+
+        Returns:
+            str: The socket path.
+
+        """
+        if self.path is None:
+            self._directory = tempfile.mkdtemp(prefix="das_sankhya_logs_")
+            self.path = os.path.join(self._directory, "collector.sock")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer
+            )
+        except OSError:
+            pass
+        sock.bind(self.path)
+        sock.settimeout(self.flush_interval)
+        self._sock = sock
+        self._stopping = False
+        os.environ[LOG_SOCKET_ENV] = self.path
+        self._thread = threading.Thread(
+            target=self._run, name="log-collector", daemon=True
+        )
+        self._thread.start()
+        return self.path
+
+    def _run(self) -> None:
+        sock = self._sock
+        chunks: List[bytes] = []
+        size = 0
+        oldest = 0.0
+        while True:
+            try:
+                data = sock.recv(MAX_DATAGRAM)
+            except socket.timeout:
+                data = None
+            if data:
+                if not chunks:
+                    oldest = time.monotonic()
+                chunks.append(data)
+                size += len(data)
+            stopping = data is None and self._stopping
+            if chunks and (
+                stopping
+                or size >= self.chunk_size
+                or time.monotonic() - oldest >= self.flush_interval
+            ):
+                write_all(self.fd, b"".join(chunks))
+                chunks = []
+                size = 0
+            if stopping:
+                return
+
+    def stop(self) -> None:
+        """Write what was received, close and remove the socket."""
+        if self._thread is None:
+            return
+        # The receiving thread returns once the socket stays idle.
+        self._stopping = True
+        self._thread.join()
+        self._thread = None
+        self._sock.close()
+        self._sock = None
+        if os.environ.get(LOG_SOCKET_ENV) == self.path:
+            del os.environ[LOG_SOCKET_ENV]
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+            self.path = None
+        else:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def _after_fork_in_child(self) -> None:
+        # Workers send to the socket, they must not receive from it.
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        self._thread = None
+        self._directory = None
+
+
+class DatagramSink(BackgroundJsonSink):
+    """BackgroundJsonSink sending its batches to the LogCollector.
+
+    Args:
+        path(str, optional): Collector socket path, defaults to the
+            ``FASTAPI_LOG_SOCKET`` environment variable, read when the
+            first batch is sent.
+        max_datagram(int): Maximum datagram size, in bytes.
+        **kwargs: BackgroundJsonSink arguments; ``fd`` is written to when
+            the collector cannot be reached.
+
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_datagram: int = MAX_DATAGRAM,
+        **kwargs,
+    ):
+        """Initialize DatagramSink class object instance."""
+        self.path = path
+        self.max_datagram = max_datagram
+        self._sock: Optional[socket.socket] = None
+        super().__init__(**kwargs)
+
+    def _reset(self) -> None:
+        super()._reset()
+        # A forked child connects its own socket.
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _connect(self) -> Optional[socket.socket]:
+        path = self.path or os.environ.get(LOG_SOCKET_ENV)
+        if not path:
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.connect(path)
+        except OSError:
+            sock.close()
+            return None
+        self._sock = sock
+        return sock
+
+    def _output(self, chunks: List[bytes]) -> None:
+        sock = self._sock or self._connect()
+        if sock is None:
+            FALLBACK_WRITES.inc()
+            super()._output(chunks)
+            return
+        datagram: List[bytes] = []
+        size = 0
+        for index, chunk in enumerate(chunks):
+            if datagram and size + len(chunk) > self.max_datagram:
+                if not self._send(sock, datagram, chunks[index:]):
+                    return
+                datagram = []
+                size = 0
+            datagram.append(chunk)
+            size += len(chunk)
+        if datagram:
+            self._send(sock, datagram, [])
+
+    def _send(
+        self, sock: socket.socket, datagram: List[bytes], rest: List[bytes]
+    ) -> bool:
+        try:
+            # Blocks while the collector is behind, records then pile up in
+            # the bounded buffer instead of the worker's memory.
+            sock.send(b"".join(datagram))
+            return True
+        except OSError:
+            # Collector gone, or a line too long for a datagram: write this
+            # batch directly and reconnect for the next one.
+            sock.close()
+            self._sock = None
+            FALLBACK_WRITES.inc()
+            super()._output(datagram + rest)
+            return False
+
+
+_collector: Optional[LogCollector] = None
+
+
+def start_log_collector() -> str:
+    """Start the log collector of this process, once.
+
+    Call it in the gunicorn arbiter before workers are forked.
+
+    Returns:
+        str: The collector socket path.
+
+    """
+    global _collector
+    if _collector is None:
+        _collector = LogCollector()
+        _collector.start()
+    return _collector.path
+
+
+def stop_log_collector() -> None:
+    """Stop the log collector of this process, if started."""
+    global _collector
+    if _collector is not None:
+        _collector.stop()
+        _collector = None
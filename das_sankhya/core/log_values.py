@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Level-guarded logging of values in hot paths.
+
+A loguru call below the level of every handler is not free: loguru gets the
+caller frame and the current time before comparing levels, and arguments
+formatted by the caller, such as ``"key: {}".format(key)``, are built anyway.
+Hot paths, like the Redis and HTTP client utilities, test level_enabled(),
+against the handler level set by global_log_config(), and only then format
+their values, with format_value() and
+format_url(), which cap them at ``LOG_VALUE_MAX_CHARS`` characters and, with
+``LOG_REDACT_VALUES``, leave out values, URL credentials and query strings.
+"""
+from typing import Any
+from urllib.parse import urlsplit, urlunsplit
+
+from loguru import logger
+
+from das_sankhya.config.logs import logs
+from das_sankhya.core.log_payload import truncate_payload
+
+DEBUG = logger.level("DEBUG").no
+
+# Lowest level of the loguru handlers; loguru's default handler logs DEBUG
+# records and up.
+_min_level = DEBUG
+
+
+def set_min_level(level_no: int) -> None:
+    """Record the lowest level of the configured loguru handlers."""
+    global _min_level
+    _min_level = level_no
+
+
+def level_enabled(level_no: int) -> bool:
+    """Whether a record of level_no would reach a loguru handler.
+
+    Compares level_no with the level recorded by set_min_level(), which
+    handlers must be configured with, as global_log_config() does.
+    """
+    return level_no >= _min_level
+
+
+def format_value(value: Any, redact: bool = None) -> str:
+    """Return value as logged: redacted if asked, and capped.
+
+    Args:
+        value(Any): Logged value.
+        redact(bool, optional): Whether to replace the value by its type and
+            size, defaults to LOG_REDACT_VALUES.
+
+    Returns:
+        str: The value text.
+
+    """
+    if redact is None:
+        redact = logs.LOG_REDACT_VALUES
+    if redact:
+        try:
+            return "<{0} of length {1}>".format(
+                type(value).__name__, len(value)
+            )
+        except TypeError:
+            return "<{0}>".format(type(value).__name__)
+    if not isinstance(value, (str, bytes, bytearray)):
+        value = repr(value)
+    text = truncate_payload(value, logs.LOG_VALUE_MAX_CHARS)
+    if not isinstance(text, str):
+        text = text.decode("utf-8", "replace")
+    return text
+
+
+def format_url(url: Any) -> str:
+    """Return url as logged: without credentials nor query if redacted.
+
+    Args:
+        url(Any): Logged URL, a string or yarl URL.
+
+    Returns:
+        str: The URL text.
+
+    """
+    url = str(url)
+    if logs.LOG_REDACT_VALUES:
+        parts = urlsplit(url)
+        netloc = parts.netloc.rpartition("@")[2]
+        query = "<redacted>" if parts.query else ""
+        url = urlunsplit((parts.scheme, netloc, parts.path, query, ""))
+    return truncate_payload(url, logs.LOG_VALUE_MAX_CHARS)
@@ -1,15 +1,16 @@
 # Python default modules
 import json
 import sys, logging
-from pprint import pformat
-from types import FrameType
-from typing import cast
 
 # Python modules installed using pipenv
 from loguru import logger
 from loguru._defaults import LOGURU_FORMAT  # noqa: WPS436
 
 # App core modules
+from das_sankhya.core.log_intercept import InterceptHandler
+from das_sankhya.core.log_payload import PayloadSink
+from das_sankhya.core.log_sinks import BackgroundTextSink
+from das_sankhya.core.logs2 import queue_options
 from das_sankhya.config import settings
 
 # Lib modules
@@ -24,24 +25,6 @@ LOGGERS = ("uvicorn.asgi", "uvicorn.access")
 #         logger_opt = logger.opt(depth=7, exception=record.exc_info)
 #         logger_opt.log(record.levelname, record.getMessage())
 
-class InterceptHandler(logging.Handler):
-    def emit(self, record: logging.LogRecord) -> None:  # pragma: no cover
-        # Get corresponding Loguru level if it exists
-        try:
-            level = logger.level(record.levelname).name
-        except ValueError:
-            level = str(record.levelno)
-
-        # Find caller from where originated the logged message
-        frame, depth = logging.currentframe(), 2
-        while frame.f_code.co_filename == logging.__file__:  # noqa: WPS609
-            frame = cast(FrameType, frame.f_back)
-            depth += 1
-
-        logger.opt(depth=depth, exception=record.exc_info).log(
-            level, record.getMessage(),
-        )
-
 # class InterceptHandler(logging.Handler):
 #     """
 #     Default handler from examples in loguru documentaion.
@@ -91,11 +74,8 @@ def format_record(record: dict) -> str:
     """
     format_string = "[{time}] [application_name] [correlationId] [{level}] - {name}:{function}:{line} - {message}"
 
-    if record["extra"].get("payload") is not None:
-        record["extra"]["payload"] = pformat(
-            record["extra"]["payload"], indent=4, compact=True, width=88
-        )
-        format_string += "\n<level>{extra[payload]}</level>"
+    # Payloads are rendered by the sink, off the calling thread for
+    # BackgroundTextSink.
 
     format_string += "{exception}\n"
     return format_string
@@ -112,11 +92,26 @@ for logger_name in LOGGERS:
 # Loguru configuration
 if settings.USING_DOCKER:
     logger.configure(
-        handlers=[{"sink": sys.stderr, "enqueue": True, "level": LOGGING_LEVEL, "format": format_record}]
+        handlers=[
+            {
+                "sink": BackgroundTextSink(
+                    fd=sys.stderr.fileno(), **queue_options()
+                ),
+                "level": LOGGING_LEVEL,
+                "format": format_record,
+            }
+        ]
     )
 else:
     logger.configure(
-        handlers=[{"sink": sys.stderr, "enqueue": False, "level": LOGGING_LEVEL, "format": format_record}]
+        handlers=[
+            {
+                "sink": PayloadSink(sys.stderr),
+                "enqueue": False,
+                "level": LOGGING_LEVEL,
+                "format": format_record,
+            }
+        ]
     )
 logger.debug('Logging system initialized')
 
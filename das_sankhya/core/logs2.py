@@ -1,21 +1,31 @@
 import logging
 import os
-import pendulum
-from pprint import pformat
 from sys import stdout
-from typing import Union
+from typing import Optional, Union
 from loguru import logger
 from gunicorn.glogging import Logger
 
-try:
-    from orjson import dumps
-except:
-    from json import dumps
-
-from das_sankhya.middlewares.asgi_correlation_id.context import correlation_id, request_id
+from das_sankhya.middlewares.asgi_correlation_id.context import (
+    correlation_id,
+    idempotency_key,
+    request_id,
+    tracing_context,
+)
 
 # App core modules
 from das_sankhya.config.application import settings
+from das_sankhya.config.logs import logs
+from das_sankhya.core.access_log import disable_server_access_logs
+from das_sankhya.core.log_buffer import tail_log_buffer
+from das_sankhya.core.log_dedup import DedupFilter
+from das_sankhya.core.log_encoder import RecordEncoder
+from das_sankhya.core.log_exceptions import ExceptionCapture
+from das_sankhya.core.log_files import RotatingFile
+from das_sankhya.core.log_intercept import InterceptHandler
+from das_sankhya.core.log_sampling import SamplingFilter
+from das_sankhya.core.log_sinks import BackgroundJsonSink, BackgroundTextSink
+from das_sankhya.core.log_transport import DatagramSink
+from das_sankhya.core.log_values import set_min_level
 
 # References
 # Solution comes from:
@@ -24,53 +34,65 @@ from das_sankhya.config.application import settings
 #   https://github.com/Delgan/loguru/issues/365
 #   https://loguru.readthedocs.io/en/stable/api/logger.html#sink
 
+# The pid only changes on fork, there is no need to ask for it on every call.
+_pid = os.getpid()
+
+
+def _update_pid():
+    global _pid
+    _pid = os.getpid()
+
+
+os.register_at_fork(after_in_child=_update_pid)
+
+
 def set_log_extras(record):
-    record["extra"]["datetime"] = pendulum.now("UTC")   # Log datetime in UTC time zone
-    # record["extra"]["app_name"] = settings.PROJECT_NAME
-    record["extra"]["correlation_id"] = correlation_id.get()
-    record["extra"]["request_id"] = request_id.get()
-    record["extra"]["pid"] = os.getpid()
-
-class InterceptHandler(logging.Handler):
-    def emit(self, record):
-        # Get corresponding Loguru level if it exists
-        try:
-            level = logger.level(record.levelname).name
-        except ValueError:
-            level = record.levelno
-
-        # Find caller from where originated the logged message
-        frame, depth = logging.currentframe(), 2
-        while frame.f_code.co_filename == logging.__file__:
-            frame = frame.f_back
-            depth += 1
-
-        logger.opt(depth=depth, exception=record.exc_info).log(
-            level, record.getMessage()
-        )
+    # Runs on every log call: one ContextVar lookup in requests, and no
+    # timestamp, the handlers format loguru's own record["time"] if needed.
+    extra = record["extra"]
+    ctx = tracing_context.get()
+    if ctx is not None:
+        ids = (ctx.correlation_id, ctx.request_id, ctx.idempotency_key)
+    else:
+        ids = (correlation_id.get(), request_id.get(), idempotency_key.get())
+    # Values bound explicitly, e.g. by threads outside the request context, win.
+    if extra.get("correlation_id") is None:
+        extra["correlation_id"] = ids[0]
+    if extra.get("request_id") is None:
+        extra["request_id"] = ids[1]
+    if extra.get("idempotency_key") is None:
+        extra["idempotency_key"] = ids[2]
+    extra["pid"] = _pid
+
+
+# Log datetime in UTC time zone, formatted by the handler from record["time"]
+# with strftime, loguru parses its own time tokens on every call.
+LOG_FORMAT = (
+    "<green>{time:%Y-%m-%dT%H:%M:%S.%fZ!UTC}</green> | "
+    "<green>{extra[pid]}</green> | "
+    "<green>{extra[correlation_id]}</green> | "
+    "<green>{extra[request_id]}</green> | "
+    "<level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+    "<level>{message}</level>"
+)
+
+# Format with and without exception, so none is built per record.
+_FORMATS = (LOG_FORMAT + "\n", LOG_FORMAT + "{exception}\n")
+
 
 def format_record(record: dict) -> str:
     """
     Custom format for loguru loggers.
-    Uses pformat for log any data like request/response body 
+    Data bound as payload, like request/response bodies, is not part of the
+    format: BackgroundTextSink pretty-prints it after the line, off the
+    calling thread.
+    >>> logger.bind(payload=dataobject).info("Received data")
     >>> [   {   'count': 2,
     >>>         'users': [   {'age': 87, 'is_active': True, 'name': 'Nick'},
     >>>                      {'age': 27, 'is_active': True, 'name': 'Alex'}]}]
     """
-    # format_string = LOGURU_FORMAT
-    # format_string = '<green>{extra[datetime]}</green> | <green>{extra[app_name]}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level> | <level>{extra}</level>'
-    format_string = "<green>{extra[datetime]}</green> | <green>{extra[pid]}</green> | <green>{extra[correlation_id]}</green> | <green>{extra[request_id]}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
-
-    # This is to nice print data, like: logger.bind(payload=dataobject).info("Received data")
-    if record["extra"].get("payload") is not None:
-        record["extra"]["payload"] = pformat(
-            record["extra"]["payload"], indent=4, compact=True, width=88
-        )
-        format_string += "\n<level>{extra[payload]}</level>"
-
-    format_string += "{exception}\n"
-
-    return format_string
+    return _FORMATS[record["exception"] is not None]
 
 class StubbedGunicornLogger(Logger):
     def setup(self, cfg):
@@ -86,35 +108,111 @@ class StubbedGunicornLogger(Logger):
 
         self.error_logger.setLevel(self.loglevel)
         self.access_logger.setLevel(self.loglevel)
+        if logs.LOG_ACCESS:
+            # Replaced by the access log of TimingMiddleware.
+            disable_server_access_logs()
 
 
 # BUILT_IN_TYPE = (int, float, str)
 
+json_encoder = RecordEncoder()
+
 
 def orjson_log_sink(msg):
-    r = msg.record
-    rec = {
-        "elapsed": r["elapsed"].total_seconds(),
-        "time": r["time"].isoformat(),
-        "level": {
-            "name": r["level"].name,
-            "no": r["level"].no,
-        },
-        "process": {"id": r["process"].id, "name": r["process"].name},
-        "thread": {"id": r["thread"].id, "name": r["thread"].name},
-        "file": r["file"].path,
+    """Write records as JSON lines, synchronously on the logging thread.
+
+    global_log_config uses BackgroundJsonSink instead, which serializes and
+    writes records off the event loop.
+    """
+    stdout.buffer.write(json_encoder.encode(msg.record))
+    stdout.flush()
+
+
+def sampling_filter() -> Optional[SamplingFilter]:
+    """Return the log sampling filter configured in settings, if enabled."""
+    if not logs.LOG_SAMPLING_ENABLED:
+        return None
+    return SamplingFilter(
+        rate=logs.LOG_SAMPLING_RATE,
+        every=logs.LOG_SAMPLING_EVERY,
+        rules=logs.LOG_SAMPLING_RULES,
+        min_level=logs.LOG_SAMPLING_MIN_LEVEL,
+        summary_interval=logs.LOG_SAMPLING_SUMMARY_INTERVAL,
+    )
+
+
+def queue_options() -> dict:
+    """Return the log queue arguments of background sinks from settings."""
+    return {
+        "max_pending": logs.LOG_QUEUE_SIZE,
+        "overflow": logs.LOG_QUEUE_OVERFLOW,
+        "block_timeout": logs.LOG_QUEUE_BLOCK_TIMEOUT,
+        "keep_level": logs.LOG_QUEUE_KEEP_LEVEL,
     }
 
-    if r["exception"]:
-        rec["exception"] = str(msg)
 
-    for k, v in r.items():
-        print(k, type(v), v)
-        if k in rec:
-            continue
-        rec[k] = v
+def dedup_filter() -> Optional[DedupFilter]:
+    """Return the repeated records filter configured in settings, if enabled."""
+    if not logs.LOG_DEDUP_ENABLED:
+        return None
+    return DedupFilter(
+        level=logs.LOG_DEDUP_LEVEL,
+        window=logs.LOG_DEDUP_WINDOW,
+        max_samples=logs.LOG_DEDUP_MAX_SAMPLES,
+    )
+
+
+def exception_capture() -> Optional[ExceptionCapture]:
+    """Return the exception capture configured in settings, if enabled."""
+    if not logs.LOG_EXCEPTION_CAPTURE:
+        return None
+    return ExceptionCapture(
+        full_tracebacks=logs.LOG_EXCEPTION_FULL_TRACEBACKS,
+        max_fingerprints=logs.LOG_EXCEPTION_MAX_FINGERPRINTS,
+        window=logs.LOG_EXCEPTION_WINDOW,
+    )
+
+
+def log_file() -> Optional[RotatingFile]:
+    """Return the rotating log file configured in settings, if enabled."""
+    if logs.LOG_TRANSPORT != "file":
+        return None
+    return RotatingFile(
+        directory=logs.LOG_FILE_DIRECTORY,
+        name=logs.LOG_FILE_NAME,
+        max_bytes=logs.LOG_FILE_MAX_BYTES,
+        interval=logs.LOG_FILE_INTERVAL,
+        preallocate=logs.LOG_FILE_PREALLOCATE,
+        compression=logs.LOG_FILE_COMPRESSION,
+    )
+
+
+def chain_filters(*filters):
+    """Combine loguru filters, skipping None ones; a record must pass all."""
+    filters = tuple(f for f in filters if f is not None)
+    if len(filters) <= 1:
+        return filters[0] if filters else None
 
-    print(dumps(rec), flush=True)
+    def log_filter(record):
+        for f in filters:
+            if not f(record):
+                return False
+        return True
+
+    return log_filter
+
+
+def chain_patchers(*patchers):
+    """Combine loguru patchers, skipping None ones, applied in order."""
+    patchers = tuple(p for p in patchers if p is not None)
+    if len(patchers) == 1:
+        return patchers[0]
+
+    def patcher(record):
+        for p in patchers:
+            p(record)
+
+    return patcher
 
 
 def global_log_config(log_level: Union[str, int] = logging.INFO, json: bool = True):
@@ -125,6 +223,8 @@ def global_log_config(log_level: Union[str, int] = logging.INFO, json: bool = Tr
     # logging.basicConfig(handlers=[intercept_handler], level=LOG_LEVEL)
     # logging.root.handlers = [intercept_handler]
     logging.root.setLevel(log_level)
+    if not isinstance(log_level, int):
+        log_level = logger.level(log_level).no
 
     seen = set()
     for name in [
@@ -140,15 +240,41 @@ def global_log_config(log_level: Union[str, int] = logging.INFO, json: bool = Tr
         if name not in seen:
             seen.add(name.split(".")[0])
             logging.getLogger(name).handlers = [intercept_handler]
+    if logs.LOG_ACCESS:
+        # Replaced by the access log of TimingMiddleware.
+        disable_server_access_logs()
+
+    # Buffered records are only sampled and folded when they are replayed.
+    log_filter = chain_filters(
+        tail_log_buffer if logs.LOG_TAIL_ENABLED else None,
+        sampling_filter(),
+        dedup_filter(),
+    )
 
     if json:
+        if logs.LOG_TRANSPORT == "datagram":
+            # Sent to the collector of the gunicorn arbiter, see
+            # core/log_transport.py.
+            json_sink = DatagramSink(encoder=json_encoder, **queue_options())
+        else:
+            json_sink = BackgroundJsonSink(
+                encoder=json_encoder, file=log_file(), **queue_options()
+            )
         logger.configure(
             handlers=[
                 {
-                    "sink": orjson_log_sink,
-                    "serialize": json,
-                    "diagnose": True,
-                    "backtrace": True,
+                    # Records are serialized by the sink's writer thread, the
+                    # logging thread only formats the bare message.
+                    "sink": json_sink,
+                    "level": log_level,
+                    "format": "{message}",
+                    "filter": log_filter,
+                    "serialize": False,
+                    "colorize": False,
+                    # The encoder renders exceptions itself: loguru's
+                    # rendering, done for every handler, is not used.
+                    "diagnose": False,
+                    "backtrace": False,
                 }
             ]
         )
@@ -156,19 +282,28 @@ def global_log_config(log_level: Union[str, int] = logging.INFO, json: bool = Tr
         logger.configure(
             handlers=[
                 {
-                    "sink": stdout,
-                    # https://loguru.readthedocs.io/en/stable/api/logger.html#sink
-                    # "sink": "./somefile.log",
-                    # "rotation": "10 MB",
+                    # Lines are written, and bound payloads rendered, by the
+                    # sink's writer thread through a bounded queue.
+                    # Rotating files with FASTAPI_LOG_TRANSPORT=file.
+                    "sink": BackgroundTextSink(
+                        fd=stdout.fileno(), file=log_file(), **queue_options()
+                    ),
+                    "level": log_level,
                     "serialize": False,
-                    # "format": "<green>{extra[datetime]}</green> | <green>{extra[correlation_id]}</green> | <green>{extra[request_id]}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
                     "format": format_record,
+                    "filter": log_filter,
                     "diagnose": True,
                     "backtrace": True,
-                    "enqueue": True,
                 }
             ]
         )
-    logger.configure(patcher=set_log_extras)
+    # Guards the formatting of values logged on hot paths, see
+    # core/log_values.py.
+    set_min_level(log_level)
+    # Exceptions are fingerprinted once per record, before any handler
+    # renders them.
+    logger.configure(
+        patcher=chain_patchers(set_log_extras, exception_capture())
+    )
 
     return logger
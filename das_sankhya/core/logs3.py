@@ -2,18 +2,21 @@
 import json
 import pendulum
 import sys, logging
-from pprint import pformat
-from types import FrameType
-from typing import cast
 
 # Python modules installed using pipenv
 from loguru import logger
 from loguru._defaults import LOGURU_FORMAT  # noqa: WPS436
 from das_sankhya.middlewares.asgi_correlation_id import CorrelationIdMiddleware
-from das_sankhya.middlewares.asgi_correlation_id.context import correlation_id
-from starlette_context import context
+from das_sankhya.middlewares.asgi_correlation_id.context import (
+    get_correlation_id,
+    get_request_id,
+)
 
 # App core modules
+from das_sankhya.core.log_intercept import InterceptHandler
+from das_sankhya.core.log_payload import PayloadSink
+from das_sankhya.core.log_sinks import BackgroundTextSink
+from das_sankhya.core.logs2 import queue_options
 from das_sankhya.config.application import settings
 
 # Lib modules
@@ -26,29 +29,8 @@ LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.asgi", "uvicorn.access", "gunico
 def set_log_extras(record):
     record["extra"]["datetime"] = pendulum.now("UTC")
     record["extra"]["app_name"] = settings.PROJECT_NAME
-    record["extra"]["correlation_id"] = correlation_id.get()
-    if context.exists():
-        record["extra"]["request_id"] = correlation_id.get()
-    else:
-        record["extra"]["request_id"] = None
-
-class InterceptHandler(logging.Handler):
-    def emit(self, record: logging.LogRecord) -> None:  # pragma: no cover
-        # Get corresponding Loguru level if it exists
-        try:
-            level = logger.level(record.levelname).name
-        except ValueError:
-            level = str(record.levelno)
-
-        # Find caller from where originated the logged message
-        frame, depth = logging.currentframe(), 2
-        while frame.f_code.co_filename == logging.__file__:  # noqa: WPS609
-            frame = cast(FrameType, frame.f_back)
-            depth += 1
-
-        logger.opt(depth=depth, exception=record.exc_info).log(
-            level, record.getMessage(),
-        )
+    record["extra"]["correlation_id"] = get_correlation_id()
+    record["extra"]["request_id"] = get_request_id()
 
 
 def format_record(record: dict) -> str:
@@ -64,11 +46,8 @@ def format_record(record: dict) -> str:
     format_string = 'XXXXX <green>{extra[request_id]}</green> | <green>{extra[correlation_id]}</green> | <green>{extra[datetime]}</green> | <green>{extra[app_name]}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>'
     # format_string = "[{time}] [{extra[application_name]}] [{extra[correlationId]}] [{level}] - {name}:{function}:{line} - {message}"
 
-    if record["extra"].get("payload") is not None:
-        record["extra"]["payload"] = pformat(
-            record["extra"]["payload"], indent=4, compact=True, width=88
-        )
-        format_string += "\n<level>{extra[payload]}</level>"
+    # Payloads are rendered by the sink, off the calling thread for
+    # BackgroundTextSink.
 
     format_string += "{exception}\n"
     logger.debug(format_string)
@@ -86,11 +65,26 @@ for logger_name in LOGGERS:
 # Loguru configuration
 if settings.USING_DOCKER:
     logger.configure(
-        handlers=[{"sink": sys.stderr, "enqueue": True, "level": LOGGING_LEVEL, "format": format_record}]
+        handlers=[
+            {
+                "sink": BackgroundTextSink(
+                    fd=sys.stderr.fileno(), **queue_options()
+                ),
+                "level": LOGGING_LEVEL,
+                "format": format_record,
+            }
+        ]
     )
 else:
     logger.configure(
-        handlers=[{"sink": sys.stderr, "enqueue": False, "level": LOGGING_LEVEL, "format": format_record}]
+        handlers=[
+            {
+                "sink": PayloadSink(sys.stderr),
+                "enqueue": False,
+                "level": LOGGING_LEVEL,
+                "format": format_record,
+            }
+        ]
     )
 
 # Force all log time in UTC
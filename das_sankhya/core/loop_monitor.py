@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Event loop lag monitor.
+
+A ticker task sleeps for ``interval`` seconds in a loop and records how late
+it wakes up in the ``event_loop_lag_seconds`` histogram. That delay is the
+time callbacks queued on the loop wait before they run, i.e. the latency
+added to every request by whatever is blocking the loop.
+
+A watchdog thread checks the ticker's heartbeat. When the loop has not run
+the ticker for longer than ``threshold``, the loop is blocked right now, so
+the watchdog captures the stack of the loop thread with
+``sys._current_frames()`` and logs it once per stall, together with the
+correlation ID and path of the request being handled. No asyncio debug mode
+is needed.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Optional, Tuple
+
+from loguru import logger
+
+from das_sankhya.core.metrics import registry
+from das_sankhya.middlewares.asgi_correlation_id.context import TracingContext
+
+LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds",
+    "Delay of event loop callbacks behind schedule.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_STALLS = registry.counter(
+    "event_loop_stalls",
+    "Event loop stalls longer than the stall threshold.",
+)
+
+
+def find_request(frame) -> Tuple[Optional[str], Optional[str]]:
+    """Find the request being handled by the code running in frame.
+
+    Walks from frame outwards through the ASGI ``__call__`` frames, looking
+    for the TracingContext of TracingMiddleware and for the request scope.
+
+    Returns:
+        tuple: Correlation ID and path, each None if not found.
+
+    """
+    correlation_id = None
+    path = None
+    while frame is not None and correlation_id is None:
+        code = frame.f_code
+        if code.co_name == "__call__" and "scope" in code.co_varnames:
+            local_vars = frame.f_locals
+            ctx = local_vars.get("ctx")
+            if isinstance(ctx, TracingContext):
+                correlation_id = ctx.correlation_id
+            scope = local_vars.get("scope")
+            if path is None and isinstance(scope, dict):
+                path = scope.get("path")
+        frame = frame.f_back
+    return correlation_id, path
+
+
+class LoopMonitor(object):
+    """Event loop lag histogram and stall stack capture.
+
+    Args:
+        interval(float): Ticker period, in seconds.
+        threshold(float): Lag, in seconds, above which the loop is considered
+            stalled and its stack is captured.
+        max_frames(int): Maximum number of innermost frames logged.
+
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        threshold: float = 0.25,
+        max_frames: int = 40,
+    ):
+        """Initialize LoopMonitor class object instance."""
+        self.interval = interval
+        self.threshold = threshold
+        self.max_frames = max_frames
+        self.log = logger
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread: Optional[int] = None
+        self._heartbeat = 0.0
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        """Stop the ticker task and the watchdog thread."""
+        if self._task is None:
+            return
+        self._stopped.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._watchdog.join()
+        self._watchdog = None
+
+    async def _tick(self) -> None:
+        interval = self.interval
+        observe = LOOP_LAG.labels().observe
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            observe(max(now - start - interval, 0.0))
+            self._heartbeat = now
+
+    def _watch(self) -> None:
+        reported = False
+        # Check often enough to catch stalls barely over the threshold.
+        period = min(self.interval, self.threshold) / 2
+        while not self._stopped.wait(period):
+            lag = time.monotonic() - self._heartbeat - self.interval
+            if lag <= self.threshold:
+                reported = False
+            elif not reported:
+                reported = True
+                LOOP_STALLS.inc()
+                self._report(lag)
+
+    def _report(self, lag: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return
+        correlation_id, path = find_request(frame)
+        stack = "".join(
+            traceback.format_list(
+                traceback.extract_stack(frame)[-self.max_frames :]
+            )
+        )
+        # Bound, since the watchdog thread does not see the request context.
+        self.log.bind(correlation_id=correlation_id).warning(
+            "Event loop blocked for {lag:.3f}s handling {path}, "
+            "loop thread stack:\n{stack}",
+            lag=lag,
+            path=path,
+            stack=stack,
+        )
@@ -0,0 +1,568 @@
+# -*- coding: utf-8 -*-
+"""In-process metrics registry with Prometheus text exposition.
+
+Counters, gauges and fixed-bucket histograms keep their values in an mmap
+segment per process. When ``FASTAPI_METRICS_DIR`` is set, the segments are
+files in that directory, so any gunicorn worker can serve ``/metrics`` for all
+of them by summing the files of its siblings instead of each pid being scraped
+separately. Without it (e.g. uvicorn in development) an anonymous mmap is used
+and only the current process is reported.
+
+Only the owning process ever writes to a segment, so updates are plain 8 byte
+stores with no cross-process locking; new entries are written before the used
+size in the header is bumped, so readers never see a partial entry.
+"""
+import bisect
+import glob
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import weakref
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+METRICS_DIR_ENV = "FASTAPI_METRICS_DIR"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+INF = float("inf")
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    INF,
+)
+
+_INITIAL_SIZE = 1 << 16
+_USED = struct.Struct("=i")
+_KEY_LENGTH = struct.Struct("=i")
+_VALUE = struct.Struct("=d")
+_DATA_START = 8
+
+# Registries to reset in forked children.
+_registries: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for metrics_registry in list(_registries):
+        metrics_registry._reset()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _entry_padding(key_length: int) -> int:
+    return 8 - (_KEY_LENGTH.size + key_length) % 8
+
+
+def _read_entries(data, used: int) -> Iterator[Tuple[str, float, int]]:
+    """Yield (key, value, value position) of every entry in a segment."""
+    pos = _DATA_START
+    while pos < used:
+        (length,) = _KEY_LENGTH.unpack_from(data, pos)
+        pos += _KEY_LENGTH.size
+        key = bytes(data[pos : pos + length]).decode("utf-8")
+        pos += length + _entry_padding(length)
+        (value,) = _VALUE.unpack_from(data, pos)
+        yield key, value, pos
+        pos += _VALUE.size
+
+
+class _MmapedValues(object):
+    """Float values keyed by string, stored in an mmap segment.
+
+    Args:
+        path(str, optional): Segment file, an anonymous mmap is used if None.
+
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """Initialize _MmapedValues class object instance."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._positions: Dict[str, int] = {}
+        if path is None:
+            self._file = None
+            self._capacity = _INITIAL_SIZE
+            self._mm = mmap.mmap(-1, self._capacity)
+            self._used = _DATA_START
+            _USED.pack_into(self._mm, 0, self._used)
+        else:
+            self._file = open(path, "a+b")
+            size = os.fstat(self._file.fileno()).st_size
+            if size < _INITIAL_SIZE:
+                self._file.truncate(_INITIAL_SIZE)
+                size = _INITIAL_SIZE
+            self._capacity = size
+            self._mm = mmap.mmap(self._file.fileno(), self._capacity)
+            self._used = _USED.unpack_from(self._mm, 0)[0] or _DATA_START
+            for key, _, pos in _read_entries(self._mm, self._used):
+                self._positions[key] = pos
+
+    def position(self, key: str) -> int:
+        """Return the position of the value for key, adding it if new."""
+        pos = self._positions.get(key)
+        if pos is not None:
+            return pos
+        with self._lock:
+            pos = self._positions.get(key)
+            if pos is None:
+                pos = self._add(key)
+        return pos
+
+    def _add(self, key: str) -> int:
+        encoded = key.encode("utf-8")
+        entry = struct.pack(
+            "=i{0}s{1}xd".format(len(encoded), _entry_padding(len(encoded))),
+            len(encoded),
+            encoded,
+            0.0,
+        )
+        while self._used + len(entry) > self._capacity:
+            self._grow()
+        self._mm[self._used : self._used + len(entry)] = entry
+        self._used += len(entry)
+        _USED.pack_into(self._mm, 0, self._used)
+        pos = self._used - _VALUE.size
+        self._positions[key] = pos
+        return pos
+
+    def _grow(self) -> None:
+        capacity = self._capacity * 2
+        if self._file is None:
+            mm = mmap.mmap(-1, capacity)
+            mm[: self._capacity] = self._mm[:]
+        else:
+            self._file.truncate(capacity)
+            mm = mmap.mmap(self._file.fileno(), capacity)
+        self._mm.close()
+        self._mm = mm
+        self._capacity = capacity
+
+    def write(self, pos: int, value: float) -> None:
+        """Store value at a position returned by position()."""
+        _VALUE.pack_into(self._mm, pos, value)
+
+    def read_all(self) -> Iterator[Tuple[str, float]]:
+        """Yield every (key, value) pair of this segment."""
+        for key, value, _ in _read_entries(self._mm, self._used):
+            yield key, value
+
+
+def _read_segment(path: str) -> Iterator[Tuple[str, float]]:
+    """Yield every (key, value) pair of another process' segment file."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return
+    if len(data) < _DATA_START:
+        return
+    (used,) = _USED.unpack_from(data, 0)
+    for key, value, _ in _read_entries(data, min(used, len(data))):
+        yield key, value
+
+
+def _format_value(value: float) -> str:
+    if value == INF:
+        return "+Inf"
+    if value == -INF:
+        return "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = ",".join(
+        '{0}="{1}"'.format(name, _escape(value)) for name, value in labels
+    )
+    return "{" + labels + "}" if labels else ""
+
+
+class _Child(object):
+    """Metric values for one combination of label values."""
+
+    def __init__(self, storage: _MmapedValues, keys: Sequence[str]):
+        """Initialize _Child class object instance."""
+        self._storage = storage
+        self._positions = [storage.position(key) for key in keys]
+        self._values = [0.0] * len(keys)
+
+    def _add(self, index: int, amount: float) -> None:
+        value = self._values[index] + amount
+        self._values[index] = value
+        self._storage.write(self._positions[index], value)
+
+
+class _CounterChild(_Child):
+    def inc(self, amount: float = 1) -> None:
+        """Increment the counter by amount."""
+        self._add(0, amount)
+
+
+class _GaugeChild(_Child):
+    def inc(self, amount: float = 1) -> None:
+        """Increment the gauge by amount."""
+        self._add(0, amount)
+
+    def dec(self, amount: float = 1) -> None:
+        """Decrement the gauge by amount."""
+        self._add(0, -amount)
+
+    def set(self, value: float) -> None:
+        """Set the gauge to value."""
+        self._values[0] = value
+        self._storage.write(self._positions[0], value)
+
+
+class _HistogramChild(_Child):
+    def __init__(self, storage, keys, buckets):
+        """Initialize _HistogramChild class object instance."""
+        super().__init__(storage, keys)
+        self._buckets = buckets
+        self._sum = len(buckets)
+        self._count = len(buckets) + 1
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        self._add(bisect.bisect_left(self._buckets, value), 1)
+        self._add(self._sum, value)
+        self._add(self._count, 1)
+
+
+class Metric(object):
+    """Base class of registered metrics.
+
+    Args:
+        registry(MetricsRegistry): Registry owning the metric values.
+        name(str): Metric name.
+        documentation(str): Help text.
+        labelnames(Sequence[str]): Label names, values are given in the same
+            order to labels().
+
+    """
+
+    kind = ""
+    storage_kind = "counter"
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        """Initialize Metric class object instance."""
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, _Child] = {}
+
+    def labels(self, *values):
+        """Return the child metric for the given label values."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(
+                    "{0} expects labels {1}".format(self.name, self.labelnames)
+                )
+            labels = list(zip(self.labelnames, (str(v) for v in values)))
+            child = self._make_child(
+                self.registry.storage(self.storage_kind), labels
+            )
+            self._children[values] = child
+        return child
+
+    def _key(self, suffix: str, labels: List) -> str:
+        return json.dumps([self.name, suffix, labels])
+
+    def _make_child(self, storage, labels):
+        raise NotImplementedError
+
+    def _reset(self) -> None:
+        self._children.clear()
+
+    def render(self, samples, lines: List[str]) -> None:
+        """Append exposition lines for aggregated samples of this metric."""
+        for (suffix, labels), value in sorted(samples.items()):
+            lines.append(
+                "{0}{1}{2} {3}".format(
+                    self.name,
+                    suffix,
+                    _format_labels(labels),
+                    _format_value(value),
+                )
+            )
+
+
+class Counter(Metric):
+    """Monotonically increasing counter, summed across processes."""
+
+    kind = "counter"
+
+    def _make_child(self, storage, labels):
+        return _CounterChild(storage, [self._key("_total", labels)])
+
+    def inc(self, amount: float = 1) -> None:
+        """Increment the unlabelled counter by amount."""
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    """Gauge summed across live processes.
+
+    The segment of a process is dropped by mark_process_dead() when it exits.
+    """
+
+    kind = "gauge"
+    storage_kind = "gauge"
+
+    def _make_child(self, storage, labels):
+        return _GaugeChild(storage, [self._key("", labels)])
+
+    def inc(self, amount: float = 1) -> None:
+        """Increment the unlabelled gauge by amount."""
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        """Decrement the unlabelled gauge by amount."""
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        """Set the unlabelled gauge to value."""
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    """Fixed-bucket histogram, summed across processes.
+
+    Args:
+        buckets(Sequence[float]): Sorted upper bounds, +Inf is added if
+            missing.
+
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        registry,
+        name,
+        documentation,
+        labelnames=(),
+        buckets=DEFAULT_BUCKETS,
+    ):
+        """Initialize Histogram class object instance."""
+        super().__init__(registry, name, documentation, labelnames)
+        buckets = tuple(sorted(float(b) for b in buckets))
+        if not buckets or buckets[-1] != INF:
+            buckets += (INF,)
+        self.buckets = buckets
+
+    def _make_child(self, storage, labels):
+        keys = [
+            self._key("_bucket", labels + [["le", _format_value(bound)]])
+            for bound in self.buckets
+        ]
+        keys.append(self._key("_sum", labels))
+        keys.append(self._key("_count", labels))
+        return _HistogramChild(storage, keys, self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Record one observation in the unlabelled histogram."""
+        self.labels().observe(value)
+
+    def render(self, samples, lines: List[str]) -> None:
+        """Append exposition lines, with cumulative bucket counts."""
+        series: Dict[tuple, Dict] = {}
+        for (suffix, labels), value in samples.items():
+            if suffix == "_bucket":
+                le = labels[-1][1]
+                series.setdefault(labels[:-1], {})[le] = value
+            else:
+                series.setdefault(labels, {})[suffix] = value
+        for labels in sorted(series):
+            values = series[labels]
+            cumulative = 0.0
+            for bound in self.buckets:
+                le = _format_value(bound)
+                cumulative += values.get(le, 0.0)
+                lines.append(
+                    "{0}_bucket{1} {2}".format(
+                        self.name,
+                        _format_labels(labels + (("le", le),)),
+                        _format_value(cumulative),
+                    )
+                )
+            for suffix in ("_sum", "_count"):
+                lines.append(
+                    "{0}{1}{2} {3}".format(
+                        self.name,
+                        suffix,
+                        _format_labels(labels),
+                        _format_value(values.get(suffix, 0.0)),
+                    )
+                )
+
+
+class MetricsRegistry(object):
+    """Registry of metrics sharing one mmap segment per kind and process.
+
+    Args:
+        directory(str, optional): Directory holding the segments of every
+            worker. Defaults to the FASTAPI_METRICS_DIR environment variable,
+            read when a process first records a value; without either, values
+            are kept in an anonymous mmap and only this process is reported.
+
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        """Initialize MetricsRegistry class object instance."""
+        self._directory = directory
+        self._metrics: Dict[str, Metric] = {}
+        self._storages: Dict[str, _MmapedValues] = {}
+        self._lock = threading.Lock()
+        _registries.add(self)
+
+    @property
+    def directory(self) -> Optional[str]:
+        """Directory of the shared segments, if any."""
+        return self._directory or os.environ.get(METRICS_DIR_ENV) or None
+
+    def _reset(self) -> None:
+        # A forked worker must not write into its parent's segments.
+        self._storages = {}
+        for metric in self._metrics.values():
+            metric._reset()
+
+    def storage(self, kind: str) -> _MmapedValues:
+        """Return this process' segment for kind (counter or gauge)."""
+        storage = self._storages.get(kind)
+        if storage is None:
+            with self._lock:
+                storage = self._storages.get(kind)
+                if storage is None:
+                    directory = self.directory
+                    path = None
+                    if directory:
+                        path = os.path.join(
+                            directory, "{0}_{1}.db".format(kind, os.getpid())
+                        )
+                    storage = self._storages[kind] = _MmapedValues(path)
+        return storage
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(
+                "Metric {0} is already registered".format(metric.name)
+            )
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        """Create and register a counter."""
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        """Create and register a gauge."""
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Create and register a histogram."""
+        return self._register(
+            Histogram(self, name, documentation, labelnames, buckets)
+        )
+
+    def _read(self) -> Iterator[Tuple[str, float]]:
+        directory = self.directory
+        if directory:
+            for path in glob.glob(os.path.join(directory, "*.db")):
+                yield from _read_segment(path)
+        else:
+            for storage in list(self._storages.values()):
+                yield from storage.read_all()
+
+    def collect(self) -> str:
+        """Render all metrics, aggregated over every worker, as text.
+
+        Returns:
+            str: Prometheus text exposition format, version 0.0.4.
+
+        """
+        samples: Dict[str, Dict] = {}
+        for key, value in self._read():
+            name, suffix, labels = json.loads(key)
+            labels = tuple(tuple(label) for label in labels)
+            metric_samples = samples.setdefault(name, {})
+            sample = (suffix, labels)
+            metric_samples[sample] = metric_samples.get(sample, 0.0) + value
+
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(
+                "# HELP {0} {1}".format(
+                    metric.name,
+                    metric.documentation.replace("\\", "\\\\").replace(
+                        "\n", "\\n"
+                    ),
+                )
+            )
+            lines.append("# TYPE {0} {1}".format(metric.name, metric.kind))
+            metric.render(samples.get(metric.name, {}), lines)
+        return "\n".join(lines) + "\n"
+
+
+def prepare_metrics_dir() -> str:
+    """Create or clean the shared metrics directory before workers start.
+
+    Meant for the gunicorn on_starting hook, which runs in the arbiter before
+    workers are forked. If FASTAPI_METRICS_DIR is not set, a temporary
+    directory is created and exported so that workers inherit it.
+
+    Returns:
+        str: The metrics directory.
+
+    """
+    directory = os.environ.get(METRICS_DIR_ENV)
+    if not directory:
+        directory = tempfile.mkdtemp(prefix="das_sankhya_metrics_")
+        os.environ[METRICS_DIR_ENV] = directory
+    else:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+    return directory
+
+
+def mark_process_dead(pid: int, directory: Optional[str] = None) -> None:
+    """Drop the gauge values of an exited worker.
+
+    Counters and histograms of dead workers are kept, so totals never go
+    down. Meant for the gunicorn child_exit hook.
+
+    Args:
+        pid(int): Process id of the exited worker.
+        directory(str, optional): Metrics directory, defaults to
+            FASTAPI_METRICS_DIR.
+
+    """
+    directory = directory or os.environ.get(METRICS_DIR_ENV)
+    if directory:
+        path = os.path.join(directory, "gauge_{0}.db".format(pid))
+        if os.path.exists(path):
+            os.remove(path)
+
+
+registry = MetricsRegistry()
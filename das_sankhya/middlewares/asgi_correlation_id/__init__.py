@@ -1,7 +1,13 @@
 from das_sankhya.middlewares.asgi_correlation_id.log_filters import correlation_id_filter, request_id_filter, idempotency_key_filter
-from das_sankhya.middlewares.asgi_correlation_id.middleware import CorrelationIdMiddleware, RequestIdMiddleware, IdempotencyKeyMiddleware
+from das_sankhya.middlewares.asgi_correlation_id.middleware import (
+    CorrelationIdMiddleware,
+    IdempotencyKeyMiddleware,
+    RequestIdMiddleware,
+    TracingMiddleware,
+)
 
 __all__ = (
+    'TracingMiddleware',
     'CorrelationIdMiddleware',
     'RequestIdMiddleware',
     'IdempotencyKeyMiddleware',
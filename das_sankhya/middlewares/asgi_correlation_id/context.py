@@ -1,7 +1,41 @@
 from contextvars import ContextVar
 from typing import Optional
 
+
+class TracingContext:
+    """
+    Per-request tracing IDs, populated once by the tracing middleware.
+
+    Holding all three IDs in one object means a single ContextVar lookup
+    gives log patchers and handlers everything they need.
+    """
+
+    __slots__ = ('correlation_id', 'request_id', 'idempotency_key')
+
+    def __init__(
+        self,
+        correlation_id: Optional[str] = None,
+        request_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> None:
+        """Store the tracing IDs of a request."""
+        self.correlation_id = correlation_id
+        self.request_id = request_id
+        self.idempotency_key = idempotency_key
+
+    def __repr__(self) -> str:
+        """Return the tracing IDs, for debugging."""
+        return (
+            f'TracingContext(correlation_id={self.correlation_id!r}, '
+            f'request_id={self.request_id!r}, '
+            f'idempotency_key={self.idempotency_key!r})'
+        )
+
+
 # Middleware
+tracing_context: ContextVar[Optional[TracingContext]] = ContextVar(
+    'tracing_context', default=None
+)
 correlation_id: ContextVar[Optional[str]] = ContextVar('correlation_id', default=None)
 request_id: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
 idempotency_key: ContextVar[Optional[str]] = ContextVar('idempotency_key', default=None)
@@ -9,3 +43,21 @@ idempotency_key: ContextVar[Optional[str]] = ContextVar('idempotency_key', defau
 # Celery extension
 celery_parent_id: ContextVar[Optional[str]] = ContextVar('celery_parent', default=None)
 celery_current_id: ContextVar[Optional[str]] = ContextVar('celery_current', default=None)
+
+
+def get_correlation_id() -> Optional[str]:
+    """Return the current correlation ID, whichever middleware set it."""
+    ctx = tracing_context.get()
+    return ctx.correlation_id if ctx is not None else correlation_id.get()
+
+
+def get_request_id() -> Optional[str]:
+    """Return the current request ID, whichever middleware set it."""
+    ctx = tracing_context.get()
+    return ctx.request_id if ctx is not None else request_id.get()
+
+
+def get_idempotency_key() -> Optional[str]:
+    """Return the current idempotency key, whichever middleware set it."""
+    ctx = tracing_context.get()
+    return ctx.idempotency_key if ctx is not None else idempotency_key.get()
@@ -4,7 +4,9 @@ from uuid import uuid4
 from celery import Task
 from celery.signals import before_task_publish, task_postrun, task_prerun
 
-from asgi_correlation_id.extensions.sentry import get_sentry_extension
+from das_sankhya.middlewares.asgi_correlation_id.extensions.sentry import (
+    get_sentry_extension,
+)
 
 
 def load_correlation_ids() -> None:
@@ -14,7 +16,10 @@ def load_correlation_ids() -> None:
 
     This is called as long as Celery is installed.
     """
-    from asgi_correlation_id.context import correlation_id
+    from das_sankhya.middlewares.asgi_correlation_id.context import (
+        correlation_id,
+        get_correlation_id,
+    )
 
     header_key = 'CORRELATION_ID'
     sentry_extension = get_sentry_extension()
@@ -28,7 +33,7 @@ def load_correlation_ids() -> None:
         This way we're able to correlate work executed by Celery workers, back
         to the originating request, when there was one.
         """
-        cid = correlation_id.get()
+        cid = get_correlation_id()
         if cid:
             headers[header_key] = cid
 
@@ -66,7 +71,10 @@ def load_celery_current_and_parent_ids(header_key: str = 'CELERY_PARENT_ID') ->
     This is not called automatically by the middleware.
     To use this, users should manually run it during startup.
     """
-    from asgi_correlation_id.context import celery_current_id, celery_parent_id
+    from das_sankhya.middlewares.asgi_correlation_id.context import (
+        celery_current_id,
+        celery_parent_id,
+    )
 
     @before_task_publish.connect(weak=False)
     def publish_task_from_worker_or_request(headers: Dict[str, str], **kwargs: Any) -> None:
@@ -8,8 +8,6 @@ def get_sentry_extension() -> Callable[[str], None]:
     try:
         import sentry_sdk  # noqa: F401
 
-        from asgi_correlation_id.extensions.sentry import set_transaction_id
-
         return set_transaction_id
     except ImportError:  # pragma: no cover
         return lambda correlation_id: None
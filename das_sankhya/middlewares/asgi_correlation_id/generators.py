@@ -0,0 +1,194 @@
+"""
+Request and correlation ID generators, selected by name with get_id_generator.
+
+Stateful generators are reset in forked children, from a single fork hook
+over a weak set of the live instances, so gunicorn workers never hand out
+the same IDs.
+"""
+import itertools
+import os
+import random
+import socket
+import time
+import weakref
+from typing import Callable, Dict, List
+from uuid import uuid4
+
+import cuid
+
+IdGenerator = Callable[[], str]
+
+# Crockford's base32, as used by ULID: sortable and free of ambiguous letters.
+CROCKFORD_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+# Every 10 bit value mapped to its two character encoding, so that encoding
+# needs one table lookup per two characters instead of a divmod per character.
+_PAIRS = tuple(a + b for a in CROCKFORD_ALPHABET for b in CROCKFORD_ALPHABET)
+
+_CUID_CHARS = "0123456789abcdefghijklmnopqrstuvwxyz"
+_HEX_CHARS = "0123456789abcdefABCDEF"
+_UUID_CHARS = _HEX_CHARS + "-"
+_ULID_CHARS = CROCKFORD_ALPHABET + CROCKFORD_ALPHABET.lower()
+
+# Generators to reset in forked children.
+_generators: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for generator in list(_generators):
+        generator._after_fork_in_child()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def uuid4_generator() -> str:
+    """Return a random v4 uuid as 32 hex characters."""
+    return uuid4().hex
+
+
+class MonotonicIdGenerator:
+    """
+    ULID-style generator with a per-worker prefix.
+
+    IDs are 26 Crockford base32 characters: a 48 bit millisecond timestamp
+    (10 chars), a 20 bit worker prefix (4 chars) and a 60 bit counter
+    (12 chars). The counter starts at a random value and is only ever
+    incremented, so IDs from one worker sort in creation order and never
+    repeat, without touching the system RNG per ID.
+
+    The worker prefix is derived from the host name and pid unless given, and
+    is recomputed in forked children so gunicorn workers never share one: a
+    given worker_id is then mixed with the child's pid.
+    """
+
+    def __init__(self, worker_id: int = None) -> None:
+        """Start the counter of a generator with an optional fixed worker_id."""
+        self.worker_id = worker_id
+        self._reset(worker_id)
+        _generators.add(self)
+
+    def _after_fork_in_child(self) -> None:
+        if self.worker_id is None:
+            self._reset(None)
+        else:
+            self._reset(hash((self.worker_id, os.getpid())))
+
+    def _reset(self, worker_id: int = None) -> None:
+        if worker_id is None:
+            worker_id = hash((socket.gethostname(), os.getpid()))
+        worker_id &= 0xFFFFF
+        self._worker = _PAIRS[worker_id >> 10] + _PAIRS[worker_id & 0x3FF]
+        self._counter = itertools.count(random.getrandbits(40))
+        self._last_ms = -1
+        self._head = ""
+
+    def __call__(self) -> str:
+        """Return the next ID."""
+        ms = time.time_ns() // 1000000
+        if ms > self._last_ms:
+            # Clock going backwards keeps the previous head: still monotonic.
+            self._last_ms = ms
+            self._head = (
+                _PAIRS[(ms >> 40) & 0x3FF]
+                + _PAIRS[(ms >> 30) & 0x3FF]
+                + _PAIRS[(ms >> 20) & 0x3FF]
+                + _PAIRS[(ms >> 10) & 0x3FF]
+                + _PAIRS[ms & 0x3FF]
+                + self._worker
+            )
+        n = next(self._counter) & 0xFFFFFFFFFFFFFFF
+        return (
+            self._head
+            + _PAIRS[n >> 50]
+            + _PAIRS[(n >> 40) & 0x3FF]
+            + _PAIRS[(n >> 30) & 0x3FF]
+            + _PAIRS[(n >> 20) & 0x3FF]
+            + _PAIRS[(n >> 10) & 0x3FF]
+            + _PAIRS[n & 0x3FF]
+        )
+
+
+class RandomIdPool:
+    """
+    Random 128 bit IDs (32 hex characters) handed out from a pre-generated pool.
+
+    A whole batch is drawn from ``os.urandom`` with one system call and hex
+    encoded at once; the per-request cost is a ``list.pop``. The pool is
+    emptied in forked children so that workers never hand out the same IDs.
+    """
+
+    def __init__(self, batch_size: int = 1024) -> None:
+        """Create an empty pool, refilled batch_size IDs at a time."""
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+        self.batch_size = batch_size
+        self._ids: List[str] = []
+        _generators.add(self)
+
+    def _after_fork_in_child(self) -> None:
+        self._ids.clear()
+
+    def _refill(self) -> None:
+        raw = os.urandom(16 * self.batch_size).hex()
+        self._ids.extend([raw[i : i + 32] for i in range(0, len(raw), 32)])
+
+    def __call__(self) -> str:
+        """Return the next ID, refilling the pool when it runs dry."""
+        try:
+            return self._ids.pop()
+        except IndexError:
+            self._refill()
+            return self._ids.pop()
+
+
+ID_GENERATORS: Dict[str, Callable[..., IdGenerator]] = {
+    "cuid": lambda **kwargs: cuid.cuid,
+    "uuid4": lambda **kwargs: uuid4_generator,
+    "ulid": lambda worker_id=None, **kwargs: MonotonicIdGenerator(worker_id),
+    "pool": lambda batch_size=1024, **kwargs: RandomIdPool(batch_size),
+}
+
+
+def get_id_generator(name: str, **kwargs) -> IdGenerator:
+    """
+    Return the ID generator registered under ``name``.
+
+    Keyword arguments are passed to generators that accept them
+    (``worker_id`` for ``ulid``, ``batch_size`` for ``pool``).
+    """
+    try:
+        factory = ID_GENERATORS[name]
+    except KeyError:
+        raise ValueError(
+            "Unknown ID generator {0!r}, expected one of: {1}".format(
+                name, ", ".join(ID_GENERATORS)
+            )
+        ) from None
+    return factory(**kwargs)
+
+
+def is_valid_id(value: str) -> bool:
+    """
+    Check whether a string is a cuid, ULID, hex or hyphenated uuid.
+
+    Only length checks, single character indexing and ``str.strip`` are used;
+    ``strip`` returns the shared empty string when every character is in the
+    allowed set, so accepting a valid ID does not allocate.
+    """
+    length = len(value)
+    if length == 25:
+        return value[0] == "c" and not value.strip(_CUID_CHARS)
+    if length == 26:
+        return not value.strip(_ULID_CHARS)
+    if length == 32:
+        return not value.strip(_HEX_CHARS)
+    if length == 36:
+        return (
+            value[8] == "-"
+            and value[13] == "-"
+            and value[18] == "-"
+            and value[23] == "-"
+            and value.count("-") == 4
+            and not value.strip(_UUID_CHARS)
+        )
+    return False
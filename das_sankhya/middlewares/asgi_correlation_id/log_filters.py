@@ -4,9 +4,9 @@ from typing import Optional, Type
 from das_sankhya.middlewares.asgi_correlation_id.context import (
     celery_current_id,
     celery_parent_id,
-    correlation_id,
-    request_id,
-    idempotency_key,
+    get_correlation_id,
+    get_idempotency_key,
+    get_request_id,
 )
 
 # Middleware
@@ -23,7 +23,7 @@ def correlation_id_filter(uuid_length: Optional[int] = None) -> Type[Filter]:
             for, if the correlation ID is added to the message, or included as
             metadata.
             """
-            cid = correlation_id.get()
+            cid = get_correlation_id()
             if uuid_length is not None and cid:
                 record.correlation_id = cid[:uuid_length]  # type: ignore[attr-defined]
             else:
@@ -44,7 +44,7 @@ def request_id_filter(uuid_length: Optional[int] = None) -> Type[Filter]:
             for, if the request ID is added to the message, or included as
             metadata.
             """
-            rid = request_id.get()
+            rid = get_request_id()
             if uuid_length is not None and rid:
                 record.request_id = rid[:uuid_length]  # type: ignore[attr-defined]
             else:
@@ -65,9 +65,9 @@ def idempotency_key_filter(uuid_length: Optional[int] = None) -> Type[Filter]:
             for, if the idempotency KEY is added to the message, or included as
             metadata.
             """
-            idk = idempotency_key.get()
+            idk = get_idempotency_key()
             if uuid_length is not None and idk:
-                record.idempotency_key = rid[:uuid_length]  # type: ignore[attr-defined]
+                record.idempotency_key = idk[:uuid_length]  # type: ignore[attr-defined]
             else:
                 record.idempotency_key = idk  # type: ignore[attr-defined]
             return True
@@ -1,36 +1,179 @@
 import logging
 import cuid
 from dataclasses import dataclass
-from uuid import UUID, uuid4
+from typing import Callable, Iterable, List, Tuple
 
 from starlette.datastructures import Headers
 from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from das_sankhya.middlewares.asgi_correlation_id.context import correlation_id, request_id, idempotency_key
-from das_sankhya.middlewares.asgi_correlation_id.extensions.sentry import get_sentry_extension
+from das_sankhya.middlewares.asgi_correlation_id.context import (
+    TracingContext,
+    correlation_id,
+    idempotency_key,
+    request_id,
+    tracing_context,
+)
+from das_sankhya.middlewares.asgi_correlation_id.extensions.sentry import (
+    get_sentry_extension,
+)
+from das_sankhya.middlewares.asgi_correlation_id.generators import is_valid_id
 
 logger = logging.getLogger('asgi_correlation_id')
 
 
-def is_valid_uuid(uuid_: str) -> bool:
+EXPOSE_HEADERS = b'access-control-expose-headers'
+
+
+def merge_expose_headers(value: bytes, names: Iterable[bytes]) -> bytes:
+    """
+    Add header names to an existing Access-Control-Expose-Headers value.
+
+    Names already listed (compared case-insensitively) are not repeated, and a
+    wildcard value is left untouched.
+    """
+    if value.strip() == b'*':
+        return value
+    present = {item.strip().lower() for item in value.split(b',')}
+    missing = [name for name in names if name.lower() not in present]
+    if not missing:
+        return value
+    if not value.strip():
+        return b', '.join(missing)
+    return b', '.join([value, *missing])
+
+
+@dataclass
+class TracingMiddleware:
     """
-    Check whether a string is a valid cuid or v4 uuid.
+    Correlation ID, request ID and idempotency key handling in a single pass.
+
+    Request headers are scanned once, the three IDs are stored in one
+    ``TracingContext`` and the response headers are extended with raw byte
+    tuples, without decoding or re-encoding the headers set by the app.
     """
-    # Presumed to be a cuid
-    if len(uuid_) == 25 and uuid_.lower().startswith('c'):
-        return True
-    
-    # Verify if is valid v4 uuid
-    try:
-        return bool(UUID(uuid_, version=4))
-    except ValueError:
-        return False
+
+    app: ASGIApp
+    correlation_header: str = 'X-Correlation-ID'
+    request_header: str = 'X-Request-ID'
+    idempotency_header: str = 'Idempotency-Key'
+    validate_header_as_uuid: bool = True
+    idempotency_key_max_length: int = 128
+    id_generator: Callable[[], str] = cuid.cuid
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        """Load the correlation ID and idempotency key, make a request ID."""
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        correlation_name = self._correlation_name
+        idempotency_name = self._idempotency_name
+        header_value = None
+        idempotency_value = None
+        for name, value in scope['headers']:
+            if name == correlation_name:
+                header_value = value
+            elif name == idempotency_name:
+                idempotency_value = value
+
+        generate_id = self.id_generator
+        if not header_value:
+            id_value = generate_id()
+        else:
+            id_value = header_value.decode('latin-1')
+            if self.validate_header_as_uuid and not is_valid_id(id_value):
+                logger.warning(
+                    'Generating new ID, since header value \'%s\' is invalid',
+                    id_value,
+                )
+                id_value = generate_id()
+
+        if idempotency_value:
+            max_length = self.idempotency_key_max_length
+            idempotency_value = idempotency_value[:max_length].decode('latin-1')
+        else:
+            idempotency_value = None
+
+        ctx = TracingContext(id_value, generate_id(), idempotency_value)
+        tracing_context.set(ctx)
+        self.sentry_extension(id_value)
+
+        async def handle_outgoing_request(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                message['headers'] = self._response_headers(
+                    message.get('headers', ()), ctx
+                )
+            await send(message)
+
+        await self.app(scope, receive, handle_outgoing_request)
+
+    def _response_headers(
+        self, raw: Iterable[Tuple[bytes, bytes]], ctx: TracingContext
+    ) -> List[Tuple[bytes, bytes]]:
+        """Return the response headers with the tracing headers exposed."""
+        own = [
+            (self._correlation_name, ctx.correlation_id.encode('latin-1')),
+            (self._request_name, ctx.request_id.encode('latin-1')),
+        ]
+        if ctx.idempotency_key is not None:
+            own.append(
+                (self._idempotency_name, ctx.idempotency_key.encode('latin-1'))
+            )
+        own_names = [name for name, _ in own]
+
+        headers = []
+        exposed = False
+        for name, value in raw:
+            lowered = name.lower()
+            if lowered in own_names:
+                # Ours take precedence, like the per-ID middlewares used to do.
+                continue
+            if lowered == EXPOSE_HEADERS:
+                value = merge_expose_headers(value, own_names)
+                exposed = True
+            headers.append((name, value))
+        headers.extend(own)
+        if not exposed:
+            headers.append((EXPOSE_HEADERS, b', '.join(own_names)))
+        return headers
+
+    def __post_init__(self) -> None:
+        """
+        Prepare the raw header names and load extensions on initialization.
+
+        If Sentry is installed, propagate correlation IDs to Sentry events.
+        If Celery is installed, propagate correlation IDs to spawned worker
+        processes.
+        """
+        self._correlation_name = self._raw_name(self.correlation_header)
+        self._request_name = self._raw_name(self.request_header)
+        self._idempotency_name = self._raw_name(self.idempotency_header)
+
+        self.sentry_extension = get_sentry_extension()
+        try:
+            import celery  # noqa: F401
+
+            from das_sankhya.middlewares.asgi_correlation_id.extensions import (
+                celery as celery_extension,
+            )
+
+            celery_extension.load_correlation_ids()
+        except ImportError:  # pragma: no cover
+            pass
+
+    @staticmethod
+    def _raw_name(header: str) -> bytes:
+        return header.lower().encode('latin-1')
+
 
 @dataclass
 class CorrelationIdMiddleware:
     app: ASGIApp
     header_name: str = 'X-Correlation-ID'
     validate_header_as_uuid: bool = True
+    id_generator: Callable[[], str] = cuid.cuid
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
@@ -43,10 +186,10 @@ class CorrelationIdMiddleware:
         header_value = Headers(scope=scope).get(self.header_name.lower())
 
         if not header_value:
-            id_value = cuid.cuid()  # uuid4().hex
-        elif self.validate_header_as_uuid and not is_valid_uuid(header_value):
-            logger.warning('Generating new CUID, since header value \'%s\' is invalid', header_value)
-            id_value = cuid.cuid()  # uuid4().hex
+            id_value = self.id_generator()
+        elif self.validate_header_as_uuid and not is_valid_id(header_value):
+            logger.warning('Generating new ID, since header value \'%s\' is invalid', header_value)
+            id_value = self.id_generator()
         else:
             id_value = header_value
 
@@ -87,6 +230,7 @@ class RequestIdMiddleware:
     app: ASGIApp
     header_name: str = 'X-Request-ID'
     validate_header_as_uuid: bool = True
+    id_generator: Callable[[], str] = cuid.cuid
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
@@ -96,7 +240,7 @@ class RequestIdMiddleware:
             await self.app(scope, receive, send)
             return
 
-        id_value = cuid.cuid()
+        id_value = self.id_generator()
 
         request_id.set(id_value)
 
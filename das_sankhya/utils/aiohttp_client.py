@@ -1,30 +1,66 @@
 # -*- coding: utf-8 -*-
 """Aiohttp client class utility."""
 import asyncio
-from loguru import logger
-from typing import Optional
+import time
 from socket import AF_INET
+from typing import Dict, Optional, Tuple
 
 import aiohttp
+from loguru import logger
+
+from das_sankhya.config import http_client as http_client_conf
+from das_sankhya.core.deadline import (
+    DEADLINE_HEADER,
+    DeadlineExceeded,
+    format_timeout,
+    remaining,
+)
+from das_sankhya.core.diagnostics import record_call
+from das_sankhya.core.log_values import DEBUG, format_url, level_enabled
+from das_sankhya.core.metrics import registry
+from das_sankhya.middlewares.asgi_correlation_id.generators import (
+    uuid4_generator,
+)
 
 SIZE_POOL_AIOHTTP = 100
 
+COALESCED_CALLS = registry.counter(
+    "http_client_coalesced_calls",
+    "GET calls served by the in-flight upstream request of an identical call.",
+)
+SHARED_REQUESTS = registry.counter(
+    "http_client_shared_requests",
+    "Upstream GET requests sent while coalescing, each shared by its callers.",
+)
+
 
 class AiohttpClient(object):
     """Aiohttp session client utility.
 
     Utility class for handling HTTP async request for whole FastAPI application
-    scope.
+    scope. Requests are logged at DEBUG level, only formatting their URL when
+    DEBUG records are logged.
+
+    With ``HTTP_COALESCE_GETS``, concurrent GET calls with the same URL,
+    raise_for_status and values of the ``HTTP_COALESCE_HEADERS`` headers
+    share one upstream request, sent with the headers of the first call but
+    for the ``HTTP_COALESCE_ID_HEADERS`` tracing headers, which carry an ID
+    of the shared request instead. Its response body is read before it is
+    returned, so every caller gets the same buffered response, and its
+    errors are raised to every caller.
 
     Attributes:
         sem (asyncio.Semaphore, optional): Semaphore value.
         aiohttp_client (aiohttp.ClientSession, optional): Aiohttp client session
             object instance.
+        in_flight (Dict[tuple, Tuple[asyncio.Task, str]]): Shared GET
+            requests in progress, with their ID, by coalescing key.
 
     """
 
     sem: Optional[asyncio.Semaphore] = None
     aiohttp_client: Optional[aiohttp.ClientSession] = None
+    in_flight: Dict[Tuple, Tuple["asyncio.Task", str]] = {}
     # log: logger = logger.getLogger(__name__)
     log = logger
 
@@ -58,6 +94,55 @@ class AiohttpClient(object):
             await cls.aiohttp_client.close()
             cls.aiohttp_client = None
 
+    @classmethod
+    async def _send(cls, request, url, headers=None, **kwargs):
+        """Execute HTTP request within the current request deadline.
+
+        If the incoming request has a deadline, the session timeout is capped
+        at the remaining budget, which is also forwarded downstream in the
+        X-Request-Timeout header. The request duration is recorded for slow
+        request diagnostics.
+
+        Args:
+            request: ClientSession method to call, e.g. client.get.
+            url (str): HTTP request endpoint.
+            headers (dict): Optional HTTP Headers to send with the request.
+            **kwargs: Other ClientSession request arguments.
+
+        Returns:
+            response: aiohttp.ClientResponse object instance.
+
+        Raises:
+            DeadlineExceeded: If the request deadline expired before the
+                response was received.
+
+        """
+        capped = False
+        budget = remaining()
+        if budget is not None:
+            if budget <= 0:
+                raise DeadlineExceeded("Request deadline exceeded")
+            headers = dict(headers or {})
+            headers[DEADLINE_HEADER] = format_timeout(budget)
+            total = cls.aiohttp_client.timeout.total
+            if total is None or total > budget:
+                kwargs["timeout"] = aiohttp.ClientTimeout(total=budget)
+                capped = True
+
+        start = time.perf_counter()
+        try:
+            return await request(url, headers=headers, **kwargs)
+        except asyncio.TimeoutError as ex:
+            if capped:
+                raise DeadlineExceeded("Request deadline exceeded") from ex
+            raise
+        finally:
+            record_call(
+                "http",
+                "{0} {1}".format(request.__name__.upper(), url),
+                time.perf_counter() - start,
+            )
+
     @classmethod
     async def get(cls, url, headers=None, raise_for_status=True):
         """Execute HTTP GET request.
@@ -75,8 +160,15 @@ class AiohttpClient(object):
         """
         client = cls.get_aiohttp_client()
 
-        cls.log.debug("Started GET {}".format(url))
-        response = await client.get(
+        if http_client_conf.HTTP_COALESCE_GETS:
+            return await cls._coalesced_get(
+                client, url, headers, raise_for_status
+            )
+
+        if level_enabled(DEBUG):
+            cls.log.debug("Started GET {0}", format_url(url))
+        response = await cls._send(
+            client.get,
             url,
             headers=headers,
             raise_for_status=raise_for_status,
@@ -84,6 +176,105 @@ class AiohttpClient(object):
 
         return response
 
+    @classmethod
+    async def _coalesced_get(cls, client, url, headers, raise_for_status):
+        """Join the in-flight identical GET request, or start it.
+
+        The shared request runs in its own task, which callers await through
+        asyncio.shield(): a cancelled caller, e.g. on its request deadline,
+        does not cancel it for the others. The task runs within the deadline
+        of the call that started it.
+
+        The tracing headers of the first call are not sent upstream for every
+        caller: those listed in ``HTTP_COALESCE_ID_HEADERS`` carry a new ID of
+        the shared request, which each caller logs at DEBUG level.
+
+        Args:
+            client (aiohttp.ClientSession): Session sending the request.
+            url (str): HTTP GET request endpoint.
+            headers (dict): Optional HTTP Headers to send with the request.
+            raise_for_status (bool): Automatically call
+                ClientResponse.raise_for_status() for response if set to True.
+
+        Returns:
+            response: Shared aiohttp.ClientResponse object instance, with its
+                body read.
+
+        """
+        names = {
+            name.lower() for name in http_client_conf.HTTP_COALESCE_HEADERS
+        }
+        key = (
+            str(url),
+            raise_for_status,
+            tuple(
+                sorted(
+                    (name.lower(), value)
+                    for name, value in (headers or {}).items()
+                    if name.lower() in names
+                )
+            ),
+        )
+        shared = cls.in_flight.get(key)
+        if shared is not None:
+            task, shared_id = shared
+            COALESCED_CALLS.inc()
+            if level_enabled(DEBUG):
+                cls.log.debug(
+                    "Joined in-flight GET {0} as {1}",
+                    format_url(url),
+                    shared_id,
+                )
+            return await asyncio.shield(task)
+
+        shared_id = uuid4_generator()
+        if level_enabled(DEBUG):
+            cls.log.debug(
+                "Started shared GET {0} as {1}", format_url(url), shared_id
+            )
+        SHARED_REQUESTS.inc()
+        task = asyncio.ensure_future(
+            cls._buffered_get(
+                client,
+                url,
+                cls._shared_headers(headers, shared_id),
+                raise_for_status,
+            )
+        )
+        cls.in_flight[key] = (task, shared_id)
+        task.add_done_callback(lambda done: cls._finish_shared(key, done))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _shared_headers(headers, shared_id):
+        names = {
+            name.lower() for name in http_client_conf.HTTP_COALESCE_ID_HEADERS
+        }
+        return {
+            name: shared_id if name.lower() in names else value
+            for name, value in (headers or {}).items()
+        }
+
+    @classmethod
+    async def _buffered_get(cls, client, url, headers, raise_for_status):
+        response = await cls._send(
+            client.get,
+            url,
+            headers=headers,
+            raise_for_status=raise_for_status,
+        )
+        await response.read()
+        return response
+
+    @classmethod
+    def _finish_shared(cls, key, task):
+        shared = cls.in_flight.get(key)
+        if shared is not None and shared[0] is task:
+            del cls.in_flight[key]
+        if not task.cancelled():
+            # Retrieved here in case every caller was cancelled.
+            task.exception()
+
     @classmethod
     async def post(cls, url, data=None, headers=None, raise_for_status=False):
         """Execute HTTP POST request.
@@ -104,8 +295,10 @@ class AiohttpClient(object):
         """
         client = cls.get_aiohttp_client()
 
-        cls.log.debug("Started POST {}".format(url))
-        response = await client.post(
+        if level_enabled(DEBUG):
+            cls.log.debug("Started POST {0}", format_url(url))
+        response = await cls._send(
+            client.post,
             url,
             data=data,
             headers=headers,
@@ -134,8 +327,10 @@ class AiohttpClient(object):
         """
         client = cls.get_aiohttp_client()
 
-        cls.log.debug("Started PUT {}".format(url))
-        response = await client.put(
+        if level_enabled(DEBUG):
+            cls.log.debug("Started PUT {0}", format_url(url))
+        response = await cls._send(
+            client.put,
             url,
             data=data,
             headers=headers,
@@ -161,8 +356,10 @@ class AiohttpClient(object):
         """
         client = cls.get_aiohttp_client()
 
-        cls.log.debug("Started DELETE {}".format(url))
-        response = await client.delete(
+        if level_enabled(DEBUG):
+            cls.log.debug("Started DELETE {0}", format_url(url))
+        response = await cls._send(
+            client.delete,
             url,
             headers=headers,
             raise_for_status=raise_for_status,
@@ -190,8 +387,10 @@ class AiohttpClient(object):
         """
         client = cls.get_aiohttp_client()
 
-        cls.log.debug("Started PATCH {}".format(url))
-        response = await client.patch(
+        if level_enabled(DEBUG):
+            cls.log.debug("Started PATCH {0}", format_url(url))
+        response = await cls._send(
+            client.patch,
             url,
             data=data,
             headers=headers,
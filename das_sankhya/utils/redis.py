@@ -1,16 +1,36 @@
 # -*- coding: utf-8 -*-
 """Redis client class utility."""
 
+import asyncio
+import time
+
 import aioredis
 import aioredis.sentinel
 from aioredis.exceptions import RedisError
 from das_sankhya.config import redis as redis_conf
+from das_sankhya.core.deadline import with_deadline
+from das_sankhya.core.diagnostics import record_call
+from das_sankhya.core.log_values import DEBUG, format_value, level_enabled
 from loguru import logger
 
+
+def _retrieve_result(task):
+    if not task.cancelled():
+        # Abandoned commands may fail with nobody awaiting them.
+        task.exception()
+
+
 class RedisClient(object):
     """Redis client utility.
 
     Utility class for handling Redis database connection and operations.
+    Commands issued while handling a request with a deadline are abandoned
+    when it expires, raising DeadlineExceeded. Abandoned, or cancelled,
+    commands are not cancelled themselves: aioredis would release their
+    connection with the reply unread, to be read by the next command. They
+    complete in the background instead, within ``REDIS_SOCKET_TIMEOUT``.
+    Commands are logged at DEBUG level, only formatting their arguments when
+    DEBUG records are logged.
 
     Attributes:
         redis_client (aioredis.Redis, optional): Redis client object instance.
@@ -27,6 +47,7 @@ class RedisClient(object):
     base_redis_init_kwargs: dict = {
         "encoding": "utf-8",
         "port": redis_conf.REDIS_PORT,
+        "socket_timeout": redis_conf.REDIS_SOCKET_TIMEOUT,
     }
     connection_kwargs: dict = {}
 
@@ -53,7 +74,10 @@ class RedisClient(object):
                     [(redis_conf.REDIS_HOST, redis_conf.REDIS_PORT)],
                     sentinel_kwargs=cls.connection_kwargs,
                 )
-                cls.redis_client = sentinel.master_for("mymaster")
+                cls.redis_client = sentinel.master_for(
+                    "mymaster",
+                    socket_timeout=redis_conf.REDIS_SOCKET_TIMEOUT,
+                )
             else:
                 cls.base_redis_init_kwargs.update(cls.connection_kwargs)
                 cls.redis_client = aioredis.from_url(
@@ -70,6 +94,30 @@ class RedisClient(object):
             cls.log.debug("Closing Redis client")
             await cls.redis_client.close()
 
+    @classmethod
+    async def _execute(cls, command, awaitable):
+        """Await a Redis command within the current request deadline.
+
+        The command runs in its own task, which is left to complete if the
+        deadline expires or the caller is cancelled. The command duration is
+        recorded for slow request diagnostics.
+
+        Args:
+            command (str): Redis command name.
+            awaitable: Pending Redis client call.
+
+        Returns:
+            response: The Redis command response.
+
+        """
+        start = time.perf_counter()
+        task = asyncio.ensure_future(awaitable)
+        task.add_done_callback(_retrieve_result)
+        try:
+            return await with_deadline(asyncio.shield(task))
+        finally:
+            record_call("redis", command, time.perf_counter() - start)
+
     @classmethod
     async def ping(cls):
         """Execute Redis PING command.
@@ -86,9 +134,10 @@ class RedisClient(object):
         # Note: Not sure if this shouldn't be deep copy instead?
         redis_client = cls.redis_client
 
-        cls.log.debug("Preform Redis PING command")
+        if level_enabled(DEBUG):
+            cls.log.debug("Preform Redis PING command")
         try:
-            return await redis_client.ping()
+            return await cls._execute("PING", redis_client.ping())
         except RedisError as ex:
             cls.log.exception(
                 "Redis PING command finished with exception",
@@ -97,7 +146,7 @@ class RedisClient(object):
             return False
 
     @classmethod
-    async def set(cls, key, value):
+    async def set(cls, key, value, **options):
         """Execute Redis SET command.
 
         Set key to hold the string value. If key already holds a value, it is
@@ -106,6 +155,7 @@ class RedisClient(object):
         Args:
             key (str): Redis db key.
             value (str): Value to be set.
+            **options: Optional SET command options, e.g. ex, px, nx, xx.
 
         Returns:
             response: Redis SET command response, for more info
@@ -117,11 +167,16 @@ class RedisClient(object):
         """
         redis_client = cls.redis_client
 
-        cls.log.debug(
-            "Preform Redis SET command, key: {}, value: {}".format(key, value)
-        )
+        if level_enabled(DEBUG):
+            cls.log.debug(
+                "Preform Redis SET command, key: {0}, value: {1}",
+                format_value(key, redact=False),
+                format_value(value),
+            )
         try:
-            await redis_client.set(key, value)
+            return await cls._execute(
+                "SET", redis_client.set(key, value, **options)
+            )
         except RedisError as ex:
             cls.log.exception(
                 "Redis SET command finished with exception",
@@ -151,11 +206,14 @@ class RedisClient(object):
         """
         redis_client = cls.redis_client
 
-        cls.log.debug(
-            "Preform Redis RPUSH command, key: {}, value: {}".format(key, value)
-        )
+        if level_enabled(DEBUG):
+            cls.log.debug(
+                "Preform Redis RPUSH command, key: {0}, value: {1}",
+                format_value(key, redact=False),
+                format_value(value),
+            )
         try:
-            await redis_client.rpush(key, value)
+            await cls._execute("RPUSH", redis_client.rpush(key, value))
         except RedisError as ex:
             cls.log.exception(
                 "Redis RPUSH command finished with exception",
@@ -181,11 +239,13 @@ class RedisClient(object):
         """
         redis_client = cls.redis_client
 
-        cls.log.debug(
-            "Preform Redis EXISTS command, key: {}, exists".format(key)
-        )
+        if level_enabled(DEBUG):
+            cls.log.debug(
+                "Preform Redis EXISTS command, key: {0}",
+                format_value(key, redact=False),
+            )
         try:
-            return await redis_client.exists(key)
+            return await cls._execute("EXISTS", redis_client.exists(key))
         except RedisError as ex:
             cls.log.exception(
                 "Redis EXISTS command finished with exception",
@@ -193,6 +253,74 @@ class RedisClient(object):
             )
             raise ex
 
+    @classmethod
+    async def delete(cls, *keys):
+        """Execute Redis DEL command.
+
+        Removes the specified keys. A key is ignored if it does not exist.
+
+        Args:
+            *keys (str): Redis db keys.
+
+        Returns:
+            response: The number of keys that were removed.
+
+        Raises:
+            aioredis.RedisError: If Redis client failed while executing command.
+
+        """
+        redis_client = cls.redis_client
+
+        if level_enabled(DEBUG):
+            cls.log.debug(
+                "Preform Redis DEL command, keys: {0}",
+                format_value(keys, redact=False),
+            )
+        try:
+            return await cls._execute("DEL", redis_client.delete(*keys))
+        except RedisError as ex:
+            cls.log.exception(
+                "Redis DEL command finished with exception",
+                exc_info=(type(ex), ex, ex.__traceback__),
+            )
+            raise ex
+
+    @classmethod
+    async def eval(cls, script, keys=(), args=()):
+        """Execute Redis EVAL command.
+
+        Run a Lua script on the server, atomically.
+
+        Args:
+            script (str): Lua script.
+            keys (list): Redis db keys, available as KEYS in the script.
+            args (list): Other arguments, available as ARGV in the script.
+
+        Returns:
+            response: Value returned by the script.
+
+        Raises:
+            aioredis.RedisError: If Redis client failed while executing command.
+
+        """
+        redis_client = cls.redis_client
+
+        if level_enabled(DEBUG):
+            cls.log.debug(
+                "Preform Redis EVAL command, keys: {0}",
+                format_value(tuple(keys), redact=False),
+            )
+        try:
+            return await cls._execute(
+                "EVAL", redis_client.eval(script, len(keys), *keys, *args)
+            )
+        except RedisError as ex:
+            cls.log.exception(
+                "Redis EVAL command finished with exception",
+                exc_info=(type(ex), ex, ex.__traceback__),
+            )
+            raise ex
+
     @classmethod
     async def get(cls, key):
         """Execute Redis GET command.
@@ -213,9 +341,13 @@ class RedisClient(object):
         """
         redis_client = cls.redis_client
 
-        cls.log.debug("Preform Redis GET command, key: {}".format(key))
+        if level_enabled(DEBUG):
+            cls.log.debug(
+                "Preform Redis GET command, key: {0}",
+                format_value(key, redact=False),
+            )
         try:
-            return await redis_client.get(key)
+            return await cls._execute("GET", redis_client.get(key))
         except RedisError as ex:
             cls.log.exception(
                 "Redis GET command finished with exception",
@@ -248,15 +380,17 @@ class RedisClient(object):
         """
         redis_client = cls.redis_client
 
-        cls.log.debug(
-            "Preform Redis LRANGE command, key: {}, start: {}, end: {}".format(
-                key,
+        if level_enabled(DEBUG):
+            cls.log.debug(
+                "Preform Redis LRANGE command, key: {0}, start: {1}, end: {2}",
+                format_value(key, redact=False),
                 start,
                 end,
             )
-        )
         try:
-            return await redis_client.lrange(key, start, end)
+            return await cls._execute(
+                "LRANGE", redis_client.lrange(key, start, end)
+            )
         except RedisError as ex:
             cls.log.exception(
                 "Redis LRANGE command finished with exception",
@@ -11,6 +11,13 @@ from loguru import logger
 from das_sankhya.app.asgi import get_app
 from das_sankhya.config.application import settings
 from das_sankhya.core.gunicorn_logs import InThread
+from das_sankhya.config.logs import logs
+from das_sankhya.core.log_sinks import drain_all
+from das_sankhya.core.log_transport import (
+    start_log_collector,
+    stop_log_collector,
+)
+from das_sankhya.core.metrics import mark_process_dead, prepare_metrics_dir
 
 os.environ["TZ"] = "UTC"
 utc = pytz.UTC
@@ -18,6 +25,19 @@ utc = pytz.UTC
 server = None
 
 
+def on_starting(server):
+    """Prepare the metrics directory and log collector of the workers."""
+    prepare_metrics_dir()
+    if logs.LOG_TRANSPORT == "datagram":
+        start_log_collector()
+
+
+def on_exit(server):
+    """Write pending log records and stop the log collector."""
+    drain_all()
+    stop_log_collector()
+
+
 def some_thread():
     logger.info("Message from Thread")
     sleep(10)
@@ -57,7 +77,7 @@ def run_wsgi(host=os.getenv("FASTAPI_HOST", "127.0.0.1"), port=os.getenv("FASTAP
             "spew": False,
             "proc_name": settings.PROJECT_NAME,
             "errorlog": "-",
-            "accesslog": "-",
+            "accesslog": None if logs.LOG_ACCESS else "-",
             "loglevel": os.getenv("FASTAPI_GUNICORN_LOG_LEVEL", "info"),
             "pidfile": None,
             "umask": 0,
@@ -66,6 +86,10 @@ def run_wsgi(host=os.getenv("FASTAPI_HOST", "127.0.0.1"), port=os.getenv("FASTAP
             "tmp_upload_dir": None,
             "daemon": False,
             # "worker_int": worker_int,
+            "on_starting": on_starting,
+            "child_exit": lambda server, worker: mark_process_dead(worker.pid),
+            "worker_exit": lambda server, worker: drain_all(),
+            "on_exit": on_exit,
         },
         target=some_thread,
     )
@@ -12,6 +12,7 @@ from loguru import logger
 
 from das_sankhya.app.asgi import get_app
 from das_sankhya.config.application import settings
+from das_sankhya.config.logs import logs
 from das_sankhya.core.logs2 import global_log_config
 
 # Set time to UTC
@@ -63,7 +64,8 @@ def run_dev_wsgi(
             workers=int(workers),
             lifespan="off",
             log_config=None,
-            access_log=True,
+            # Requests are logged by the access log of TimingMiddleware.
+            access_log=not logs.LOG_ACCESS,
         )
     )
 
@@ -0,0 +1,24 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from das_sankhya.app.controllers import admin
+from das_sankhya.config import router
+from das_sankhya.core.diagnostics import slow_requests
+
+
+def test_list_slow_requests():
+    app = FastAPI()
+    app.include_router(admin.router)
+    client = TestClient(app)
+    slow_requests.clear()
+    for i in range(3):
+        slow_requests.add({"path": "/items/{0}".format(i)})
+
+    response = client.get("/admin/slow-requests", params={"limit": 2})
+    assert response.status_code == 200
+    assert response.json() == [{"path": "/items/2"}, {"path": "/items/1"}]
+    assert client.get("/admin/slow-requests", params={"limit": 0}).status_code == 422
+    slow_requests.clear()
+
+
+def test_not_mounted_by_default():
+    assert not any(route.path.startswith("/admin") for route in router.routes)
@@ -0,0 +1,13 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from das_sankhya.app.controllers import metrics
+from das_sankhya.core.metrics import CONTENT_TYPE
+
+
+def test_metrics():
+    app = FastAPI()
+    app.include_router(metrics.router)
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE + "; charset=utf-8"
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
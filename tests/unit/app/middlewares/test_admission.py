@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from das_sankhya.app.middlewares.admission import (
+    OVERLOADED_BODY,
+    AdmissionControlMiddleware,
+    AIMDLimit,
+)
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def make_app(delay=0.05, **kwargs):
+    state = {"active": 0, "peak": 0}
+
+    async def endpoint(scope, receive, send):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(delay)
+        state["active"] -= 1
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    return AdmissionControlMiddleware(endpoint, **kwargs), state
+
+
+async def call(app, path="/items"):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await app({"type": "http", "path": path}, receive, send)
+    return messages
+
+
+def test_aimd_limit():
+    limit = AIMDLimit(initial=10, min_limit=5, max_limit=11, latency_target=0.1)
+    limit.update(0.01, in_flight=10)
+    assert limit.limit == 11
+    limit.update(0.01, in_flight=10)
+    assert limit.limit == 11
+    limit.update(0.5, in_flight=10)
+    assert limit.limit == 9
+    for _ in range(10):
+        limit.update(0.5, in_flight=10)
+    assert limit.limit == 5
+    # Mostly idle: no reason to grow.
+    limit.update(0.01, in_flight=1)
+    assert limit.limit == 5
+
+
+@pytest.mark.asyncio
+async def test_queued_requests_are_admitted_in_turn():
+    app, state = make_app(limit=AIMDLimit(initial=2, min_limit=2, max_limit=2), queue_timeout=1)
+    results = await asyncio.gather(*(call(app) for _ in range(6)))
+    assert [messages[0]["status"] for messages in results] == [200] * 6
+    assert state["peak"] == 2
+    assert app._in_flight == 0
+    assert not app._waiters
+
+
+@pytest.mark.asyncio
+async def test_rejects_on_queue_timeout_and_full_queue():
+    app, _ = make_app(
+        limit=AIMDLimit(initial=1, min_limit=1, max_limit=1),
+        queue_size=1,
+        queue_timeout=0.01,
+        retry_after=3,
+    )
+    results = await asyncio.gather(*(call(app) for _ in range(3)))
+    statuses = [messages[0]["status"] for messages in results]
+    assert statuses == [200, 503, 503]
+    assert (b"retry-after", b"3") in results[1][0]["headers"]
+    assert results[1][1]["body"] == OVERLOADED_BODY
+    assert app._in_flight == 0
+    assert not app._waiters
+
+
+@pytest.mark.asyncio
+async def test_bypass():
+    app, state = make_app(
+        limit=AIMDLimit(initial=1, min_limit=1, max_limit=1),
+        queue_size=0,
+        bypass=["^/health$"],
+    )
+    results = await asyncio.gather(*(call(app, "/health") for _ in range(3)))
+    assert [messages[0]["status"] for messages in results] == [200] * 3
+    assert state["peak"] == 3
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from das_sankhya.app.middlewares.deadline import (
+    DEADLINE_EXCEEDED_BODY,
+    DeadlineMiddleware,
+)
+from das_sankhya.core.deadline import remaining, with_deadline
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def make_app(delay=0.0, **kwargs):
+    seen = {}
+
+    async def endpoint(scope, receive, send):
+        seen["remaining"] = remaining()
+        await asyncio.sleep(delay)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    return DeadlineMiddleware(endpoint, **kwargs), seen
+
+
+async def call(app, path="/items", headers=()):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await app({"type": "http", "path": path, "headers": list(headers)}, receive, send)
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_no_deadline():
+    app, seen = make_app()
+    messages = await call(app)
+    assert messages[0]["status"] == 200
+    assert seen["remaining"] is None
+
+
+@pytest.mark.asyncio
+async def test_deadline_from_header_and_routes():
+    app, seen = make_app(default_timeout=5, routes={"/slow": 10}, max_timeout=3)
+    await call(app)
+    assert 4.9 < seen["remaining"] <= 5
+    await call(app, "/slow")
+    assert 9.9 < seen["remaining"] <= 10
+    await call(app, headers=[(b"x-request-timeout", b"0.5")])
+    assert 0.4 < seen["remaining"] <= 0.5
+    # Callers cannot ask for more than max_timeout, nor extend the default.
+    await call(app, "/slow", headers=[(b"x-request-timeout", b"60")])
+    assert 2.9 < seen["remaining"] <= 3
+    await call(app, headers=[(b"x-request-timeout", b"bogus")])
+    assert 4.9 < seen["remaining"] <= 5
+
+
+@pytest.mark.asyncio
+async def test_expired_deadline_returns_504():
+    app, _ = make_app(delay=1)
+    messages = await call(app, headers=[(b"x-request-timeout", b"0.01")])
+    assert messages[0]["status"] == 504
+    assert messages[1]["body"] == DEADLINE_EXCEEDED_BODY
+
+
+@pytest.mark.asyncio
+async def test_outbound_call_capped_at_deadline():
+    async def endpoint(scope, receive, send):
+        await with_deadline(asyncio.sleep(1), timeout=5)
+
+    messages = await call(DeadlineMiddleware(endpoint, default_timeout=0.01))
+    assert messages[0]["status"] == 504
+
+
+@pytest.mark.asyncio
+async def test_other_timeouts_are_not_swallowed():
+    async def endpoint(scope, receive, send):
+        await with_deadline(asyncio.sleep(1), timeout=0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await call(DeadlineMiddleware(endpoint, default_timeout=5))
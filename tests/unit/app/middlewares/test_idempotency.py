@@ -0,0 +1,222 @@
+import asyncio
+
+import mock
+import pytest
+from aioredis.exceptions import RedisError
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from das_sankhya.app.middlewares.idempotency import (
+    IdempotencyMiddleware,
+    InMemoryIdempotencyBackend,
+    RELEASE_LOCK_SCRIPT,
+    RedisIdempotencyBackend,
+    decode_record,
+    encode_record,
+)
+from das_sankhya.app.middlewares.timing import add_timing_middleware
+from das_sankhya.middlewares.asgi_correlation_id import TracingMiddleware
+
+
+calls = []
+
+
+async def create(request):
+    calls.append(request.url.path)
+    await asyncio.sleep(0.05)
+    status = 500 if request.url.path.endswith("fail") else 201
+    return JSONResponse({"count": len(calls)}, status_code=status)
+
+
+def make_app(backend=None, **kwargs):
+    app = Starlette(
+        routes=[Route("/items", create, methods=["POST"]),
+                Route("/items/fail", create, methods=["POST"]),
+                Route("/other", create, methods=["POST"])]
+    )
+    app.add_middleware(
+        IdempotencyMiddleware,
+        backend=backend or InMemoryIdempotencyBackend(),
+        routes={"/items.*": 0},
+        **kwargs
+    )
+    app.add_middleware(TracingMiddleware)
+    return app
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+def test_encode_decode_record():
+    headers = [(b"content-type", b"application/octet-stream")]
+    body = bytes(range(256))
+    assert decode_record(encode_record(201, headers, body)) == (
+        201, headers, body
+    )
+
+
+def test_replays_stored_response():
+    client = TestClient(make_app())
+    first = client.post("/items", headers={"Idempotency-Key": "abc"})
+    second = client.post("/items", headers={"Idempotency-Key": "abc"})
+    assert first.status_code == second.status_code == 201
+    assert first.json() == second.json() == {"count": 1}
+    assert "idempotent-replayed" not in first.headers
+    assert second.headers["idempotent-replayed"] == "true"
+    assert second.headers["idempotency-key"] == "abc"
+    assert len(calls) == 1
+
+
+def test_replay_is_stamped_by_timing_middleware():
+    async def timed(request):
+        calls.append(request.url.path)
+        return JSONResponse({}, headers={"Server-Timing": "stale;dur=50"})
+
+    app = Starlette(routes=[Route("/items", timed, methods=["POST"])])
+    app.add_middleware(
+        IdempotencyMiddleware,
+        backend=InMemoryIdempotencyBackend(),
+        routes={"/items": 0},
+    )
+    add_timing_middleware(app, server_timing_routes=["/items"])
+    app.add_middleware(TracingMiddleware)
+    client = TestClient(app)
+    client.post("/items", headers={"Idempotency-Key": "abc"})
+    replay = client.post("/items", headers={"Idempotency-Key": "abc"})
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert "stale" not in replay.headers["server-timing"]
+    assert "total;dur=" in replay.headers["server-timing"]
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("path, headers", [
+    ("/items", {}),
+    ("/other", {"Idempotency-Key": "abc"}),
+    ("/items/fail", {"Idempotency-Key": "abc"}),
+])
+def test_not_replayed(path, headers):
+    client = TestClient(make_app())
+    client.post(path, headers=headers)
+    response = client.post(path, headers=headers)
+    assert "idempotent-replayed" not in response.headers
+    assert len(calls) == 2
+
+
+def test_body_size_limit():
+    client = TestClient(make_app(max_body_size=4))
+    client.post("/items", headers={"Idempotency-Key": "abc"})
+    client.post("/items", headers={"Idempotency-Key": "abc"})
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_wait_for_first():
+    app = make_app()
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/items",
+        "raw_path": b"/items",
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "server": ("testserver", 80),
+        "headers": [(b"idempotency-key", b"abc")],
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def call():
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await app(dict(scope), receive, send)
+        sent.append(messages)
+
+    await asyncio.gather(*(call() for _ in range(5)))
+    assert len(calls) == 1
+    assert [messages[0]["status"] for messages in sent] == [201] * 5
+    assert len({messages[1]["body"] for messages in sent}) == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_backend():
+    backend = RedisIdempotencyBackend()
+    with mock.patch(
+        "das_sankhya.app.middlewares.idempotency.RedisClient"
+    ) as redis_mock:
+        redis_mock.set = mock.AsyncMock(return_value=True)
+        redis_mock.eval = mock.AsyncMock()
+        token = await backend.acquire("key", 1.5)
+        redis_mock.set.assert_called_once_with(
+            "key:lock", token, px=1500, nx=True
+        )
+        await backend.store("key", b"record", 10, token)
+        redis_mock.set.assert_called_with("key", b"record", px=10000)
+        redis_mock.eval.assert_called_once_with(
+            RELEASE_LOCK_SCRIPT, keys=["key:lock"], args=[token]
+        )
+        redis_mock.set = mock.AsyncMock(return_value=None)
+        assert await backend.acquire("key", 1.5) is None
+
+
+@pytest.mark.asyncio
+async def test_release_keeps_lock_taken_over():
+    backend = InMemoryIdempotencyBackend()
+    token = await backend.acquire("key", 1)
+    await backend.release("key", "expired-token")
+    assert await backend.acquire("key", 1) is None
+    await backend.release("key", token)
+    assert await backend.acquire("key", 1) is not None
+
+
+def test_redis_errors_fail_open():
+    backend = RedisIdempotencyBackend()
+    with mock.patch(
+        "das_sankhya.app.middlewares.idempotency.RedisClient"
+    ) as redis_mock:
+        redis_mock.get = mock.AsyncMock(side_effect=RedisError("down"))
+        client = TestClient(make_app(backend=backend))
+        first = client.post("/items", headers={"Idempotency-Key": "abc"})
+        second = client.post("/items", headers={"Idempotency-Key": "abc"})
+    assert first.status_code == second.status_code == 201
+    assert "idempotent-replayed" not in second.headers
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_waiters_take_over_in_turn():
+    app = make_app()
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/items/fail",
+        "raw_path": b"/items/fail",
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "server": ("testserver", 80),
+        "headers": [(b"idempotency-key", b"abc")],
+    }
+    statuses = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def call():
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        await app(dict(scope), receive, send)
+
+    await asyncio.gather(*(call() for _ in range(3)))
+    assert statuses == [500] * 3
+    assert len(calls) == 3
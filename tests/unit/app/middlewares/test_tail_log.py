@@ -0,0 +1,67 @@
+import io
+import re
+
+import pytest
+from loguru import logger
+from das_sankhya.app.middlewares.tail_log import TailLogMiddleware
+from das_sankhya.core.log_buffer import TailLogBuffer
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def make_app(status=200, error=False, **kwargs):
+    async def endpoint(scope, receive, send):
+        logger.info("handling {}", scope["path"])
+        if error:
+            raise RuntimeError("boom")
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    buffer = TailLogBuffer()
+    stream = io.StringIO()
+    handler_id = logger.add(stream, format="{message}", filter=buffer)
+    return TailLogMiddleware(endpoint, buffer=buffer, **kwargs), stream, handler_id
+
+
+async def call(app, path="/items"):
+    await app({"type": "http", "method": "GET", "path": path, "headers": []}, receive, send)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "kwargs, expected",
+    [
+        ({}, r"GET /items 200 in \d+\.\dms, 1 buffered log records dropped"),
+        ({"summary": False}, ""),
+        ({"status": 503}, "handling /items"),
+        ({"latency_threshold": 0}, "handling /items"),
+    ],
+)
+async def test_tail_log(kwargs, expected):
+    app, stream, handler_id = make_app(**kwargs)
+    try:
+        await call(app)
+    finally:
+        logger.remove(handler_id)
+    if expected:
+        assert len(stream.getvalue().splitlines()) == 1
+        assert re.fullmatch(expected + "\n", stream.getvalue())
+    else:
+        assert stream.getvalue() == ""
+
+
+@pytest.mark.asyncio
+async def test_flush_on_error():
+    app, stream, handler_id = make_app(error=True)
+    try:
+        with pytest.raises(RuntimeError):
+            await call(app)
+    finally:
+        logger.remove(handler_id)
+    assert stream.getvalue() == "handling /items\n"
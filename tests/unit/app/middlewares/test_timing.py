@@ -0,0 +1,226 @@
+import asyncio
+import re
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from das_sankhya.app.middlewares.timing import (
+    _compile_exclude,
+    _MetricNamer,
+    _TimingStats,
+    add_timing_middleware,
+    record_timing,
+)
+from das_sankhya.core.diagnostics import record_call, slow_requests
+from das_sankhya.core.metrics import registry
+from das_sankhya.middlewares.asgi_correlation_id import TracingMiddleware
+
+
+def make_client(exclude=None, **kwargs):
+    records = []
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int, request: Request):
+        record_timing(request, note="halfway")
+        return {"item_id": item_id}
+
+    @app.get("/health")
+    async def health():
+        return {}
+
+    add_timing_middleware(app, record=records.append, exclude=exclude, **kwargs)
+    return TestClient(app), records
+
+
+def test_records_timing():
+    client, records = make_client()
+    client.get("/items/1")
+    client.get("/items/2")
+    assert len(records) == 4
+    assert records[0].startswith("TIMING: Wall: ")
+    assert records[0].endswith("test_timing.read_item (halfway)")
+    assert records[1].endswith("test_timing.read_item")
+
+
+def test_unmatched_route():
+    client, records = make_client()
+    client.get("/missing")
+    assert records[0].endswith("<Path: /missing>")
+
+
+@pytest.mark.parametrize("exclude", [
+    "health",
+    ["^nothing$", r"\.health$"],
+    re.compile("health"),
+])
+def test_exclude(exclude):
+    client, records = make_client(exclude=exclude)
+    client.get("/health")
+    assert records == []
+    client.get("/items/1")
+    assert len(records) == 2
+
+
+def test_metric_namer_cache():
+    client, _ = make_client()
+    namer = _MetricNamer(
+        prefix="custom", router=client.app.router, cache_size=1
+    )
+    route = client.app.router.routes[-2]
+    scope = {"type": "http", "method": "GET", "path": "/items/3",
+             "endpoint": route.endpoint}
+    assert namer(scope) == "custom.tests.unit.app.middlewares.test_timing.read_item"
+    assert len(namer._cache) == 1
+    scope["method"] = "HEAD"
+    namer(scope)
+    assert len(namer._cache) == 1
+
+
+def test_timing_stats():
+    records = []
+    with _TimingStats("name", record=records.append) as timer:
+        pass
+    assert timer.time >= 0
+    assert timer.cpu_time >= 0
+    assert records[0].endswith("| name")
+
+
+def test_compile_exclude():
+    assert _compile_exclude(None) is None
+    assert _compile_exclude([]) is None
+    assert _compile_exclude(["a", "b"]).pattern == "(?:a)|(?:b)"
+
+
+def test_records_metrics():
+    client, _ = make_client()
+    client.get("/items/1")
+    client.get("/missing")
+    text = registry.collect()
+    assert re.search(r'http_request_duration_seconds_count\{method="GET",route="[\w.]*test_timing.read_item",status="200"\}', text)
+    assert 'http_request_cpu_seconds_count{method="GET",route="<unmatched>",status="404"}' in text
+    assert "/missing" not in text
+    assert "http_requests_in_flight 0\n" in text
+
+
+def test_server_timing_is_opt_in():
+    client, _ = make_client(server_timing_header="X-Server-Timing")
+    assert "server-timing" not in client.get("/items/1").headers
+
+
+def test_server_timing_by_route():
+    client, _ = make_client(server_timing_routes=[r"^/items/"])
+    value = client.get("/items/1").headers["server-timing"]
+    assert re.fullmatch(r"halfway;dur=\d+\.\d, total;dur=\d+\.\d", value)
+    assert "server-timing" not in client.get("/health").headers
+
+
+def test_server_timing_by_request_header():
+    client, _ = make_client(server_timing_header="X-Server-Timing")
+    response = client.get("/items/1", headers={"X-Server-Timing": "1"})
+    assert response.headers["server-timing"].startswith("halfway;dur=")
+
+
+def test_server_timing_names_are_tokens():
+    timer = _TimingStats()
+    timer.start()
+    timer.emit("redis get")
+    timer.emit("")
+    assert re.fullmatch(rb"redis_get;dur=\d+\.\d, split;dur=\d+\.\d, total;dur=\d+\.\d", timer.server_timing())
+    assert [note for note, _ in timer.splits] == ["redis get", ""]
+
+
+def test_slow_request_capture():
+    reports = []
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow(request: Request):
+        record_call("redis", "GET", 0.002)
+        await asyncio.sleep(0.02)
+        record_timing(request, note="upstream")
+        return {}
+
+    @app.get("/fast")
+    async def fast():
+        return {}
+
+    add_timing_middleware(
+        app,
+        record=lambda message: None,
+        slow_threshold=10,
+        slow_routes={"^/slow$": 0.01, "^/fast$": 0.01},
+        slow_record=reports.append,
+    )
+    app.add_middleware(TracingMiddleware)
+    slow_requests.clear()
+    client = TestClient(app)
+    client.get("/fast")
+    response = client.get("/slow", headers={"Idempotency-Key": "key-1"})
+
+    assert len(reports) == 1
+    report = reports[0]
+    assert slow_requests.entries() == [report]
+    assert report["method"] == "GET"
+    assert report["path"] == "/slow"
+    assert report["status"] == 200
+    assert report["wall_ms"] >= 20
+    assert report["threshold_ms"] == 10
+    assert [split["name"] for split in report["splits"]] == ["upstream"]
+    assert report["calls"] == [{"kind": "redis", "target": "GET", "ms": 2.0}]
+    assert report["correlation_id"] == response.headers["x-correlation-id"]
+    assert report["request_id"] == response.headers["x-request-id"]
+    assert report["idempotency_key"] == "key-1"
+    slow_requests.clear()
+
+
+def test_access_record_replaces_timing_line():
+    entries = []
+    client, records = make_client(exclude="health", access_record=entries.append)
+    app = client.app
+    app.add_middleware(TracingMiddleware)
+    response = client.get("/items/7")
+    client.get("/health")
+
+    assert records == []
+    (entry,) = entries
+    assert entry["method"] == "GET"
+    assert entry["path"] == "/items/7"
+    assert entry["route"] == "/items/{item_id}"
+    assert entry["status"] == 200
+    assert entry["bytes"] == len(response.content)
+    assert entry["wall_ms"] >= 0
+    assert entry["cpu_ms"] >= 0
+    assert [split["name"] for split in entry["splits"]] == ["halfway"]
+    assert entry["correlation_id"] is not None
+    assert entry["request_id"] is not None
+    assert entry["idempotency_key"] is None
+
+
+def test_access_record_keeps_splits_out_of_the_log():
+    entries = []
+    app = FastAPI()
+
+    @app.get("/ready")
+    async def ready(request: Request):
+        record_timing(request, note="upstream")
+        record_timing(request, note="redis")
+        return {}
+
+    def record(message):
+        raise AssertionError("unexpected TIMING line: " + message)
+
+    add_timing_middleware(
+        app,
+        record=record,
+        server_timing_routes="^/ready$",
+        access_record=entries.append,
+    )
+    response = TestClient(app).get("/ready")
+
+    (entry,) = entries
+    assert [split["name"] for split in entry["splits"]] == ["upstream", "redis"]
+    assert re.fullmatch(
+        r"upstream;dur=\d+\.\d, redis;dur=\d+\.\d, total;dur=\d+\.\d",
+        response.headers["server-timing"],
+    )
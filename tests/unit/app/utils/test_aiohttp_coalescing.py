@@ -0,0 +1,125 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aioresponses import aioresponses
+from das_sankhya.config import http_client as http_client_conf
+from das_sankhya.config.http_client import HttpClient
+from das_sankhya.core.metrics import registry
+from das_sankhya.utils import AiohttpClient
+
+URL = "http://example.com/api"
+
+
+def counter(name):
+    for line in registry.collect().splitlines():
+        if line.startswith("{0}_total ".format(name)):
+            return float(line.split()[1])
+    return 0.0
+
+
+@pytest.fixture
+async def mock(monkeypatch):
+    monkeypatch.setattr(http_client_conf, "HTTP_COALESCE_GETS", True)
+    monkeypatch.setattr(http_client_conf, "HTTP_COALESCE_HEADERS", ["Accept"])
+    with aioresponses() as mocked:
+        AiohttpClient.get_aiohttp_client()
+        yield mocked
+        await AiohttpClient.close_aiohttp_client()
+    assert AiohttpClient.in_flight == {}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_gets_share_one_request(mock):
+    mock.get(URL, status=200, payload=dict(master="exploder"))
+    coalesced = counter("http_client_coalesced_calls")
+    shared = counter("http_client_shared_requests")
+
+    responses = await asyncio.gather(
+        *(
+            AiohttpClient.get(URL, headers={"x-correlation-id": str(index)})
+            for index in range(5)
+        )
+    )
+
+    assert all(response is responses[0] for response in responses)
+    for response in responses:
+        assert await response.json() == {"master": "exploder"}
+    assert counter("http_client_coalesced_calls") - coalesced == 4
+    assert counter("http_client_shared_requests") - shared == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_are_raised_to_every_caller(mock):
+    mock.get(URL, status=500)
+
+    results = await asyncio.gather(
+        *(AiohttpClient.get(URL) for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(
+        isinstance(result, aiohttp.ClientResponseError) for result in results
+    )
+    assert results[0] is results[1] is results[2]
+
+
+@pytest.mark.asyncio
+async def test_coalescing_headers_tell_requests_apart(mock):
+    mock.get(URL, status=200, body="json", repeat=True)
+    mock.get(URL, status=200, body="text", repeat=True)
+    shared = counter("http_client_shared_requests")
+
+    json_response, text_response = await asyncio.gather(
+        AiohttpClient.get(URL, headers={"Accept": "application/json"}),
+        AiohttpClient.get(URL, headers={"accept": "text/plain"}),
+    )
+
+    assert json_response is not text_response
+    assert counter("http_client_shared_requests") - shared == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_request(mock):
+    mock.get(URL, status=200, body="done")
+    first = asyncio.ensure_future(AiohttpClient.get(URL))
+    second = asyncio.ensure_future(AiohttpClient.get(URL))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    response = await second
+
+    assert first.cancelled()
+    assert await response.text() == "done"
+
+
+@pytest.mark.asyncio
+async def test_shared_request_sends_a_neutral_correlation_id(mock):
+    mock.get(URL, status=200, body="done")
+
+    await asyncio.gather(
+        AiohttpClient.get(URL, headers={"x-correlation-id": "first"}),
+        AiohttpClient.get(URL, headers={"x-correlation-id": "second"}),
+    )
+
+    (calls,) = mock.requests.values()
+    assert len(calls) == 1
+    correlation_id = calls[0].kwargs["headers"]["x-correlation-id"]
+    assert correlation_id not in ("first", "second")
+
+
+@pytest.mark.asyncio
+async def test_idempotency_keys_tell_requests_apart(mock, monkeypatch):
+    monkeypatch.setattr(
+        http_client_conf,
+        "HTTP_COALESCE_HEADERS",
+        HttpClient().HTTP_COALESCE_HEADERS,
+    )
+    mock.get(URL, status=200, body="done", repeat=True)
+    shared = counter("http_client_shared_requests")
+
+    await asyncio.gather(
+        AiohttpClient.get(URL, headers={"Idempotency-Key": "first"}),
+        AiohttpClient.get(URL, headers={"Idempotency-Key": "second"}),
+    )
+
+    assert counter("http_client_shared_requests") - shared == 2
@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+import pytest
+from das_sankhya.core.deadline import DeadlineExceeded, request_deadline
+from das_sankhya.utils import RedisClient
+
+
+class SlowCommand(object):
+    def __init__(self):
+        self.completed = False
+
+    async def __call__(self):
+        await asyncio.sleep(0.05)
+        self.completed = True
+        return True
+
+
+@pytest.mark.asyncio
+async def test_expired_deadline_does_not_cancel_command():
+    command = SlowCommand()
+    token = request_deadline.set(time.monotonic() + 0.01)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            await RedisClient._execute("SET", command())
+    finally:
+        request_deadline.reset(token)
+    assert not command.completed
+    await asyncio.sleep(0.1)
+    assert command.completed
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_command():
+    command = SlowCommand()
+    caller = asyncio.ensure_future(RedisClient._execute("SET", command()))
+    await asyncio.sleep(0.01)
+    caller.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+    await asyncio.sleep(0.1)
+    assert command.completed
@@ -0,0 +1,54 @@
+import logging
+
+from loguru import logger
+from das_sankhya.core.access_log import ACCESS_LOGGERS, disable_server_access_logs, log_access
+from das_sankhya.core.log_buffer import TailLogBuffer
+from das_sankhya.core.log_dedup import DedupFilter
+from das_sankhya.core.log_sampling import SamplingFilter
+from das_sankhya.core.logs2 import chain_filters
+
+ENTRY = {"method": "GET", "path": "/items/1", "route": "/items/{item_id}", "status": 200,
+         "bytes": 12, "wall_ms": 1.25, "cpu_ms": 0.5}
+
+
+def test_log_access_binds_entry():
+    records = []
+    handler_id = logger.add(records.append, format="{message}")
+    try:
+        log_access(ENTRY)
+    finally:
+        logger.remove(handler_id)
+    (message,) = records
+    assert message.record["message"] == "GET /items/1 200 12B in 1.2ms (CPU 0.5ms)"
+    assert message.record["extra"]["route"] == "/items/{item_id}"
+    assert message.record["extra"]["status"] == 200
+
+
+def test_disable_server_access_logs():
+    try:
+        disable_server_access_logs()
+        for name in ACCESS_LOGGERS:
+            assert not logging.getLogger(name).isEnabledFor(logging.CRITICAL)
+    finally:
+        for name in ACCESS_LOGGERS:
+            logging.getLogger(name).disabled = False
+
+
+def test_access_records_are_never_filtered():
+    records = []
+    buffer = TailLogBuffer()
+    log_filter = chain_filters(
+        buffer,
+        SamplingFilter(rate=5),
+        DedupFilter(level="INFO", window=60.0),
+    )
+    handler_id = logger.add(records.append, format="{message}", filter=log_filter)
+    token = buffer.start("request-id")
+    try:
+        for _ in range(50):
+            log_access(ENTRY)
+    finally:
+        buffer.finish(token, flush=False)
+        logger.remove(handler_id)
+    assert len(records) == 50
+    assert all(message.record["extra"]["access"] for message in records)
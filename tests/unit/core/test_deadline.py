@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import pytest
+from das_sankhya.core.deadline import (
+    DeadlineExceeded,
+    cap_timeout,
+    format_timeout,
+    parse_timeout,
+    remaining,
+    request_deadline,
+    with_deadline,
+)
+
+
+@pytest.fixture
+def deadline():
+    def set_deadline(seconds):
+        tokens.append(request_deadline.set(time.monotonic() + seconds))
+
+    tokens = []
+    yield set_deadline
+    for token in reversed(tokens):
+        request_deadline.reset(token)
+
+
+def test_no_deadline():
+    assert remaining() is None
+    assert cap_timeout(None) is None
+    assert cap_timeout(2) == 2
+
+
+def test_cap_timeout(deadline):
+    deadline(1)
+    assert 0.9 < remaining() <= 1
+    assert cap_timeout(0.5) == 0.5
+    assert 0.9 < cap_timeout(2) <= 1
+    assert 0.9 < cap_timeout(None) <= 1
+    deadline(-1)
+    assert remaining() == 0
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1.5", 1.5),
+    ("30", 30.0),
+    ("0", None),
+    ("-1", None),
+    ("nan", None),
+    ("inf", None),
+    ("soon", None),
+])
+def test_parse_timeout(value, expected):
+    assert parse_timeout(value) == expected
+
+
+def test_format_timeout():
+    assert format_timeout(1.23456) == "1.235"
+
+
+@pytest.mark.asyncio
+async def test_with_deadline():
+    assert await with_deadline(asyncio.sleep(0, result=1)) == 1
+    with pytest.raises(asyncio.TimeoutError) as info:
+        await with_deadline(asyncio.sleep(1), timeout=0.01)
+    assert not isinstance(info.value, DeadlineExceeded)
+
+    token = request_deadline.set(time.monotonic() + 0.01)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            await with_deadline(asyncio.sleep(1), timeout=2)
+    finally:
+        request_deadline.reset(token)
@@ -0,0 +1,29 @@
+from das_sankhya.core.diagnostics import (
+    SlowRequestLog,
+    outbound_calls,
+    record_call,
+)
+
+
+def test_ring_buffer():
+    log = SlowRequestLog(capacity=3)
+    for i in range(5):
+        log.add({"i": i})
+    assert log.entries() == [{"i": 4}, {"i": 3}, {"i": 2}]
+    assert log.entries(limit=1) == [{"i": 4}]
+    log.resize(2)
+    assert log.capacity == 2
+    assert log.entries() == [{"i": 4}, {"i": 3}]
+    log.clear()
+    assert log.entries() == []
+
+
+def test_record_call():
+    record_call("redis", "GET", 0.1)
+    calls = []
+    token = outbound_calls.set(calls)
+    try:
+        record_call("redis", "GET", 0.1)
+    finally:
+        outbound_calls.reset(token)
+    assert calls == [("redis", "GET", 0.1)]
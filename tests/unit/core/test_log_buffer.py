@@ -0,0 +1,70 @@
+import io
+
+import pytest
+from loguru import logger
+from das_sankhya.core.log_buffer import TailLogBuffer
+
+
+@pytest.fixture
+def captured():
+    buffer = TailLogBuffer(level="WARNING", max_records=3, max_worker_records=5)
+    stream = io.StringIO()
+    handler_id = logger.add(
+        stream, format="{level} {function} {message}", filter=buffer
+    )
+    yield buffer, stream
+    logger.remove(handler_id)
+
+
+def test_drop(captured):
+    buffer, stream = captured
+    token = buffer.start("rid")
+    logger.info("held")
+    logger.warning("passed")
+    finished = buffer.finish(token, flush=False)
+
+    assert stream.getvalue() == "WARNING test_drop passed\n"
+    assert finished.request_id == "rid"
+    assert [record["message"] for record in finished.records] == ["held"]
+    assert buffer.held == 0
+
+
+def test_flush_replays_records(captured):
+    buffer, stream = captured
+    token = buffer.start()
+    logger.debug("first {}", 1)
+    logger.info("second {braces}")
+    buffer.finish(token, flush=True)
+    logger.info("after")
+
+    assert stream.getvalue().splitlines() == [
+        "DEBUG test_flush_replays_records first 1",
+        "INFO test_flush_replays_records second {braces}",
+        "INFO test_flush_replays_records after",
+    ]
+
+
+def test_memory_bounds(captured):
+    buffer, stream = captured
+    first = buffer.start()
+    for i in range(5):
+        logger.info("first {}", i)
+    second = buffer.start()
+    for i in range(3):
+        logger.info("second {}", i)
+
+    # 3 records per request, 5 per worker: the last second one is logged.
+    assert buffer.held == 5
+    assert stream.getvalue().splitlines() == [
+        "INFO test_memory_bounds second 2"
+    ]
+
+    buffer.finish(second, flush=False)
+    buffer.finish(first, flush=True)
+    assert buffer.held == 0
+    assert stream.getvalue().splitlines()[1:] == [
+        "INFO finish 2 older log records of this request were dropped",
+        "INFO test_memory_bounds first 2",
+        "INFO test_memory_bounds first 3",
+        "INFO test_memory_bounds first 4",
+    ]
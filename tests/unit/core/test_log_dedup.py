@@ -0,0 +1,74 @@
+import gc
+import io
+import re
+import time
+import weakref
+
+from loguru import logger
+from das_sankhya.core.log_dedup import DedupFilter
+
+
+def log_lines(log_filter, log):
+    stream = io.StringIO()
+    handler_id = logger.add(stream, format="{level} {message}", filter=log_filter)
+    try:
+        log()
+    finally:
+        logger.remove(handler_id)
+    return stream.getvalue().splitlines()
+
+
+def test_repeats_are_folded_into_a_summary():
+    log_filter = DedupFilter(window=60, max_samples=2)
+
+    def log():
+        for i in range(5):
+            logger.bind(correlation_id="id{0}".format(i % 3)).error("Could not connect to {}", "redis")
+        log_filter.summarize()
+
+    first, summary = log_lines(log_filter, log)
+    assert first == "ERROR Could not connect to redis"
+    assert re.fullmatch(
+        r"ERROR Repeated 4 times in the last 60s from tests\.unit\.core\.test_log_dedup:log:\d+, "
+        r"sample correlation IDs \['id1', 'id2'\]: Could not connect to redis",
+        summary,
+    )
+
+
+def test_call_sites_and_levels_are_separate():
+    log_filter = DedupFilter(window=60)
+
+    def log():
+        for _ in range(2):
+            logger.error("first")
+            logger.error("second")
+            logger.info("info")
+
+    assert log_lines(log_filter, log) == ["ERROR first", "ERROR second", "INFO info", "INFO info"]
+
+
+def test_new_window_logs_again():
+    log_filter = DedupFilter(window=0.01)
+
+    def log():
+        for _ in range(2):
+            logger.warning("slow")
+            time.sleep(0.02)
+
+    assert log_lines(log_filter, log) == ["WARNING slow", "WARNING slow"]
+
+
+def test_summary_without_repeats_is_not_logged():
+    log_filter = DedupFilter(window=60)
+
+    def log():
+        logger.error("once")
+        log_filter.summarize()
+
+    assert log_lines(log_filter, log) == ["ERROR once"]
+
+
+def test_filters_are_not_kept_alive():
+    ref = weakref.ref(DedupFilter())
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,63 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from loguru import logger
+from das_sankhya.core.log_encoder import RecordEncoder
+
+
+@pytest.fixture
+def records():
+    captured = []
+    handler_id = logger.add(lambda message: captured.append(message.record))
+    yield captured
+    logger.remove(handler_id)
+
+
+def test_default_fields(records):
+    logger.bind(
+        at=datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        correlation_id="c1", request_id="r1", pid=1, data={1: "a"}
+    ).warning("hello {}", "world")
+
+    line = RecordEncoder().encode(records[0])
+
+    assert line.endswith(b"\n")
+    rec = json.loads(line)
+    assert list(rec) == [
+        "time", "level", "message", "logger", "function", "line", "pid",
+        "correlation_id", "request_id", "extra",
+    ]
+    assert rec["level"] == "WARNING"
+    assert rec["message"] == "hello world"
+    assert rec["logger"] == __name__
+    assert rec["function"] == "test_default_fields"
+    assert rec["correlation_id"] == "c1"
+    assert rec["request_id"] == "r1"
+    assert rec["extra"] == {"at": "2020-01-02T03:04:05Z", "data": {"1": "a"}}
+    assert rec["time"] == records[0]["time"].isoformat().replace("+00:00", "Z")
+
+
+def test_custom_fields_and_exception(records):
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception("failed")
+
+    rec = json.loads(RecordEncoder(fields=("message", "exception")).encode(records[0]))
+
+    assert list(rec) == ["message", "exception"]
+    assert "ZeroDivisionError" in rec["exception"]
+
+
+def test_unknown_field():
+    with pytest.raises(ValueError):
+        RecordEncoder(fields=("message", "nope"))
+
+
+def test_long_payload_is_truncated(records):
+    logger.bind(payload="x" * 10000).info("big")
+
+    rec = json.loads(RecordEncoder().encode(records[0]))
+
+    assert rec["extra"]["payload"] == "x" * 8192 + "... [1808 more characters truncated]"
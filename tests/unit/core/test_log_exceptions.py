@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+from collections import namedtuple
+
+from loguru import logger
+from das_sankhya.core.log_encoder import RecordEncoder
+from das_sankhya.core.log_exceptions import CapturedException, ExceptionCapture
+from das_sankhya.core.log_sinks import BackgroundTextSink
+
+RecordException = namedtuple("RecordException", ("type", "value", "traceback"))
+
+
+def capture_records(capture, count):
+    records = []
+    handler_id = logger.add(records.append, format="{message}")
+    try:
+        for _ in range(count):
+            try:
+                {}["missing"]
+            except KeyError:
+                logger.patch(capture).exception("lookup failed")
+    finally:
+        logger.remove(handler_id)
+    return [message.record for message in records]
+
+
+def test_repeated_exceptions_are_captured():
+    records = capture_records(ExceptionCapture(full_tracebacks=2), 4)
+
+    fingerprints = {record["extra"]["exception_fingerprint"] for record in records}
+    assert len(fingerprints) == 1
+    assert records[0]["exception"].traceback is not None
+    assert records[1]["exception"].traceback is not None
+    captured = records[3]["exception"]
+    assert isinstance(captured, CapturedException)
+    assert not captured
+    assert captured.count == 4
+    assert captured.frame[2] == "capture_records"
+    assert captured.render() == (
+        "KeyError: 'missing' at {0}:{1} in capture_records"
+        " [exception {2}, occurrence 4]".format(__file__, captured.frame[1], fingerprints.pop())
+    )
+
+
+def test_fingerprints_differ_by_call_site():
+    capture = ExceptionCapture(full_tracebacks=0)
+    records = []
+    handler_id = logger.add(records.append, format="{message}")
+    try:
+        for exception in (ValueError("a"), ValueError("b")):
+            try:
+                raise exception
+            except ValueError:
+                logger.patch(capture).exception("first")
+        try:
+            raise ValueError("c")
+        except ValueError:
+            logger.patch(capture).exception("second")
+    finally:
+        logger.remove(handler_id)
+    counts = [message.record["exception"].count for message in records]
+    assert counts == [1, 2, 1]
+
+
+def exception_record(exception):
+    try:
+        raise exception
+    except Exception:
+        type_, value, tb = sys.exc_info()
+    return {"exception": RecordException(type_, value, tb), "extra": {}}
+
+
+def test_counts_restart_past_max_fingerprints():
+    capture = ExceptionCapture(full_tracebacks=1, max_fingerprints=1)
+    first = exception_record(KeyError("a"))
+    capture(first)
+    capture(exception_record(ValueError("b")))
+    again = exception_record(KeyError("a"))
+    capture(again)
+    assert again["extra"]["exception_fingerprint"] == first["extra"]["exception_fingerprint"]
+    assert again["exception"].traceback is not None
+
+
+def test_counts_restart_each_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    capture = ExceptionCapture(full_tracebacks=1, window=60)
+    capture(exception_record(KeyError("a")))
+    repeated = exception_record(KeyError("a"))
+    capture(repeated)
+    assert isinstance(repeated["exception"], CapturedException)
+    now[0] += 60
+    later = exception_record(KeyError("a"))
+    capture(later)
+    assert later["exception"].traceback is not None
+
+
+def test_captured_exception_rendering():
+    captured = CapturedException("KeyError", "'missing'", ("app.py", 3, "handler"), "0badf00d", 9)
+    encoder = RecordEncoder(fields=("message", "exception"))
+    record = {"message": "failed", "exception": captured, "extra": {}, "time": None}
+    assert encoder.to_dict(record) == {
+        "message": "failed",
+        "exception": "KeyError: 'missing' at app.py:3 in handler [exception 0badf00d, occurrence 9]",
+    }
+
+    read_fd, write_fd = os.pipe()
+    sink = BackgroundTextSink(fd=write_fd)
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        logger.patch(lambda record: record.update(exception=captured)).error("failed")
+        assert sink.drain()
+    finally:
+        logger.remove(handler_id)
+    os.set_blocking(read_fd, False)
+    assert os.read(read_fd, 65536).decode().splitlines() == ["failed", captured.render()]
+    os.close(read_fd)
+    os.close(write_fd)
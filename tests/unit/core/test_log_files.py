@@ -0,0 +1,69 @@
+import gc
+import gzip
+import json
+import os
+import weakref
+
+import pytest
+from loguru import logger
+from das_sankhya.core.log_files import RotatingFile
+from das_sankhya.core.log_sinks import BackgroundJsonSink
+
+
+def test_rotates_by_size_and_compresses(tmp_path):
+    log_file = RotatingFile(str(tmp_path), name="app", max_bytes=10, compression="gzip")
+    for line in (b"first\n", b"second\n", b"third\n"):
+        log_file.write(line)
+    log_file.close()
+
+    names = sorted(os.listdir(tmp_path))
+    assert len(names) == 3
+    assert all(name.startswith("app-{0}-".format(os.getpid())) for name in names)
+    compressed = [name for name in names if name.endswith(".log.gz")]
+    assert len(compressed) == 2
+    contents = sorted(gzip.open(tmp_path / name).read() for name in compressed)
+    assert contents == [b"first\n", b"second\n"]
+    (current,) = [name for name in names if name.endswith(".log")]
+    assert (tmp_path / current).read_bytes() == b"third\n"
+
+
+def test_rotates_by_age(tmp_path):
+    log_file = RotatingFile(str(tmp_path), interval=0, compression=None)
+    log_file.write(b"first\n")
+    log_file.write(b"second\n")
+    log_file.close()
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_preallocation_keeps_file_size(tmp_path):
+    log_file = RotatingFile(str(tmp_path), max_bytes=1 << 20)
+    log_file.write(b"line\n")
+    log_file.write(b"line\n")
+    assert os.path.getsize(log_file.path) == 10
+    log_file.close()
+    # The preallocated blocks are freed on close.
+    assert os.stat(log_file.path).st_blocks * 512 < 1 << 16
+
+
+def test_files_are_not_kept_alive(tmp_path):
+    ref = weakref.ref(RotatingFile(str(tmp_path)))
+    gc.collect()
+    assert ref() is None
+
+
+def test_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        RotatingFile(str(tmp_path), compression="rar")
+
+
+def test_sink_writes_to_rotating_file(tmp_path):
+    log_file = RotatingFile(str(tmp_path))
+    sink = BackgroundJsonSink(file=log_file)
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        logger.info("to file")
+        assert sink.drain()
+        lines = open(log_file.path, "rb").read().splitlines()
+    finally:
+        logger.remove(handler_id)
+    assert json.loads(lines[0])["message"] == "to file"
@@ -0,0 +1,59 @@
+import io
+import logging
+
+import pytest
+from loguru import logger
+from das_sankhya.core.log_intercept import InterceptHandler
+
+
+@pytest.fixture
+def bridge():
+    stream = io.StringIO()
+    handler_id = logger.add(stream, format="{level} {name}:{function} {message}")
+    handler = InterceptHandler()
+    loggers = [logging.getLogger("bridge.test"), logging.getLogger("uvicorn.access")]
+    for std_logger in loggers:
+        std_logger.handlers = [handler]
+        std_logger.propagate = False
+        std_logger.setLevel(logging.DEBUG)
+    yield handler, stream
+    for std_logger in loggers:
+        std_logger.handlers = []
+        std_logger.propagate = True
+    logger.remove(handler_id)
+
+
+def log_twice(std_logger):
+    for _ in range(2):
+        std_logger.info("%s {braces}", "message")
+
+
+def test_caller_and_level(bridge):
+    handler, stream = bridge
+    std_logger = logging.getLogger("bridge.test")
+    log_twice(std_logger)
+    std_logger.log(logging.INFO + 1, "custom level")
+
+    assert stream.getvalue().splitlines() == [
+        "INFO tests.unit.core.test_log_intercept:log_twice message {braces}",
+        "INFO tests.unit.core.test_log_intercept:log_twice message {braces}",
+        "Level 21 tests.unit.core.test_log_intercept:test_caller_and_level custom level",
+    ]
+    assert len(handler._depths) == 2
+
+
+def test_exception(bridge):
+    handler, stream = bridge
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logging.getLogger("bridge.test").exception("failed")
+    assert "ZeroDivisionError" in stream.getvalue()
+    assert stream.getvalue().startswith("ERROR tests.unit.core.test_log_intercept:test_exception failed")
+
+
+def test_no_caller_loggers(bridge):
+    handler, stream = bridge
+    logging.getLogger("uvicorn.access").info("GET / 200")
+    assert stream.getvalue() == "INFO das_sankhya.core.log_intercept:emit GET / 200\n"
+    assert not handler._depths
@@ -0,0 +1,51 @@
+import io
+
+from loguru import logger
+from das_sankhya.core.log_payload import (
+    PayloadSink,
+    render_payload,
+    truncate_payload,
+)
+
+
+def test_truncate_payload():
+    assert truncate_payload("abc", 2) == "ab... [1 more characters truncated]"
+    assert truncate_payload(b"abc", 2) == "ab... [1 more characters truncated]"
+    assert truncate_payload("abc", 3) == "abc"
+    payload = {"a": 1}
+    assert truncate_payload(payload, 1) is payload
+
+
+def test_render_payload():
+    assert render_payload({"b": 1, "a": [1, 2]}) == "{'a': [1, 2], 'b': 1}"
+    assert render_payload("text") == "text"
+    full = render_payload(list(range(100)))
+    assert render_payload(list(range(100)), 10) == (
+        full[:10] + "... [{0} more characters truncated]".format(len(full) - 10)
+    )
+
+
+def test_payload_sink_renders_after_line():
+    stream = io.StringIO()
+    handler_id = logger.add(PayloadSink(stream), format="{message}", level="INFO")
+    try:
+        logger.bind(payload={"key": "value"}).info("with payload")
+        logger.info("without payload")
+        logger.bind(payload=object()).debug("filtered out")
+    finally:
+        logger.remove(handler_id)
+
+    assert stream.getvalue() == (
+        "with payload\n{'key': 'value'}\nwithout payload\n"
+    )
+
+
+def test_payload_sink_renders_on_enqueue_thread():
+    stream = io.StringIO()
+    handler_id = logger.add(PayloadSink(stream), format="{message}", enqueue=True)
+    try:
+        logger.bind(payload=[1, 2]).info("enqueued")
+    finally:
+        logger.remove(handler_id)
+
+    assert stream.getvalue() == "enqueued\n[1, 2]\n"
@@ -0,0 +1,91 @@
+import gc
+import io
+import re
+import weakref
+
+from loguru import logger
+from das_sankhya.core.log_sampling import SamplingFilter
+
+
+def log_lines(log_filter, log):
+    stream = io.StringIO()
+    handler_id = logger.add(stream, format="{message}", filter=log_filter)
+    try:
+        log()
+    finally:
+        logger.remove(handler_id)
+    return stream.getvalue().splitlines()
+
+
+def test_one_in_every():
+    log_filter = SamplingFilter(every=3)
+
+    def log():
+        for i in range(7):
+            logger.info("message {}", i)
+
+    assert log_lines(log_filter, log) == ["message 0", "message 3", "message 6"]
+
+
+def test_rate_limit_per_call_site():
+    log_filter = SamplingFilter(rate=2)
+
+    def log():
+        for i in range(5):
+            logger.info("first {}", i)
+            logger.info("second {}", i)
+
+    assert log_lines(log_filter, log) == ["first 0", "second 0", "first 1", "second 1"]
+
+
+def test_warnings_always_pass():
+    log_filter = SamplingFilter(every=100)
+
+    def log():
+        for i in range(3):
+            logger.warning("warning {}", i)
+
+    assert len(log_lines(log_filter, log)) == 3
+
+
+def test_rules_most_specific_wins():
+    log_filter = SamplingFilter(
+        every=100,
+        rules={
+            "tests": {"every": 2},
+            "tests.unit.core.test_log_sampling:log": {"every": 1},
+        },
+    )
+
+    def log():
+        for i in range(3):
+            logger.info("kept {}", i)
+
+    assert log_lines(log_filter, log) == ["kept 0", "kept 1", "kept 2"]
+    assert log_filter._rule(("tests.unit.other", "f", 1)) == (None, 2)
+    assert log_filter._rule(("other", "f", 1)) == (None, 100)
+
+
+def test_summarize():
+    log_filter = SamplingFilter(every=2, summary_interval=60)
+
+    def log():
+        for i in range(5):
+            logger.info("message {}", i)
+        log_filter.summarize()
+        log_filter.summarize()
+
+    lines = log_lines(log_filter, log)
+    assert lines[:3] == ["message 0", "message 2", "message 4"]
+    assert len(lines) == 4
+    assert re.fullmatch(
+        r"Suppressed 2 messages from tests\.unit\.core\.test_log_sampling:log:\d+ "
+        r"in the last 60s",
+        lines[3],
+    )
+
+
+def test_filters_are_not_kept_alive():
+    ref = weakref.ref(SamplingFilter(rate=5))
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,237 @@
+import gc
+import json
+import os
+import threading
+import time
+import weakref
+
+import pytest
+from loguru import logger
+from das_sankhya.core.log_sinks import (
+    BackgroundJsonSink,
+    BackgroundTextSink,
+    drain_all,
+)
+from das_sankhya.core.metrics import registry
+
+
+@pytest.fixture
+def pipe():
+    read_fd, write_fd = os.pipe()
+    yield read_fd, write_fd
+    os.close(read_fd)
+    os.close(write_fd)
+
+
+def metric(sample):
+    for line in registry.collect().splitlines():
+        if line.startswith(sample + " "):
+            return float(line.split()[1])
+    return 0.0
+
+
+def read_lines(fd):
+    os.set_blocking(fd, False)
+    data = b""
+    while True:
+        try:
+            chunk = os.read(fd, 65536)
+        except BlockingIOError:
+            break
+        data += chunk
+    return [json.loads(line) for line in data.splitlines()]
+
+
+def test_writes_json_lines_in_batches(pipe, monkeypatch):
+    read_fd, write_fd = pipe
+    writes = []
+    real_write = os.write
+
+    def counting_write(fd, data):
+        if fd == write_fd:
+            writes.append(fd)
+        return real_write(fd, data)
+
+    monkeypatch.setattr(os, "write", counting_write)
+    sink = BackgroundJsonSink(fd=write_fd, batch_size=1000, flush_interval=60)
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        for i in range(10):
+            logger.bind(data={"i": i}).info("message {}", i)
+        assert sink.drain()
+    finally:
+        logger.remove(handler_id)
+
+    lines = read_lines(read_fd)
+    assert [line["message"] for line in lines] == ["message {0}".format(i) for i in range(10)]
+    assert lines[3]["extra"]["data"] == {"i": 3}
+    assert lines[0]["level"] == "INFO"
+    assert lines[0]["function"] == "test_writes_json_lines_in_batches"
+    assert writes == [write_fd]
+
+
+def test_flushes_by_age(pipe):
+    read_fd, write_fd = pipe
+    sink = BackgroundJsonSink(fd=write_fd, batch_size=1000, flush_interval=0.01)
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        logger.info("aged")
+        time.sleep(0.2)
+        assert [line["message"] for line in read_lines(read_fd)] == ["aged"]
+    finally:
+        logger.remove(handler_id)
+
+
+def test_queue_depth_falls_back_when_idle(pipe):
+    read_fd, write_fd = pipe
+    sink = BackgroundJsonSink(fd=write_fd, batch_size=1000, flush_interval=0.01)
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        for i in range(5):
+            logger.info("message {}", i)
+        assert sink.drain()
+        time.sleep(0.1)
+        assert metric("log_queue_depth") == 0
+    finally:
+        logger.remove(handler_id)
+    assert len(read_lines(read_fd)) == 5
+
+
+def test_exception_and_unserializable_extra(pipe):
+    read_fd, write_fd = pipe
+    sink = BackgroundJsonSink(fd=write_fd)
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.bind(obj=object()).exception("failed")
+    finally:
+        # Removing the sink writes what is pending.
+        logger.remove(handler_id)
+
+    (line,) = read_lines(read_fd)
+    assert "ZeroDivisionError" in line["exception"]
+    assert line["extra"]["obj"].startswith("<object object")
+
+
+def test_drops_records_when_full(pipe):
+    read_fd, write_fd = pipe
+    sink = BackgroundJsonSink(fd=write_fd, batch_size=1000, flush_interval=60, max_pending=2)
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        for i in range(5):
+            logger.info("message {}", i)
+        drain_all()
+    finally:
+        logger.remove(handler_id)
+    assert [line["message"] for line in read_lines(read_fd)] == ["message 0", "message 1"]
+
+
+def test_drop_low_keeps_important_records(pipe):
+    read_fd, write_fd = pipe
+    dropped = metric('log_records_dropped_total{level="INFO"}')
+    sink = BackgroundJsonSink(fd=write_fd, batch_size=1000, flush_interval=60, max_pending=2)
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        for i in range(3):
+            logger.info("message {}", i)
+        logger.error("failure")
+        assert sink.drain()
+    finally:
+        logger.remove(handler_id)
+    assert [line["message"] for line in read_lines(read_fd)] == ["message 1", "failure"]
+    assert metric('log_records_dropped_total{level="INFO"}') == dropped + 2
+
+
+def test_drop_oldest(pipe):
+    read_fd, write_fd = pipe
+    sink = BackgroundJsonSink(
+        fd=write_fd, batch_size=1000, flush_interval=60, max_pending=2, overflow="drop_oldest"
+    )
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        for i in range(5):
+            logger.info("message {}", i)
+        assert sink.drain()
+    finally:
+        logger.remove(handler_id)
+    assert [line["message"] for line in read_lines(read_fd)] == ["message 3", "message 4"]
+
+
+def test_block_waits_for_room(pipe):
+    read_fd, write_fd = pipe
+    blocked = metric("log_queue_blocked_total")
+    sink = BackgroundJsonSink(
+        fd=write_fd, batch_size=1000, flush_interval=60, max_pending=1, overflow="block", block_timeout=5
+    )
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        for i in range(20):
+            logger.debug("message {}", i)
+        assert sink.drain()
+    finally:
+        logger.remove(handler_id)
+    assert [line["message"] for line in read_lines(read_fd)] == ["message {0}".format(i) for i in range(20)]
+    assert metric("log_queue_blocked_total") == blocked + 19
+
+
+def test_block_drops_after_timeout(pipe, monkeypatch):
+    read_fd, write_fd = pipe
+    sink = BackgroundJsonSink(
+        fd=write_fd, batch_size=1000, flush_interval=60, max_pending=1, overflow="block", block_timeout=0.01
+    )
+    stalled = threading.Event()
+    resume = threading.Event()
+    output = sink._output
+
+    def stalled_output(chunks):
+        stalled.set()
+        resume.wait()
+        output(chunks)
+
+    monkeypatch.setattr(sink, "_output", stalled_output)
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        logger.info("first")
+        sink._flush_requested = True
+        with sink._cond:
+            sink._cond.notify_all()
+        assert stalled.wait(5)
+        logger.info("second")
+        logger.info("third")
+        resume.set()
+        assert sink.drain()
+    finally:
+        resume.set()
+        logger.remove(handler_id)
+    assert [line["message"] for line in read_lines(read_fd)] == ["first", "second"]
+
+
+def test_sinks_are_not_kept_alive(pipe):
+    ref = weakref.ref(BackgroundJsonSink(fd=pipe[1]))
+    gc.collect()
+    assert ref() is None
+
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        BackgroundJsonSink(overflow="grow")
+
+
+def test_text_sink_renders_payload(pipe):
+    read_fd, write_fd = pipe
+    sink = BackgroundTextSink(fd=write_fd)
+    handler_id = logger.add(sink, format="{level} {message}")
+    try:
+        logger.info("plain")
+        logger.bind(payload={"a": 1}).info("with payload")
+        assert sink.drain()
+    finally:
+        logger.remove(handler_id)
+    os.set_blocking(read_fd, False)
+    assert os.read(read_fd, 65536).decode().splitlines() == [
+        "INFO plain",
+        "INFO with payload",
+        "{'a': 1}",
+    ]
@@ -0,0 +1,103 @@
+import gc
+import json
+import os
+import time
+import weakref
+
+import pytest
+from loguru import logger
+from das_sankhya.core.log_transport import (
+    LOG_SOCKET_ENV,
+    DatagramSink,
+    LogCollector,
+)
+from das_sankhya.core.metrics import registry
+
+
+def fallback_writes():
+    for line in registry.collect().splitlines():
+        if line.startswith("log_transport_fallback_writes_total "):
+            return float(line.split()[1])
+    return 0.0
+
+
+@pytest.fixture
+def pipe():
+    read_fd, write_fd = os.pipe()
+    yield read_fd, write_fd
+    os.close(read_fd)
+    os.close(write_fd)
+
+
+def read_lines(fd, count, timeout=5.0):
+    os.set_blocking(fd, False)
+    data = b""
+    deadline = time.monotonic() + timeout
+    while data.count(b"\n") < count and time.monotonic() < deadline:
+        try:
+            data += os.read(fd, 65536)
+        except BlockingIOError:
+            time.sleep(0.01)
+    return [json.loads(line) for line in data.splitlines()]
+
+
+def test_collector_writes_records_of_sinks(pipe, tmp_path):
+    read_fd, write_fd = pipe
+    collector = LogCollector(
+        path=str(tmp_path / "collector.sock"), fd=write_fd, flush_interval=0.01
+    )
+    path = collector.start()
+    assert os.environ[LOG_SOCKET_ENV] == path
+    sink = DatagramSink(fd=write_fd, max_datagram=512)
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        for i in range(50):
+            logger.info("message {}", i)
+        assert sink.drain()
+    finally:
+        logger.remove(handler_id)
+        collector.stop()
+
+    assert LOG_SOCKET_ENV not in os.environ
+    assert not os.path.exists(path)
+    lines = read_lines(read_fd, 50)
+    assert [line["message"] for line in lines] == [
+        "message {0}".format(i) for i in range(50)
+    ]
+
+
+def test_sink_writes_directly_without_collector(pipe, tmp_path, monkeypatch):
+    read_fd, write_fd = pipe
+    monkeypatch.delenv(LOG_SOCKET_ENV, raising=False)
+    before = fallback_writes()
+    sink = DatagramSink(path=str(tmp_path / "missing.sock"), fd=write_fd)
+    handler_id = logger.add(sink, format="{message}")
+    try:
+        logger.info("direct")
+        assert sink.drain()
+    finally:
+        logger.remove(handler_id)
+
+    assert [line["message"] for line in read_lines(read_fd, 1)] == ["direct"]
+    assert fallback_writes() == before + 1
+
+
+def test_sink_splits_batches_on_line_boundaries():
+    sent = []
+
+    class Socket(object):
+        def send(self, data):
+            sent.append(data)
+
+    sink = DatagramSink(max_datagram=10)
+    sink._sock = Socket()
+    sink._output([b"aaaa\n", b"bbbb\n", b"cccc\n", b"dddddddddddd\n"])
+    sink.stop()
+
+    assert sent == [b"aaaa\nbbbb\n", b"cccc\n", b"dddddddddddd\n"]
+
+
+def test_collectors_are_not_kept_alive(tmp_path):
+    ref = weakref.ref(LogCollector(path=str(tmp_path / "log.sock")))
+    gc.collect()
+    assert ref() is None
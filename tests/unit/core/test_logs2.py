@@ -0,0 +1,46 @@
+import os
+
+from das_sankhya.core.logs2 import LOG_FORMAT, format_record, set_log_extras
+from das_sankhya.middlewares.asgi_correlation_id.context import (
+    TracingContext,
+    correlation_id,
+    tracing_context,
+)
+
+
+def test_set_log_extras_reads_tracing_context():
+    record = {"extra": {"request_id": "bound"}}
+    token = tracing_context.set(TracingContext("cid", "rid", "key"))
+    try:
+        set_log_extras(record)
+    finally:
+        tracing_context.reset(token)
+
+    assert record["extra"] == {
+        "correlation_id": "cid",
+        "request_id": "bound",
+        "idempotency_key": "key",
+        "pid": os.getpid(),
+    }
+
+
+def test_set_log_extras_falls_back_to_context_vars():
+    record = {"extra": {}}
+    token = correlation_id.set("celery")
+    try:
+        set_log_extras(record)
+    finally:
+        correlation_id.reset(token)
+
+    assert record["extra"]["correlation_id"] == "celery"
+    assert record["extra"]["request_id"] is None
+
+
+def test_format_record_variants():
+    plain = {"extra": {}, "exception": None}
+    assert format_record(plain) == LOG_FORMAT + "\n"
+
+    # Payloads are rendered by PayloadSink, not by the format.
+    with_payload = {"extra": {"payload": {"a": 1}}, "exception": object()}
+    assert format_record(with_payload) == LOG_FORMAT + "{exception}\n"
+    assert with_payload["extra"]["payload"] == {"a": 1}
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import pytest
+from loguru import logger
+from das_sankhya.core.loop_monitor import LoopMonitor, find_request
+from das_sankhya.middlewares.asgi_correlation_id.context import TracingContext
+
+
+class BlockingApp:
+    async def __call__(self, scope, receive, send):
+        ctx = TracingContext("corr-1", "req-1", None)
+        await asyncio.sleep(0.05)
+        time.sleep(0.3)
+        return ctx
+
+
+@pytest.mark.asyncio
+async def test_captures_stalled_stack():
+    records = []
+    handler_id = logger.add(records.append, format="{message}", level="WARNING")
+    monitor = LoopMonitor(interval=0.01, threshold=0.1)
+    monitor.start()
+    try:
+        await BlockingApp()({"type": "http", "path": "/slow"}, None, None)
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+        logger.remove(handler_id)
+
+    assert len(records) == 1
+    record = records[0].record
+    assert record["extra"]["correlation_id"] == "corr-1"
+    assert "handling /slow" in record["message"]
+    assert "in __call__" in record["message"]
+    assert "time.sleep(0.3)" in record["message"]
+
+
+@pytest.mark.asyncio
+async def test_stop_is_idempotent():
+    monitor = LoopMonitor(interval=0.01)
+    await monitor.stop()
+    monitor.start()
+    await asyncio.sleep(0.03)
+    await monitor.stop()
+    await monitor.stop()
+    assert monitor._task is None
+
+
+def test_find_request_without_request():
+    def inner():
+        import sys
+        return find_request(sys._getframe())
+
+    assert inner() == (None, None)
@@ -0,0 +1,110 @@
+import gc
+import os
+import weakref
+
+import pytest
+from das_sankhya.core.metrics import (
+    METRICS_DIR_ENV,
+    MetricsRegistry,
+    _MmapedValues,
+    mark_process_dead,
+    prepare_metrics_dir,
+)
+
+
+def test_counter_and_gauge():
+    registry = MetricsRegistry()
+    counter = registry.counter("jobs", "Jobs done.", ("kind",))
+    gauge = registry.gauge("busy", "Busy workers.")
+    counter.labels("a").inc()
+    counter.labels("a").inc(2)
+    counter.labels("b").inc()
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    text = registry.collect()
+    assert "# HELP jobs Jobs done.\n# TYPE jobs counter\n" in text
+    assert 'jobs_total{kind="a"} 3\n' in text
+    assert 'jobs_total{kind="b"} 1\n' in text
+    assert "# TYPE busy gauge\nbusy 1\n" in text
+
+
+def test_registries_are_not_kept_alive():
+    ref = weakref.ref(MetricsRegistry())
+    gc.collect()
+    assert ref() is None
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency", "Latency.", ("route",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        histogram.labels("x").observe(value)
+
+    lines = registry.collect().splitlines()
+    assert lines[2:] == [
+        'latency_bucket{route="x",le="0.1"} 1',
+        'latency_bucket{route="x",le="1"} 3',
+        'latency_bucket{route="x",le="+Inf"} 4',
+        'latency_sum{route="x"} 6.05',
+        'latency_count{route="x"} 4',
+    ]
+
+
+def test_label_escaping_and_validation():
+    registry = MetricsRegistry()
+    counter = registry.counter("c", "C.", ("path",))
+    counter.labels('a"b\\').inc()
+    assert 'c_total{path="a\\"b\\\\"} 1' in registry.collect()
+    with pytest.raises(ValueError):
+        counter.labels()
+    with pytest.raises(ValueError):
+        registry.counter("c", "C again.")
+
+
+def test_segment_grows():
+    values = _MmapedValues()
+    positions = [values.position("key-{0}".format(i) * 20) for i in range(2000)]
+    values.write(positions[-1], 42.0)
+    assert dict(values.read_all())["key-1999" * 20] == 42.0
+    assert values.position("key-0" * 20) == positions[0]
+
+
+def test_aggregates_worker_segments(tmp_path):
+    registry = MetricsRegistry(directory=str(tmp_path))
+    counter = registry.counter("requests", "Requests.")
+    gauge = registry.gauge("in_flight", "In flight.")
+    counter.inc(2)
+    gauge.inc()
+
+    # Another worker, writing its own segments in the same directory.
+    other = MetricsRegistry(directory=str(tmp_path))
+    other.counter("requests", "Requests.")
+    other.gauge("in_flight", "In flight.")
+    for kind, key in (("counter", '["requests", "_total", []]'), ("gauge", '["in_flight", "", []]')):
+        segment = _MmapedValues(str(tmp_path / "{0}_1.db".format(kind)))
+        segment.write(segment.position(key), 3)
+
+    text = registry.collect()
+    assert "requests_total 5\n" in text
+    assert "in_flight 4\n" in text
+
+    mark_process_dead(1, directory=str(tmp_path))
+    text = registry.collect()
+    assert "requests_total 5\n" in text
+    assert "in_flight 1\n" in text
+
+
+def test_prepare_metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(METRICS_DIR_ENV, "")
+    directory = prepare_metrics_dir()
+    assert os.environ[METRICS_DIR_ENV] == directory
+    assert os.path.isdir(directory)
+    os.rmdir(directory)
+
+    stale = tmp_path / "counter_1.db"
+    stale.write_bytes(b"")
+    monkeypatch.setenv(METRICS_DIR_ENV, str(tmp_path))
+    assert prepare_metrics_dir() == str(tmp_path)
+    assert not stale.exists()
@@ -0,0 +1,82 @@
+import gc
+import os
+import weakref
+
+import cuid
+import pytest
+from das_sankhya.middlewares.asgi_correlation_id.generators import (
+    MonotonicIdGenerator,
+    RandomIdPool,
+    get_id_generator,
+    is_valid_id,
+    uuid4_generator,
+)
+
+
+def test_monotonic_generator():
+    generate = MonotonicIdGenerator(worker_id=7)
+    ids = [generate() for _ in range(5000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert all(len(value) == 26 and is_valid_id(value) for value in ids)
+    assert {value[10:14] for value in ids} == {"0007"}
+
+
+def test_forked_children_get_their_own_prefix():
+    generate = MonotonicIdGenerator(worker_id=7)
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write_fd, generate().encode())
+        os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    child_id = os.read(read_fd, 64).decode()
+    os.close(read_fd)
+    assert generate()[10:14] == "0007"
+    assert is_valid_id(child_id) and child_id[10:14] != "0007"
+
+
+def test_generators_are_not_kept_alive():
+    ref = weakref.ref(MonotonicIdGenerator())
+    gc.collect()
+    assert ref() is None
+
+
+def test_random_id_pool():
+    generate = RandomIdPool(batch_size=16)
+    ids = [generate() for _ in range(100)]
+    assert len(set(ids)) == len(ids)
+    assert all(len(value) == 32 and is_valid_id(value) for value in ids)
+
+
+def test_random_id_pool_invalid_batch_size():
+    with pytest.raises(ValueError):
+        RandomIdPool(batch_size=0)
+
+
+@pytest.mark.parametrize("name", ["cuid", "uuid4", "ulid", "pool"])
+def test_get_id_generator(name):
+    generate = get_id_generator(name, batch_size=8)
+    assert is_valid_id(generate())
+
+
+def test_get_id_generator_unknown():
+    with pytest.raises(ValueError):
+        get_id_generator("snowflake")
+
+
+@pytest.mark.parametrize("value, expected", [
+    (cuid.cuid(), True),
+    (uuid4_generator(), True),
+    ("5c1d2f5e-1b0e-4f5b-9a51-3e3f0d0c9a10", True),
+    ("01FSZ2Q3J5K6M7N8P9QRSTVWXY", True),
+    ("C" + "a" * 24, False),
+    ("c" + "a" * 23 + "!", False),
+    ("5c1d2f5e-1b0e-4f5b-9a51-3e3f0d0c9a1-", False),
+    ("5c1d2f5e-1b0e-4f5b-9a51-3e3f0d0c9a1z", False),
+    ("not a valid id", False),
+    ("", False),
+])
+def test_is_valid_id(value, expected):
+    assert is_valid_id(value) is expected
@@ -0,0 +1,81 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from das_sankhya.middlewares.asgi_correlation_id import TracingMiddleware
+from das_sankhya.middlewares.asgi_correlation_id.context import tracing_context
+from das_sankhya.middlewares.asgi_correlation_id.middleware import (
+    merge_expose_headers,
+)
+
+
+def endpoint(request):
+    ctx = tracing_context.get()
+    return PlainTextResponse(
+        "{0}|{1}|{2}".format(
+            ctx.correlation_id, ctx.request_id, ctx.idempotency_key
+        ),
+        headers={
+            "Access-Control-Expose-Headers": "X-Custom",
+            "X-Custom": "1",
+        },
+    )
+
+
+@pytest.fixture
+def client():
+    app = Starlette(routes=[Route("/", endpoint)])
+    app.add_middleware(TracingMiddleware)
+    yield TestClient(app)
+
+
+def test_generates_ids(client):
+    response = client.get("/")
+    cid, rid, idk = response.text.split("|")
+    assert response.headers["x-correlation-id"] == cid
+    assert response.headers["x-request-id"] == rid
+    assert idk == "None"
+    assert "idempotency-key" not in response.headers
+    assert response.headers["x-custom"] == "1"
+
+
+def test_reuses_valid_headers(client):
+    correlation = "c" + "a" * 24
+    response = client.get(
+        "/",
+        headers={"X-Correlation-ID": correlation, "Idempotency-Key": "k" * 200},
+    )
+    cid, _, idk = response.text.split("|")
+    assert cid == correlation
+    assert idk == "k" * 128
+    assert response.headers["idempotency-key"] == "k" * 128
+
+
+def test_replaces_invalid_correlation_id(client):
+    response = client.get("/", headers={"X-Correlation-ID": "not valid"})
+    assert response.headers["x-correlation-id"] != "not valid"
+
+
+def test_merges_expose_headers(client):
+    response = client.get("/", headers={"Idempotency-Key": "abc"})
+    exposed = [
+        name.strip().lower()
+        for name in response.headers["access-control-expose-headers"].split(",")
+    ]
+    assert exposed == [
+        "x-custom",
+        "x-correlation-id",
+        "x-request-id",
+        "idempotency-key",
+    ]
+
+
+@pytest.mark.parametrize("value, expected", [
+    (b"X-Custom", b"X-Custom, x-request-id"),
+    (b"X-Request-ID", b"X-Request-ID"),
+    (b"*", b"*"),
+    (b"", b"x-request-id"),
+])
+def test_merge_expose_headers(value, expected):
+    assert merge_expose_headers(value, [b"x-request-id"]) == expected